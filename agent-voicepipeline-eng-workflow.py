@@ -1,5 +1,7 @@
+import asyncio
 import logging
 import os
+import sys
 from dotenv import load_dotenv
 from livekit.agents import (
     AutoSubscribe,
@@ -9,24 +11,41 @@ from livekit.agents import (
     cli,
     llm,
 )
+from livekit import api
 from livekit.agents.pipeline import VoicePipelineAgent
 from livekit.plugins import openai, deepgram, silero, cartesia , google
 
 from typing import Annotated
 # for reading mobile number
 import re
-import random
 #Add this to store data in mongodb
 from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional
-from pymongo import MongoClient
 from pydantic import ValidationError
 import pytz
 
 from bson.objectid import ObjectId
 from twilio.rest import Client
 
+from blocking_io import run_blocking
+from caller_history import CallerHistoryCache
+from complaint_numbers import ComplaintNumberAllocator
+from complaint_store import ComplaintRepository, ensure_indexes_at_startup
+from context_window import ContextWindow
+from intake import IntakeFlow, intake_phrases
+from latency_trace import trace_call
+from loop_watchdog import start_watchdog
+from outbox import Outbox
+from providers import ProviderPool, tts_cache_key
+from rate_limit import throttle
+from speculative import SpeculativeReply
+from tenants import ProviderSpec
+from tool_runner import ToolRunner
+from tts_cache import CachedTTS
+from turn_profiles import load_turn_profile
+from worker_load import WorkerLoad, monitor_loop_lag
+
 import uuid
 load_dotenv(dotenv_path=".env.local")
 logger = logging.getLogger("voice-agent")
@@ -36,31 +55,21 @@ logger = logging.getLogger("voice-agent")
 account_sid = os.getenv("TWILIO_ACCOUNT_SID")
 auth_token = os.getenv("TWILIO_AUTH_TOKEN")
 client = Client(account_sid, auth_token)
-def check_previous_complaints(mobile_number):
+async def check_previous_complaints(caller_history, mobile_number):
     """
     Check for previously existing complaints in MongoDB based on the given mobile number.
     Returns complaint details if found, 0 if not found.
     
     Args:
+        caller_history (CallerHistoryCache): Shared cache created in prewarm
         mobile_number (str): Customer's mobile number
         
     Returns:
         dict/int: Complaint details if found, 0 if not found
     """
     try:
-        mongo_url = os.getenv("MONGO_URI")
-        if not mongo_url:
-            raise ValueError("MONGO_URI is not set in environment variables.")
-
-        client = MongoClient(mongo_url)
-        db = client["customer_service"]
-        collection = db["customer_info"]
-
-        # Find the most recent complaint
-        complaint = collection.find_one(
-            {"mobile": mobile_number},
-            sort=[("timestamp", -1)]
-        )
+        # Find the most recent complaint (served from the cache when possible)
+        complaint = await caller_history.get(mobile_number)
 
         if complaint:
             return complaint
@@ -69,10 +78,6 @@ def check_previous_complaints(mobile_number):
     except Exception as e:
         logger.error(f"Error checking previous complaints: {str(e)}")
         return 0
-    
-    finally:
-        if 'client' in locals():
-            client.close()
 
 def get_mobile_number(input_string):
     """
@@ -98,7 +103,7 @@ def get_mobile_number(input_string):
 
 # Initialize the Twilio Client
 
-# Send an SMS
+# Send an SMS (blocking, run it through run_blocking from async code)
 def send_sms(to_number, message):
     
     from_number = "+15707295650"  # Replace with your Twilio phone number
@@ -111,19 +116,15 @@ def send_sms(to_number, message):
         print(f"Message sent successfully! SID: {message.sid}")
     except Exception as e:
         print(f"Failed to send message: {e}")
-        
-def get_counter_from_object_id(object_id)->str:
-    # Convert ObjectId to string
-    object_id_str = str(object_id)
-    
-    # Extract the last 4 characters (counter part)
-    counter_hex = object_id_str[20:]
-    
-    # Convert hex to integer
-    # counter = int(counter_hex, 16)
-    return counter_hex
+        raise  # let the outbox retry it
 
 
+async def deliver_sms(payload: dict):
+    """Outbox handler for queued SMS notifications."""
+    # background work: yields the Twilio quota to in-call requests
+    await throttle("twilio-sms", background=True)
+    await run_blocking(send_sms, payload["to"], payload["body"])
+        
 # Example Usage
 # # Add this to store data in mongodb
 class CustomerData(BaseModel):
@@ -134,21 +135,27 @@ class CustomerData(BaseModel):
     issue: str = Field(..., description="Issue or complaint the customer is facing")
     status: str = Field(default="pending", description="Status of the issue (e.g., pending, resolved)")
     timestamp: Optional[datetime] = Field(default_factory=datetime.utcnow, description="Time when the data was added")
-    priority: str = Field(default=1, description="Priority of the issue (e.g., 1,2,3,4,5)")
-    complaint_number: Optional[str] = Field(..., description="Complaint number derived from ObjectId")
+    priority: int = Field(default=1, description="Priority of the issue (e.g., 1,2,3,4,5)")
+    complaint_number: Optional[str] = Field(..., description="Complaint number issued by the complaint number allocator")
+    complaint_seq: Optional[int] = Field(default=None, description="Integer sequence value behind the complaint number")
 
 
-def store_customer_data_in_mongodb(data: dict):
+async def store_customer_data_in_mongodb(outbox, data: dict, sms: dict | None = None):
     """
-    Stores customer data in MongoDB after validating it against a schema.
+    Validates customer data against a schema and queues it for MongoDB.
+
+    The document is written to the local outbox and inserted in the background by
+    the outbox drainer, so the caller does not wait on the database.
 
     Args:
+        outbox (Outbox): Shared outbox created in prewarm
         data (dict): A dictionary containing customer data to be stored.
+        sms (dict): Optional SMS payload, queued in the same transaction so the
+            complaint is never stored without its confirmation message.
 
     Returns:
-        str: The ID of the inserted document.
+        str: The ID the document will be stored under.
     """
-    client = None
     try:
         # Validate data using the schema
         validated_data = CustomerData(**data)
@@ -158,42 +165,47 @@ def store_customer_data_in_mongodb(data: dict):
         ist_timezone = pytz.timezone("Asia/Kolkata")
         validated_data.timestamp = datetime.now(ist_timezone)
 
-        # Load MongoDB URI from environment variables
-        mongo_url = os.getenv("MONGO_URI")
-        if not mongo_url:
-            raise ValueError("MONGO_URI is not set in environment variables.")
-
-        # Connect to MongoDB
-        client = MongoClient(mongo_url)
-        db = client["customer_service"]
-        collection = db["customer_info"]
+        # Assign the ObjectId up front so redelivery from the outbox is idempotent
+        document = validated_data.dict()
+        document["_id"] = ObjectId()
 
-        # Insert the validated data into the collection
-        result = collection.insert_one(validated_data.dict())
-        logger.info(f"Customer data stored in MongoDB with ID: {result.inserted_id}")
+        items = [("complaint", document)]
+        if sms is not None:
+            items.append(("sms", sms))
+        await outbox.enqueue_many(items)
+        logger.info(f"Customer data queued for MongoDB with ID: {document['_id']}")
 
-        return str(result.inserted_id)
+        return str(document["_id"])
 
     except Exception as e:
-        logger.error(f"Failed to store customer data in MongoDB: {str(e)}")
+        logger.error(f"Failed to queue customer data for MongoDB: {str(e)}")
         raise
 
-    finally:
-        if client:
-            client.close()
-
 
 class CustomerServiceFnc(llm.FunctionContext):
-    def __init__(self):
+    def __init__(self, repository, outbox, complaint_numbers, caller_history):
         super().__init__()
+        self.repository = repository
+        self.outbox = outbox
+        self.complaint_numbers = complaint_numbers
+        self.caller_history = caller_history
         self.room = None
-        self.participants = {}  # Store participant-specific data
+        self.livekit_api = None
+        # Every inbound call gets its own room, so a job serves exactly one caller
+        self.caller = None
+        self.mobile = None
 
-    def set_room(self, room):
+    def set_room(self, room, livekit_api=None):
         self.room = room
+        self.livekit_api = livekit_api
 
-    def add_participant(self, participant_id, participant):
-        self.participants[participant_id] = participant
+    def set_caller(self, participant):
+        """
+        Records the caller this job serves. The number comes from the SIP
+        participant, falling back to the room name (`<prefix>_<number>_<id>`).
+        """
+        self.caller = participant
+        self.mobile = participant.attributes.get("sip.phoneNumber") or get_mobile_number(self.room.name)
 
     @llm.ai_callable()
     async def submit_customer_info(
@@ -220,13 +232,15 @@ class CustomerServiceFnc(llm.FunctionContext):
         room_name = self.room.name
         # Format the data for submission with participant information
         customer_data = (
-            f"NAME: {name}, ADDRESS: {address}, PRODUCT: {product}, ISSUE: {issue}, MOBILE: {get_mobile_number(room_name)}"
+            f"NAME: {name}, ADDRESS: {address}, PRODUCT: {product}, ISSUE: {issue}, MOBILE: {self.mobile}"
         )
         # You can also access room properties if needed
         logger.info(f"Submission from room: {room_name}")
         print(customer_data)
         
         try:
+            complaint_number, complaint_seq = await self.complaint_numbers.next_number()
+
             # Prepare the data for submission
             customer_data = {
                 "name": name,
@@ -234,21 +248,23 @@ class CustomerServiceFnc(llm.FunctionContext):
                 "product": product,
                 "issue": issue,
                 "status":"pending",
-                "mobile": get_mobile_number(room_name),
-                "priority":"1",
-                "complaint_number":str(random.randint(100, 9999))
-                
+                "mobile": self.mobile,
+                "priority": 1,
+                "complaint_number": complaint_number,
+                "complaint_seq": complaint_seq,
             }
 
             # Log the customer data
             logger.info(f"Collected customer data: {customer_data}")
 
-            # Store the data in MongoDB
-            inserted_id = store_customer_data_in_mongodb(customer_data)
-            # send_sms(customer_data['mobile'], "Hello! This is a test message.")
-            send_sms(customer_data['mobile'], f"Hello {customer_data['name']}. Your Complaint Number is {customer_data['complaint_number']}")
-            logger.info(f"Data stored successfully with ID: {inserted_id}")
-            print(f"Customer data successfully stored in MongoDB with ID: {inserted_id}")
+            # Queue the insert and the SMS together; the outbox drainer delivers both in the background
+            inserted_id = await store_customer_data_in_mongodb(self.outbox, customer_data, sms={
+                "to": customer_data['mobile'],
+                "body": f"Hello {customer_data['name']}. Your Complaint Number is {customer_data['complaint_number']}",
+            })
+            # The queued complaint is now this caller's latest one
+            self.caller_history.put(customer_data['mobile'], customer_data)
+            logger.info(f"Data queued successfully with ID: {inserted_id}")
 
         except Exception as e:
             logger.error(f"Error while storing data: {e}")
@@ -264,16 +280,18 @@ class CustomerServiceFnc(llm.FunctionContext):
             return
         
         try:
-            # Get the current participant being served
-            participant = next(iter(self.participants.values()), None)
-            if participant:
-                logger.info(f"Disconnecting participant: {participant.identity}")
-                await self.room.disconnect()  # Disconnect from the room
-                logger.info("Call ended successfully")
-                return "Call ended successfully"
+            if self.caller is None:
+                logger.error("No caller found to disconnect")
+                return "No caller found to disconnect"
+            logger.info(f"Hanging up caller {self.caller.identity} in room {self.room.name}")
+            if self.livekit_api is not None:
+                # The room belongs to this call only: closing it hangs up the SIP leg
+                # and ends this job without touching other calls
+                await self.livekit_api.room.delete_room(api.DeleteRoomRequest(room=self.room.name))
             else:
-                logger.error("No participant found to disconnect")
-                return "No participant found to disconnect"
+                await self.room.disconnect()
+            logger.info("Call ended successfully")
+            return "Call ended successfully"
         except Exception as e:
             logger.error(f"Error ending call: {str(e)}")
             return f"Error ending call: {str(e)}"
@@ -288,46 +306,29 @@ class CustomerServiceFnc(llm.FunctionContext):
         This function should be called when a customer mentions their existing complaint number.
         """
         try:
-            mongo_url = os.getenv("MONGO_URI")
-            if not mongo_url:
-                raise ValueError("MONGO_URI is not set in environment variables.")
-
-            client = MongoClient(mongo_url)
-            db = client["customer_service"]
-            collection = db["customer_info"]
-
-            # Find the complaint using complaint number
-            existing_complaint = collection.find_one(
-                {"complaint_number": complaint_number, "status": "pending"}
+            # Escalate in one atomic round trip; returns the updated complaint
+            complaint = await self.repository.escalate_priority(
+                complaint_number,
+                datetime.now(pytz.timezone("Asia/Kolkata")),
             )
 
-            if existing_complaint:
-                current_priority = existing_complaint.get('priority', 1)
-                new_priority = min(int(current_priority) + 1, 5)  # Cap priority at 5
-                
-                # Update the priority
-                result = collection.update_one(
-                    {"complaint_number": complaint_number},
-                    {"$set": {
-                        "priority": str(new_priority),
-                        "timestamp": datetime.now(pytz.timezone("Asia/Kolkata"))
-                    }}
-                )
-                
-                logger.info(f"Updated priority for complaint #{complaint_number} "
-                           f"from {current_priority} to {new_priority}")
+            if complaint:
+                new_priority = complaint['priority']
+                # The escalation bumped the timestamp, so this is the caller's latest complaint
+                self.caller_history.put(complaint.get('mobile'), complaint)
+                logger.info(f"Updated priority for complaint #{complaint_number} to {new_priority}")
                 
                 # Send SMS notification about priority update
-                logger.info(f"existing_complaint: {existing_complaint}")
-                mobile = existing_complaint['mobile']
+                logger.info(f"updated_complaint: {complaint}")
+                mobile = complaint.get('mobile')
                 if mobile:
                     message = (
                         f"Your complaint (#{complaint_number}) priority has been increased to {new_priority}. "
                         "We will address it on priority basis."
                     )
-                    send_sms(mobile, message)
+                    await self.outbox.enqueue("sms", {"to": mobile, "body": message})
                 
-                return f"Priority updated for complaint #{complaint_number} from {current_priority} to {new_priority}"
+                return f"Priority for complaint #{complaint_number} is now {new_priority}"
 
             return f"No pending complaint found with number {complaint_number}"
 
@@ -335,35 +336,39 @@ class CustomerServiceFnc(llm.FunctionContext):
             error_msg = f"Error updating complaint priority: {str(e)}"
             logger.error(error_msg)
             return error_msg
-        
-        finally:
-            if 'client' in locals():
-                client.close()
-
-def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
 
-
-async def entrypoint(ctx: JobContext):
-    fnc_ctx = CustomerServiceFnc()
-    fnc_ctx.set_room(ctx.room)
-    logger.info(f"connecting to room {ctx.room.name}")
-    await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
-
-    # Wait for the first participant to connect
-    participant = await ctx.wait_for_participant()
-    logger.info(f"starting voice assistant for participant {participant.identity}")
-
-    fnc_ctx.add_participant(participant.identity, participant)
-    room_name = ctx.room.name
-    mobile_number = get_mobile_number(room_name)
-    previous_complaint = check_previous_complaints(mobile_number)
-    logger.info(f"previous_complaint: {'Number Exists' if previous_complaint != 0 else 'New Complaint'}")
-
-    if previous_complaint != 0:
-        initial_ctx = llm.ChatContext().append(
-            role="system",
-            text=(
+# How long the greeting waits for the caller's history before asking the generic
+# question; roughly the playout time of the welcome line
+HISTORY_GREETING_WAIT = float(os.getenv("HISTORY_GREETING_WAIT", "1.5"))
+
+GREETING = "Welcome to Benchmark Service Center."
+GREETING_QUESTION = "How can I help you today?"
+
+# Spoken as soon as the LLM calls these tools, while they run
+TOOL_FILLERS = {
+    "submit_customer_info": "One moment while I register that.",
+    "update_complaint_priority": "One moment while I update your complaint.",
+}
+
+# Fixed lines that are played from the local TTS cache instead of being
+# re-synthesized on every call
+STOCK_PHRASES = [
+    GREETING,
+    GREETING_QUESTION,
+    "You may now hang up the call.",
+    "Thank you for calling Benchmark Service Center. Goodbye!",
+    *intake_phrases(),
+    *TOOL_FILLERS.values(),
+]
+
+# New complaints are walked through name/address/product/issue without the LLM
+# unless the caller goes off-script; set INTAKE_FAST_PATH=0 to always use the LLM
+INTAKE_FAST_PATH = os.getenv("INTAKE_FAST_PATH", "1") == "1"
+
+
+def returning_caller_prompt(previous_complaint) -> str:
+    """System prompt for callers with a previous complaint on record."""
+    return (
                "You are a virtual call assistant for Benchmark Service Center. "
 "I can see that you have contacted us before. Here are the details of your last complaint:\n"
 f"- Complaint Number: {previous_complaint['complaint_number']}\n"
@@ -418,12 +423,10 @@ f"- Priority: {previous_complaint['priority']}\n\n"
 "  * Inform them they will receive an SMS"
 "  * Say: 'Thank you for calling Benchmark Service Center. Goodbye!'"
 "  * MUST use end_call function to disconnect the call"
-            ),
-        )
-    else:
-        initial_ctx = llm.ChatContext().append(
-    role="system",
-    text=(
+    )
+
+
+NEW_CALLER_PROMPT = (
         "You are a virtual female call assistant for Benchmark Service Center, providing professional and empathetic customer service in English."
 
         "For New Callers, there are two possible scenarios:"
@@ -461,38 +464,184 @@ f"- Priority: {previous_complaint['priority']}\n\n"
 "  * Inform them they will receive an SMS"
 "  * Say: 'Thank you for calling Benchmark Service Center. Goodbye!'"
 "  * MUST use end_call function to disconnect the call"
-    ),
 )
 
+
+def prewarm(proc: JobProcess):
+    # The multi-tenant worker passes in its shared VAD
+    if "vad" not in proc.userdata:
+        proc.userdata["vad"] = silero.VAD.load(**load_turn_profile("en").vad)
+    # Provider clients are built once here and shared by the jobs this process runs
+    # (the multi-tenant worker passes in its own pool)
+    providers = proc.userdata.setdefault("providers", ProviderPool())
+    proc.userdata["stt"] = providers.stt(ProviderSpec(provider="deepgram"))
+    # Groq first, OpenAI when Groq is slow or rate-limited (see llm_router.py)
+    proc.userdata["llm"] = providers.llm(
+        ProviderSpec(provider="route", options={"providers": [{"provider": "groq"}, {"provider": "openai"}]})
+    )
+    tts_spec = ProviderSpec(provider="google", options={"language": "en-IN"})
+    voice, language = tts_cache_key(tts_spec)
+    tts = CachedTTS(
+        providers.tts(tts_spec),
+        voice=voice,
+        language=language,
+        phrases=STOCK_PHRASES,
+    )
+    tts.load()
+    proc.userdata["tts"] = tts
+
+    # One pooled repository per worker process, shared by every job it runs
+    repository = ComplaintRepository()
+    proc.userdata["complaints"] = repository
+
+    # Complaint inserts and SMS notifications are written behind via the outbox
+    outbox = Outbox()
+    outbox.register("complaint", repository.insert_complaints, batch=True)
+    outbox.register("sms", deliver_sms)
+    proc.userdata["outbox"] = outbox
+
+    proc.userdata["complaint_numbers"] = ComplaintNumberAllocator(repository)
+    proc.userdata["caller_history"] = CallerHistoryCache(repository)
+
+
+async def entrypoint(ctx: JobContext):
+    monitor_loop_lag()
+    start_watchdog()
+    repository = ctx.proc.userdata["complaints"]
+    complaint_numbers = ctx.proc.userdata["complaint_numbers"]
+    caller_history = ctx.proc.userdata["caller_history"]
+
+    async def _warm_up():
+        # Open the pool and reserve a block of complaint numbers while we connect
+        # to the room and wait for the caller
+        await repository.connect()
+        await complaint_numbers.reserve()
+
+    asyncio.create_task(_warm_up())
+    # Open provider connections and render any stock phrase that is not cached
+    # yet while we join the room and wait for the caller
+    asyncio.create_task(ctx.proc.userdata["providers"].warm(
+        ctx.proc.userdata["stt"], ctx.proc.userdata["llm"], ctx.proc.userdata["tts"]
+    ))
+    asyncio.create_task(ctx.proc.userdata["tts"].fill())
+
+    outbox = ctx.proc.userdata["outbox"]
+    outbox.start()
+    caller_history.start_watching()
+
+    async def _close_repository():
+        # The pool is bound to this job's event loop: release it once the outbox
+        # has flushed and the history watcher has stopped
+        await outbox.aclose()
+        await caller_history.aclose()
+        await repository.close()
+
+    ctx.add_shutdown_callback(_close_repository)
+
+    # The mobile number is part of the room name, so the history lookup can run
+    # while we join the room, wait for the caller and greet them
+    mobile_number = get_mobile_number(ctx.job.room.name)
+    history_task = asyncio.create_task(check_previous_complaints(caller_history, mobile_number))
+
+    fnc_ctx = CustomerServiceFnc(repository, outbox, complaint_numbers, caller_history)
+    fnc_ctx.set_room(ctx.room, ctx.api)
+    logger.info(f"connecting to room {ctx.room.name}")
+    await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
+
+    # The room was created for this caller by the individual dispatch rule
+    participant = await ctx.wait_for_participant()
+    logger.info(f"starting voice assistant for participant {participant.identity}")
+
+    fnc_ctx.set_caller(participant)
+
+    initial_ctx = llm.ChatContext().append(role="system", text=NEW_CALLER_PROMPT)
+
+    # A complaint that is slow to submit finishes in the background instead of
+    # holding up the call; wraps the tools, so before the intake looks them up
+    tool_runner = ToolRunner(fnc_ctx, fillers=TOOL_FILLERS, background=["submit_customer_info"])
+    ctx.add_shutdown_callback(lambda: tool_runner.aclose())
+
+    intake = None
+    if INTAKE_FAST_PATH:
+        intake = IntakeFlow(fnc_ctx, on_complete=fnc_ctx.end_call)
+        ctx.add_shutdown_callback(lambda: intake.aclose())
+    # Send the prompt plus the last few turns, with older turns folded into the slots
+    context_window = ContextWindow(
+        inner=intake.before_llm_cb if intake else None,
+        slots=(lambda: intake.slots) if intake else None,
+    )
+    ctx.add_shutdown_callback(lambda: context_window.aclose())
+    # Opt-in (SPECULATIVE_LLM=1): start the reply on a stable interim transcript;
+    # not while the intake answers from its script
+    speculative = SpeculativeReply(
+        inner=context_window.before_llm_cb,
+        prepare=context_window.trim,
+        record=context_window.record,
+        can_speculate=(lambda: not intake.active) if intake else None,
+    )
+    ctx.add_shutdown_callback(lambda: speculative.aclose())
+
     assistant = VoicePipelineAgent(
         vad=ctx.proc.userdata["vad"],
-        stt=deepgram.STT(),
-        llm=openai.LLM.with_groq(),
-        tts=google.TTS(credentials_file=os.getenv("GOOGLE_APPLICATION_CREDENTIALS"),language="en-IN"),
+        stt=ctx.proc.userdata["stt"],
+        llm=ctx.proc.userdata["llm"],
+        tts=ctx.proc.userdata["tts"],
         chat_ctx=initial_ctx,
         fnc_ctx=fnc_ctx,
+        before_llm_cb=speculative.before_llm_cb,
+        **load_turn_profile("en").agent_options(),
     )
 
     assistant.participant_id = participant.identity
+    tool_runner.attach(assistant)
+    trace_call(ctx, assistant, tenant="benchmark-workflow", language="en", tool_runner=tool_runner, speculative=speculative)
     assistant.start(ctx.room, participant)
+    speculative.attach(assistant)
+
+    # Greet right away; the caller's history is spliced in when the lookup finishes
+    await assistant.say(GREETING, allow_interruptions=True)
+
+    history_late = False
+    try:
+        previous_complaint = await asyncio.wait_for(
+            asyncio.shield(history_task), timeout=HISTORY_GREETING_WAIT
+        )
+    except asyncio.TimeoutError:
+        # Don't leave the caller waiting on the database
+        history_late = True
+        await assistant.say(GREETING_QUESTION, allow_interruptions=True)
+        previous_complaint = await history_task
+    logger.info(f"previous_complaint: {'Number Exists' if previous_complaint != 0 else 'New Complaint'}")
 
     if previous_complaint != 0:
-        await assistant.say(
-            f"Welcome back to Benchmark Service Center. I can see your previous complaint number {previous_complaint['complaint_number']}. "
-            "How may I assist you today? Are you calling about the same issue or do you have a new complaint?",
-            allow_interruptions=True
+        assistant.chat_ctx.messages[0] = llm.ChatMessage.create(
+            role="system",
+            text=returning_caller_prompt(previous_complaint),
         )
-    else:
         await assistant.say(
-            "Welcome to Benchmark Service Center. How can I help you today?",
+            f"I can see your previous complaint number {previous_complaint['complaint_number']}. "
+            "How may I assist you today? Are you calling about the same issue or do you have a new complaint?",
             allow_interruptions=True
         )
+    elif not history_late:
+        await assistant.say(GREETING_QUESTION, allow_interruptions=True)
 
 
 if __name__ == "__main__":
+    if sys.argv[1:2] in (["start"], ["dev"]):
+        # once per worker, not per call (each job process serves one call)
+        ensure_indexes_at_startup()
+    load = WorkerLoad()
     cli.run_app(
         WorkerOptions(
             entrypoint_fnc=entrypoint,
             prewarm_fnc=prewarm,
+            # Run as many of these workers as needed: each inbound call is its own
+            # room and LiveKit dispatches every room to one available worker
+            agent_name=os.getenv("WORKER_AGENT_NAME", ""),
+            # Stop taking calls before CPU, event-loop lag or WORKER_MAX_CALLS
+            # make the audio of the current calls stutter
+            load_fnc=load.load_fnc,
+            load_threshold=load.threshold,
         ),
     )
\ No newline at end of file
@@ -4,6 +4,7 @@ from typing import Annotated
 import logging
 logger = logging.getLogger("voice-agent")
 from dotenv import load_dotenv
+from turn_profiles import load_turn_profile
 load_dotenv(dotenv_path="./.env.local")
 class AssistantFnc(llm.FunctionContext):
     # the llm.ai_callable decorator marks this function as a tool available to the LLM
@@ -24,14 +25,7 @@ class AssistantFnc(llm.FunctionContext):
         
         return True
 
-async def entrypoint(ctx: JobContext):
-    fnc_ctx = AssistantFnc()
-    await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
-    participant = await ctx.wait_for_participant()
-    logger.info(f"starting voice assistant for participant {participant.identity}")
-    agent = multimodal.MultimodalAgent(
-        model=openai.realtime.RealtimeModel(
-            instructions="""You are a friendly and professional customer support agent for Benchmark Pvt
+INSTRUCTIONS = """You are a friendly and professional customer support agent for Benchmark Pvt
 Ltd, a leading water heater company in Gujarat. Your task is to assist customers
 in registering their complaints and collecting the required information in
 Gujarati. Ensure the conversation is polite, easy to follow, and encourages the
@@ -53,19 +47,61 @@ the customer that their issue will be addressed promptly (e.g., \"તમાર
 Format: Once all the details are collected, the agent should summarize them as
 follows: \"મને આપે આપેલા વિગતો નીચે મુજબ છે: નામ: [Customer Name] સરનામું:
 [Customer Address] પ્રોડક્ટ: [Customer Product] સમસ્યા: [Issue Faced] આ માહિતી
-સાચી છે? તમારું આભાર! તમારું ફરિયાદ નંબર ટૂંક સમયમાં તમને મોકલવામાં આવશે.\"""",
-            voice="shimmer",
-            temperature=0.8,
-            max_response_output_tokens="inf",
-            modalities=["text", "audio"],
-            turn_detection=openai.realtime.ServerVadOptions(
+સાચી છે? તમારું આભાર! તમારું ફરિયાદ નંબર ટૂંક સમયમાં તમને મોકલવામાં આવશે.\""""
+
+def realtime_model():
+    return openai.realtime.RealtimeModel(
+        instructions=INSTRUCTIONS,
+        voice="shimmer",
+        temperature=0.8,
+        max_response_output_tokens="inf",
+        modalities=["text", "audio"],
+        # tuned for Gujarati callers by tune_turns.py, these values otherwise
+        turn_detection=openai.realtime.ServerVadOptions(
+            **load_turn_profile("gu").server_vad(
                 threshold=0.5,
                 silence_duration_ms=200,
                 prefix_padding_ms=300,
             )
-        ),
-        fnc_ctx=fnc_ctx
+        )
     )
+
+class OpenedSession:
+    """
+    The MultimodalAgent's model, handing it a realtime session opened early.
+
+    A realtime session connects its websocket and sends the instructions, voice,
+    turn detection and tools as soon as it is created, so opening it after
+    `ctx.wait_for_participant()` puts all of that in front of the greeting.
+    Create this before `ctx.connect()` and build the agent with the same
+    `fnc_ctx` and no chat history, which is what the session was opened with.
+    """
+
+    def __init__(self, model, fnc_ctx=None):
+        self._model = model
+        self._session = model.session(fnc_ctx=fnc_ctx)
+
+    @property
+    def capabilities(self):
+        return self._model.capabilities
+
+    def session(self, *, chat_ctx=None, fnc_ctx=None):
+        session, self._session = self._session, None
+        if session is None:
+            return self._model.session(chat_ctx=chat_ctx, fnc_ctx=fnc_ctx)
+        return session
+
+async def entrypoint(ctx: JobContext):
+    # open and configure the realtime session while the room connects and the
+    # caller joins, instead of after
+    model = realtime_model()
+    fnc_ctx = AssistantFnc()
+    opened = OpenedSession(model, fnc_ctx)
+    ctx.add_shutdown_callback(lambda: model.aclose())
+    await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
+    participant = await ctx.wait_for_participant()
+    logger.info(f"starting voice assistant for participant {participant.identity}")
+    agent = multimodal.MultimodalAgent(model=opened, fnc_ctx=fnc_ctx)
     agent.start(ctx.room,participant)
 
 
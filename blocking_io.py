@@ -0,0 +1,49 @@
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("voice-agent")
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Returns the process-wide executor used for blocking client libraries.
+
+    The pool size is read from BLOCKING_IO_CONCURRENCY (default 4) and caps how many
+    blocking calls (Twilio requests, etc.) can be in flight at once in this worker.
+    """
+    global _executor
+    if _executor is None:
+        max_workers = int(os.getenv("BLOCKING_IO_CONCURRENCY", "4"))
+        _executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="blocking-io",
+        )
+        logger.info(f"blocking I/O executor started with {max_workers} workers")
+    return _executor
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Runs a blocking function on the shared executor without stalling the event loop.
+
+    Args:
+        fn (callable): The blocking function to run.
+        *args, **kwargs: Arguments passed to `fn`.
+
+    Returns:
+        The return value of `fn`.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("voice-agent")
+
+
+class CallerHistoryCache:
+    """
+    In-process LRU cache of the latest complaint per mobile number.
+
+    Entries (including "no previous complaint") live for `ttl` seconds and the cache
+    holds at most `max_size` numbers. Writers refresh or invalidate entries when they
+    change a caller's complaints, and an optional MongoDB change stream invalidates
+    entries for writes made by other processes.
+    """
+
+    def __init__(self, repository, max_size: int | None = None, ttl: float | None = None):
+        self._repository = repository
+        self._max_size = max_size or int(os.getenv("CALLER_CACHE_MAX_SIZE", "10000"))
+        self._ttl = ttl or float(os.getenv("CALLER_CACHE_TTL", "300"))
+        self._entries = OrderedDict()
+        self._watch_task = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._miss_seconds = 0.0
+
+    async def get(self, mobile_number: str):
+        """
+        Returns the latest complaint for the mobile number, or None if there is none.
+        """
+        entry = self._entries.get(mobile_number)
+        if entry is not None:
+            expires_at, complaint = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(mobile_number)
+                self.hits += 1
+                return complaint
+            del self._entries[mobile_number]
+
+        self.misses += 1
+        started = time.monotonic()
+        complaint = await self._repository.latest_for_mobile(mobile_number)
+        self._miss_seconds += time.monotonic() - started
+        self.put(mobile_number, complaint)
+        return complaint
+
+    def put(self, mobile_number: str, complaint):
+        """
+        Stores the caller's latest complaint, e.g. right after it was written.
+        """
+        if not mobile_number:
+            return
+        self._entries[mobile_number] = (time.monotonic() + self._ttl, complaint)
+        self._entries.move_to_end(mobile_number)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, mobile_number: str):
+        if self._entries.pop(mobile_number, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Hit/miss counters plus an estimate of the lookup latency saved by hits,
+        based on the average latency of the misses.
+        """
+        lookups = self.hits + self.misses
+        avg_miss = self._miss_seconds / self.misses if self.misses else 0.0
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "avg_miss_ms": avg_miss * 1000,
+            "estimated_saved_ms": self.hits * avg_miss * 1000,
+        }
+
+    async def _watch(self):
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        while True:
+            try:
+                async with await self._repository.collection.watch(
+                    pipeline, full_document="updateLookup"
+                ) as stream:
+                    async for change in stream:
+                        document = change.get("fullDocument") or {}
+                        mobile = document.get("mobile")
+                        if mobile:
+                            self.invalidate(mobile)
+                        elif change["operationType"] == "delete":
+                            # the deleted document is gone, we can't tell whose it was
+                            self.clear()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Caller history change stream failed: {str(e)}")
+                await asyncio.sleep(5)
+
+    def start_watching(self):
+        """
+        Starts invalidating entries from a MongoDB change stream (requires a replica
+        set). Enabled when CALLER_CACHE_CHANGE_STREAM=1. Safe to call from every job.
+        """
+        if os.getenv("CALLER_CACHE_CHANGE_STREAM") != "1":
+            return
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def aclose(self):
+        logger.info(f"caller history cache stats: {self.stats()}")
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
@@ -0,0 +1,504 @@
+import argparse
+import asyncio
+import csv
+import functools
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import time
+
+from bson import ObjectId, json_util
+from dotenv import load_dotenv
+from google.protobuf.duration_pb2 import Duration
+from livekit import api
+from livekit.agents import utils
+from livekit.protocol.sip import CreateSIPParticipantRequest
+
+from blocking_io import run_blocking
+from complaint_store import ComplaintRepository
+
+load_dotenv(dotenv_path="./.env.local")
+logger = logging.getLogger("voice-agent")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaign_calls (
+    campaign TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_until REAL NOT NULL DEFAULT 0,
+    room TEXT,
+    outcome TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (campaign, phone)
+);
+CREATE INDEX IF NOT EXISTS campaign_calls_due ON campaign_calls (campaign, status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS campaign_sources (
+    campaign TEXT PRIMARY KEY,
+    cursor TEXT,
+    exhausted INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# SIP responses worth calling back later; anything else that fails is final
+_BUSY = {"486", "600"}
+_NO_ANSWER = {"408", "480", "487"}
+_PHONE = re.compile(r"^\+\d{8,15}$")
+
+
+class Trunk:
+    """An outbound SIP trunk with its own concurrency cap and calls-per-second limit."""
+
+    def __init__(self, trunk_id: str, max_concurrent: int, calls_per_second: float):
+        self.trunk_id = trunk_id
+        self.max_concurrent = max_concurrent
+        self.calls_per_second = calls_per_second
+        self.active = 0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def parse(cls, spec: str) -> "Trunk":
+        """Parses `TRUNK_ID[:MAX_CONCURRENT[:CALLS_PER_SECOND]]`."""
+        trunk_id, *rest = spec.split(":")
+        max_concurrent = int(rest[0]) if rest else 5
+        calls_per_second = float(rest[1]) if len(rest) > 1 else 1.0
+        return cls(trunk_id, max_concurrent, calls_per_second)
+
+    async def pace(self):
+        """Waits for this trunk's next call-start slot."""
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + 1 / self.calls_per_second
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CampaignStore:
+    """
+    SQLite checkpoint of a campaign: every target with its status, attempts and
+    next attempt time, plus how far the target source has been read. Rows are
+    claimed with a lease, so a restarted runner picks up where the last one
+    stopped. A row keeps the room of the call in flight, so a call placed before
+    the runner died is followed up, never dialed again.
+    """
+
+    def __init__(self, path: str | None = None, lease: float = 120.0):
+        self.path = path or os.getenv("CAMPAIGN_DB", "campaigns.sqlite3")
+        self.lease = lease
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def source_state(self, campaign: str) -> tuple[str | None, bool]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT cursor, exhausted FROM campaign_sources WHERE campaign = ?", (campaign,)
+            ).fetchone()
+            return (row[0], bool(row[1])) if row else (None, False)
+        finally:
+            conn.close()
+
+    def add_targets(self, campaign: str, targets: list, cursor: str | None, exhausted: bool = False) -> int:
+        """Adds a batch of (phone, payload) targets and moves the source cursor, atomically."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            added = 0
+            for phone, payload in targets:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO campaign_calls (campaign, phone, payload, next_attempt_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (campaign, phone, json_util.dumps(payload), now, now),
+                )
+                added += cur.rowcount
+            conn.execute(
+                "INSERT INTO campaign_sources (campaign, cursor, exhausted) VALUES (?, ?, ?) "
+                "ON CONFLICT(campaign) DO UPDATE SET cursor = excluded.cursor, exhausted = excluded.exhausted",
+                (campaign, cursor, int(exhausted)),
+            )
+            conn.execute("COMMIT")
+            return added
+        finally:
+            conn.close()
+
+    def claim(self, campaign: str, limit: int) -> list:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT phone, payload, attempts, room FROM campaign_calls "
+                "WHERE campaign = ? AND status IN ('pending', 'dialing') AND next_attempt_at <= ? "
+                "AND claimed_until <= ? ORDER BY next_attempt_at LIMIT ?",
+                (campaign, now, now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE campaign_calls SET status = 'dialing', claimed_until = ?, updated_at = ? "
+                "WHERE campaign = ? AND phone = ?",
+                [(now + self.lease, now, campaign, row[0]) for row in rows],
+            )
+            conn.execute("COMMIT")
+            return [(row[0], json_util.loads(row[1]), row[2], row[3]) for row in rows]
+        finally:
+            conn.close()
+
+    def update(self, campaign: str, phone: str, **fields):
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        conn = self._connect()
+        try:
+            conn.execute(
+                f"UPDATE campaign_calls SET {columns} WHERE campaign = ? AND phone = ?",
+                (*fields.values(), campaign, phone),
+            )
+        finally:
+            conn.close()
+
+    def counts(self, campaign: str) -> dict:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM campaign_calls WHERE campaign = ? GROUP BY status", (campaign,)
+            ).fetchall()
+            return dict(rows)
+        finally:
+            conn.close()
+
+    def next_due(self, campaign: str) -> float | None:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT MIN(MAX(next_attempt_at, claimed_until)) FROM campaign_calls "
+                "WHERE campaign = ? AND status IN ('pending', 'dialing')",
+                (campaign,),
+            ).fetchone()
+            return row[0]
+        finally:
+            conn.close()
+
+
+def normalize_phone(value, default_country: str = "+91") -> str | None:
+    digits = re.sub(r"[^\d+]", "", str(value or ""))
+    if digits and not digits.startswith("+"):
+        digits = default_country + digits[-10:]
+    return digits if _PHONE.match(digits) else None
+
+
+async def mongo_targets(filter_: dict, cursor: str | None, batch_size: int = 500):
+    """
+    Streams (targets, cursor) batches from customer_service.customer_info in _id
+    order, starting after `cursor` (the last _id already read).
+    """
+    repository = ComplaintRepository()
+    query = dict(filter_)
+    if cursor:
+        query["_id"] = {"$gt": ObjectId(cursor)}
+    batch, last_id = [], cursor
+    projection = {"mobile": 1, "name": 1, "complaint_number": 1, "product": 1, "status": 1}
+    try:
+        async for doc in repository.collection.find(query, projection).sort("_id", 1).batch_size(batch_size):
+            last_id = str(doc["_id"])
+            phone = normalize_phone(doc.get("mobile"))
+            if phone:
+                doc.pop("_id")
+                batch.append((phone, doc))
+            if len(batch) >= batch_size:
+                yield batch, last_id
+                batch = []
+        yield batch, last_id
+    finally:
+        await repository.close()
+
+
+async def csv_targets(path: str, cursor: str | None, batch_size: int = 500):
+    """
+    Streams (targets, cursor) batches from a CSV with a `mobile` or `phone` column;
+    the cursor is the number of data rows already read.
+    """
+    read = int(cursor or 0)
+    f = open(path, newline="", encoding="utf-8")
+    reader = csv.DictReader(f)
+
+    def _next_rows(count):
+        rows = []
+        for row in reader:
+            rows.append(row)
+            if len(rows) >= count:
+                break
+        return rows
+
+    try:
+        if read:
+            await run_blocking(_next_rows, read)
+        while True:
+            rows = await run_blocking(_next_rows, batch_size)
+            if not rows:
+                break
+            read += len(rows)
+            batch = [(phone, row) for row in rows if (phone := normalize_phone(row.get("mobile") or row.get("phone")))]
+            yield batch, str(read)
+    finally:
+        f.close()
+
+
+class CampaignRunner:
+    """
+    Places outbound calls for one campaign.
+
+    Targets are streamed from the source into the CampaignStore while calls go
+    out. Every call gets its own room (`<room_prefix>_<phone>_<id>`, the shape
+    `get_mobile_number` parses), an explicit dispatch of `agent_name` with the
+    target as job metadata, and a SIP participant that waits until answered.
+    Each trunk runs at most `max_concurrent` calls and starts at most
+    `calls_per_second`. Busy and no-answer are retried with exponential backoff
+    up to `max_attempts`; other SIP failures are final. All calls share one
+    LiveKitAPI client.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        source,
+        trunks: list[Trunk],
+        agent_name: str,
+        *,
+        store: CampaignStore | None = None,
+        tenant: str | None = None,
+        room_prefix: str | None = None,
+        max_attempts: int = 3,
+        base_backoff: float = 600.0,
+        max_backoff: float = 6 * 3600.0,
+        ringing_timeout: int = 30,
+        poll_interval: float = 5.0,
+    ):
+        self.name = name
+        self._source = source
+        self.trunks = trunks
+        self.agent_name = agent_name
+        self.store = store or CampaignStore()
+        self.tenant = tenant
+        self.room_prefix = room_prefix or f"campaign-{name}"
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.ringing_timeout = ringing_timeout
+        self.poll_interval = poll_interval
+        self._queue = asyncio.Queue(maxsize=sum(t.max_concurrent for t in trunks))
+        self._lkapi = None
+        self._loaded = False
+
+    async def _load(self):
+        cursor, exhausted = await run_blocking(self.store.source_state, self.name)
+        if exhausted:
+            self._loaded = True
+            return
+        try:
+            async for targets, cursor in self._source(cursor):
+                added = await run_blocking(self.store.add_targets, self.name, targets, cursor)
+                logger.info(f"campaign {self.name}: queued {added} new targets (cursor {cursor})")
+            await run_blocking(self.store.add_targets, self.name, [], cursor, True)
+        finally:
+            self._loaded = True
+
+    async def _feed(self):
+        """Moves due rows from the store to the dialers until the campaign is finished."""
+        while True:
+            # only claim what idle dialers can start now, so claimed rows never sit
+            # in the queue long enough for their lease to run out
+            idle = self._queue.maxsize - sum(t.active for t in self.trunks)
+            free = idle - self._queue.qsize()
+            rows = await run_blocking(self.store.claim, self.name, free) if free > 0 else []
+            for row in rows:
+                await self._queue.put(row)
+            if rows:
+                continue
+            if self._loaded and self._queue.empty() and all(t.active == 0 for t in self.trunks):
+                next_due = await run_blocking(self.store.next_due, self.name)
+                if next_due is None:
+                    return
+            await asyncio.sleep(1.0)
+
+    async def _dialer(self, trunk: Trunk):
+        while True:
+            phone, payload, attempts, room = await self._queue.get()
+            trunk.active += 1
+            try:
+                await self._call(trunk, phone, payload, attempts, room)
+            except Exception as e:
+                logger.exception(f"campaign {self.name}: call to {phone} failed unexpectedly")
+                await self._retry_or_fail(phone, attempts, f"error: {e}")
+            finally:
+                trunk.active -= 1
+                self._queue.task_done()
+
+    async def _room_active(self, room: str) -> bool:
+        # the room lasts while the call rings, while it is answered and while the
+        # agent wraps up on its own, until everyone has left
+        rooms = await self._lkapi.room.list_rooms(api.ListRoomsRequest(names=[room]))
+        return bool(rooms.rooms)
+
+    async def _call(self, trunk: Trunk, phone: str, payload: dict, attempts: int, room: str | None):
+        if room:
+            # the previous runner placed this call before it stopped; never dial twice
+            if not await self._room_active(room):
+                logger.info(f"campaign {self.name}: call to {phone} in {room} ended while the runner was down")
+                await run_blocking(
+                    self.store.update, self.name, phone,
+                    status="completed", attempts=attempts + 1, outcome="unknown", claimed_until=0,
+                )
+                return
+            logger.info(f"campaign {self.name}: call to {phone} is still in progress in {room}")
+        else:
+            room = f"{self.room_prefix}_{phone}_{utils.shortuuid()}"
+            await run_blocking(self.store.update, self.name, phone, room=room)
+            metadata = {"campaign": self.name, "phone": phone, "target": json.loads(json_util.dumps(payload))}
+            if self.tenant:
+                metadata["tenant"] = self.tenant
+            await self._lkapi.agent_dispatch.create_dispatch(
+                api.CreateAgentDispatchRequest(agent_name=self.agent_name, room=room, metadata=json.dumps(metadata))
+            )
+
+            await trunk.pace()
+            try:
+                await self._lkapi.sip.create_sip_participant(
+                    CreateSIPParticipantRequest(
+                        sip_trunk_id=trunk.trunk_id,
+                        sip_call_to=phone,
+                        room_name=room,
+                        participant_identity=f"sip_{phone}",
+                        participant_name=str(payload.get("name") or phone),
+                        ringing_timeout=Duration(seconds=self.ringing_timeout),
+                        wait_until_answered=True,
+                    )
+                )
+            except api.TwirpError as e:
+                await self._delete_room(room)
+                sip_status = e.metadata.get("sip_status_code", "")
+                if sip_status in _BUSY or sip_status in _NO_ANSWER:
+                    outcome = "busy" if sip_status in _BUSY else "no_answer"
+                    await self._retry_or_fail(phone, attempts, outcome)
+                elif sip_status:
+                    await run_blocking(
+                        self.store.update, self.name, phone,
+                        status="failed", attempts=attempts + 1, outcome=f"sip {sip_status}", claimed_until=0,
+                    )
+                else:
+                    # LiveKit itself failed, not the callee
+                    await self._retry_or_fail(phone, attempts, f"api {e.code}")
+                return
+            logger.info(f"campaign {self.name}: {phone} answered in {room}")
+
+        # keep the trunk slot (and the row's lease) until the call is over
+        while await self._room_active(room):
+            await run_blocking(
+                self.store.update, self.name, phone, claimed_until=time.time() + self.store.lease
+            )
+            await asyncio.sleep(self.poll_interval)
+        await run_blocking(
+            self.store.update, self.name, phone,
+            status="completed", attempts=attempts + 1, outcome="answered", claimed_until=0,
+        )
+
+    async def _retry_or_fail(self, phone: str, attempts: int, outcome: str):
+        attempts += 1
+        if attempts >= self.max_attempts:
+            logger.info(f"campaign {self.name}: giving up on {phone} after {attempts} attempts ({outcome})")
+            await run_blocking(
+                self.store.update, self.name, phone,
+                status="failed", attempts=attempts, outcome=outcome, claimed_until=0,
+            )
+            return
+        delay = min(self.base_backoff * (2 ** (attempts - 1)), self.max_backoff) * random.uniform(0.8, 1.2)
+        logger.info(f"campaign {self.name}: {phone} {outcome}, retrying in {delay:.0f}s")
+        await run_blocking(
+            self.store.update, self.name, phone,
+            status="pending", attempts=attempts, outcome=outcome,
+            next_attempt_at=time.time() + delay, claimed_until=0, room=None,
+        )
+
+    async def _delete_room(self, room: str):
+        try:
+            await self._lkapi.room.delete_room(api.DeleteRoomRequest(room=room))
+        except Exception:
+            pass
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(30)
+            counts = await run_blocking(self.store.counts, self.name)
+            active = {t.trunk_id: t.active for t in self.trunks}
+            logger.info(f"campaign {self.name}: {counts}, active calls per trunk {active}")
+
+    async def run(self):
+        self._lkapi = api.LiveKitAPI()
+        loader = asyncio.create_task(self._load())
+        reporter = asyncio.create_task(self._report())
+        dialers = [
+            asyncio.create_task(self._dialer(trunk))
+            for trunk in self.trunks
+            for _ in range(trunk.max_concurrent)
+        ]
+        try:
+            await self._feed()
+            await self._queue.join()
+            await loader
+        finally:
+            for task in [reporter, *dialers]:
+                task.cancel()
+            await self._lkapi.aclose()
+        counts = await run_blocking(self.store.counts, self.name)
+        logger.info(f"campaign {self.name} finished: {counts}")
+        return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run an outbound call campaign")
+    parser.add_argument("--name", required=True, help="campaign name; rerun with the same name to resume")
+    parser.add_argument("--source", choices=["mongo", "csv"], default="mongo")
+    parser.add_argument("--filter", default="{}", help="Mongo filter on customer_info, as JSON")
+    parser.add_argument("--csv", help="CSV file with a mobile or phone column")
+    parser.add_argument(
+        "--trunk", action="append", required=True,
+        help="TRUNK_ID[:MAX_CONCURRENT[:CALLS_PER_SECOND]], repeat for several trunks",
+    )
+    parser.add_argument("--agent-name", required=True, help="agent to dispatch into each call")
+    parser.add_argument("--tenant", help="tenant profile passed in the dispatch metadata")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=600.0, help="first retry delay in seconds")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.source == "csv":
+        if not args.csv:
+            parser.error("--csv is required with --source csv")
+        source = functools.partial(csv_targets, args.csv, batch_size=args.batch_size)
+    else:
+        source = functools.partial(mongo_targets, json_util.loads(args.filter), batch_size=args.batch_size)
+
+    runner = CampaignRunner(
+        args.name,
+        source,
+        [Trunk.parse(spec) for spec in args.trunk],
+        args.agent_name,
+        tenant=args.tenant,
+        max_attempts=args.max_attempts,
+        base_backoff=args.backoff,
+    )
+    asyncio.run(runner.run())
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger("voice-agent")
+
+
+class ComplaintNumberAllocator:
+    """
+    Hands out unique, short complaint numbers from pre-reserved blocks (hi/lo).
+
+    Each block is claimed with a single atomic counter update in MongoDB, after which
+    numbers are served from memory with no database round trip until the block runs
+    out. Numbers start at `start` so they never overlap the legacy 3-4 digit random
+    numbers, and are backed by the unique `complaint_seq` index.
+    """
+
+    def __init__(
+        self,
+        repository,
+        counter_name: str = "complaint_number",
+        block_size: int | None = None,
+        start: int = 10000,
+    ):
+        self._repository = repository
+        self._counter_name = counter_name
+        self._block_size = block_size or int(os.getenv("COMPLAINT_NUMBER_BLOCK_SIZE", "20"))
+        self._start = start
+        self._next = 0
+        self._end = 0
+        self._lock = None
+        self._lock_loop = None
+
+    def _get_lock(self):
+        # asyncio primitives bind to the loop they are first used on
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def _reserve_block(self):
+        end = await self._repository.reserve_sequence_block(
+            self._counter_name, self._block_size, start=self._start
+        )
+        logger.info(f"reserved complaint numbers {end - self._block_size}-{end - 1}")
+        return end - self._block_size, end
+
+    async def reserve(self):
+        """
+        Reserves a block ahead of time, e.g. while the caller is still being greeted,
+        so the first allocation of the call is served from memory.
+        """
+        async with self._get_lock():
+            if self._next >= self._end:
+                self._next, self._end = await self._reserve_block()
+
+    async def next_number(self) -> tuple[str, int]:
+        """
+        Returns the next complaint number.
+
+        Returns:
+            tuple[str, int]: The speakable complaint number and its integer sequence
+            value (stored as `complaint_seq`).
+        """
+        async with self._get_lock():
+            if self._next >= self._end:
+                self._next, self._end = await self._reserve_block()
+            seq = self._next
+            self._next += 1
+        return str(seq), seq
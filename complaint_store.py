@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import os
+
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient, ReturnDocument
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger("voice-agent")
+
+
+class ComplaintRepository:
+    """
+    Process-wide async access to the customer_service.customer_info collection.
+
+    A single instance is created in `prewarm` and shared by every job that runs in
+    the worker process, so all database work goes over the same pooled connections
+    instead of a fresh MongoClient per query.
+    """
+
+    def __init__(
+        self,
+        mongo_url: str | None = None,
+        db_name: str = "customer_service",
+        collection_name: str = "customer_info",
+        counters_collection_name: str = "counters",
+        max_pool_size: int | None = None,
+        min_pool_size: int | None = None,
+    ):
+        self._mongo_url = mongo_url or os.getenv("MONGO_URI")
+        self._db_name = db_name
+        self._collection_name = collection_name
+        self._counters_collection_name = counters_collection_name
+        self._max_pool_size = max_pool_size or int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+        self._min_pool_size = min_pool_size or int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+        self._client = None
+        self._loop = None
+        self._indexes_ready = False
+
+    @property
+    def client(self) -> AsyncMongoClient:
+        """
+        The pooled client, created lazily on the event loop that first uses it.
+
+        The async driver is bound to one event loop, so the client is rebuilt if the
+        process later runs a job on a different loop. Jobs should `close()` it before
+        their loop ends; a client still open on a loop that is running elsewhere is
+        closed there.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if not self._mongo_url:
+                raise ValueError("MONGO_URI is not set in environment variables.")
+            if self._client is not None:
+                logger.info("event loop changed, recreating MongoDB client")
+                self._close_stale_client()
+            self._client = AsyncMongoClient(
+                self._mongo_url,
+                maxPoolSize=self._max_pool_size,
+                minPoolSize=self._min_pool_size,
+            )
+            self._loop = loop
+        return self._client
+
+    def _close_stale_client(self):
+        client, loop = self._client, self._loop
+        self._client, self._loop = None, None
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.close(), loop)
+        else:
+            # its monitor tasks ended with the loop, but the pooled sockets stay open
+            logger.warning("MongoDB client of a finished event loop was never closed")
+
+    @property
+    def collection(self):
+        return self.client[self._db_name][self._collection_name]
+
+    @property
+    def counters(self):
+        return self.client[self._db_name][self._counters_collection_name]
+
+    async def connect(self):
+        """
+        Open the pool and complete server selection ahead of the first query.
+
+        Safe to call from every job; only the first call does any real work.
+        """
+        try:
+            await self.client.admin.command("ping")
+        except Exception as e:
+            logger.error(f"Error connecting to MongoDB: {str(e)}")
+
+    async def ensure_indexes(self):
+        """
+        Creates the indexes the agents rely on. Idempotent; the worker runs it once
+        at startup through `ensure_indexes_at_startup`, not on every call.
+        """
+        if self._indexes_ready:
+            return
+        try:
+            await self.collection.create_index("complaint_number", name="complaint_number")
+            await self.collection.create_index(
+                [("mobile", ASCENDING), ("timestamp", DESCENDING)],
+                name="mobile_timestamp",
+            )
+            await self.collection.create_index("status", name="status")
+            # Allocated complaint numbers are unique; legacy random numbers have no
+            # complaint_seq and are left out of the constraint.
+            await self.collection.create_index(
+                "complaint_seq",
+                unique=True,
+                partialFilterExpression={"complaint_seq": {"$exists": True}},
+                name="complaint_seq_unique",
+            )
+            self._indexes_ready = True
+        except Exception as e:
+            logger.error(f"Error creating MongoDB indexes: {str(e)}")
+
+    async def reserve_sequence_block(self, name: str, size: int, start: int = 0) -> int:
+        """
+        Atomically reserves `size` values of the named counter in one round trip.
+
+        Args:
+            name (str): Counter name.
+            size (int): Number of values to reserve.
+            start (int): Value the counter starts from when it does not exist yet.
+
+        Returns:
+            int: The exclusive upper bound of the reserved block, i.e. the block is
+            `[end - size, end)`.
+        """
+        counter = await self.counters.find_one_and_update(
+            {"_id": name},
+            [{"$set": {"seq": {"$add": [{"$ifNull": ["$seq", start]}, size]}}}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return counter["seq"]
+
+    async def latest_for_mobile(self, mobile_number: str):
+        """
+        Returns the most recent complaint for the given mobile number, or None.
+        """
+        return await self.collection.find_one(
+            {"mobile": mobile_number},
+            sort=[("timestamp", -1)],
+        )
+
+    async def insert_complaint(self, data: dict) -> str:
+        """
+        Inserts one validated complaint document.
+
+        Returns:
+            str: The ID of the inserted document.
+        """
+        result = await self.collection.insert_one(data)
+        return str(result.inserted_id)
+
+    async def insert_complaints(self, docs: list) -> int:
+        """
+        Inserts a batch of complaint documents with one unordered insert_many.
+
+        Documents carry their own `_id`, so re-delivering a batch that partially
+        succeeded is safe: duplicate-key errors for already stored documents are
+        ignored and any other write error is raised.
+
+        Returns:
+            int: The number of documents newly inserted.
+        """
+        try:
+            result = await self.collection.insert_many(docs, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != 11000 for err in errors):
+                raise
+            return e.details.get("nInserted", 0)
+
+    async def escalate_priority(self, complaint_number: str, timestamp, max_priority: int = 5):
+        """
+        Raises the priority of a pending complaint by one, capped at `max_priority`,
+        in a single atomic server-side update.
+
+        Legacy documents that store priority as a string are converted to an integer
+        as part of the same update. If several pending complaints share the number,
+        the most recent one is escalated.
+
+        Returns:
+            dict: The updated complaint document, or None if no pending complaint
+            has that number.
+        """
+        return await self.collection.find_one_and_update(
+            {"complaint_number": complaint_number, "status": "pending"},
+            [{"$set": {
+                "priority": {"$min": [
+                    {"$add": [{"$toInt": {"$ifNull": ["$priority", 1]}}, 1]},
+                    max_priority,
+                ]},
+                "timestamp": timestamp,
+            }}],
+            sort=[("timestamp", -1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+            self._loop = None
+
+
+def ensure_indexes_at_startup():
+    """
+    Creates the indexes from the worker's main process, before it takes any job.
+
+    Runs on its own event loop with its own client, closed before returning, so
+    the job processes start without it. Failures are logged, not raised.
+    """
+
+    async def _ensure():
+        repository = ComplaintRepository()
+        try:
+            await repository.ensure_indexes()
+        finally:
+            await repository.close()
+
+    asyncio.run(_ensure())
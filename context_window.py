@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+
+from livekit.agents import llm
+
+from intake import EXTRACTORS, QUESTIONS
+
+logger = logging.getLogger("voice-agent")
+
+
+def estimate_tokens(text: str) -> float:
+    """
+    Rough token count without a tokenizer: about 4 characters per token for
+    ASCII, while Devanagari/Gujarati and other non-ASCII text costs closer to a
+    token per character or two. ContextWindow rescales this against the token
+    counts the provider reports.
+    """
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return (len(text) - non_ascii) / 4 + non_ascii * 0.7
+
+
+def _message_text(msg: llm.ChatMessage) -> str:
+    if isinstance(msg.content, str):
+        text = msg.content
+    elif isinstance(msg.content, list):
+        text = " ".join(c for c in msg.content if isinstance(c, str))
+    else:
+        text = ""
+    if msg.tool_calls:
+        text += " ".join(f"{c.function_info.name}({json.dumps(c.arguments)})" for c in msg.tool_calls)
+    return text
+
+
+def _message_tokens(msg: llm.ChatMessage) -> float:
+    return estimate_tokens(_message_text(msg)) + 4  # role and framing overhead
+
+
+class ContextWindow:
+    """
+    Bounds the chat context sent to the LLM on every turn.
+
+    The leading system prompt and the last `max_turns` turns (a turn starts at a
+    user message and includes the replies and tool calls that follow it) are sent
+    verbatim. Older turns are folded into one short system message with the
+    complaint slots collected so far (name, address, product, issue) and any tool
+    results. If the context is still over `token_budget`, more turns are folded,
+    down to the latest one.
+
+    Use `before_llm_cb` as the VoicePipelineAgent's callback; `inner` is an
+    optional callback (e.g. IntakeFlow.before_llm_cb) that gets the bounded
+    context. A request made elsewhere with a context bounded by `trim` (a kept
+    speculative reply) is counted with `record`. Token counts per call are
+    logged by `aclose()`.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_turns: int | None = None,
+        token_budget: int | None = None,
+        inner=None,
+        slots=None,
+    ):
+        self._max_turns = max_turns or int(os.getenv("CONTEXT_MAX_TURNS", "6"))
+        self._token_budget = token_budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+        self._inner = inner
+        # callable returning slots known elsewhere, e.g. lambda: intake.slots
+        self._slots = slots
+        # provider-reported prompt tokens per estimated token, learned during the call
+        self._scale = 1.0
+        self._last_estimate = None
+        self._pending = None
+        self._attached = False
+        self.stats = {
+            "llm_requests": 0,
+            "estimated_prompt_tokens": 0,
+            "estimated_tokens_saved": 0,
+            "max_estimated_prompt_tokens": 0,
+            "folded_turns": 0,
+            "over_budget": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+        }
+
+    def _slots_from(self, messages: list[llm.ChatMessage]) -> dict:
+        """Recovers slots from folded turns: the caller's answer to each intake question."""
+        slots = {}
+        question = None
+        for msg in messages:
+            text = _message_text(msg)
+            if msg.role == "assistant":
+                question = next((slot for slot, q in QUESTIONS.items() if q.lower() in text.lower()), question)
+            elif msg.role == "user" and question is not None:
+                value, confidence = EXTRACTORS[question](text)
+                if value and confidence >= 0.6:
+                    slots[question] = value
+                question = None
+        return slots
+
+    def _summary(self, folded: list[llm.ChatMessage]) -> llm.ChatMessage:
+        slots = self._slots_from(folded)
+        if self._slots is not None:
+            slots.update(self._slots() or {})
+        lines = [f"{slot}: {value}" for slot, value in slots.items()]
+        lines += [f"{msg.name or 'tool'} result: {_message_text(msg)}" for msg in folded if msg.role == "tool"]
+        text = f"Summary of the earlier part of this call ({sum(m.role == 'user' for m in folded)} caller turns)."
+        if lines:
+            text += " Collected so far: " + "; ".join(lines) + "."
+        return llm.ChatMessage.create(role="system", text=text)
+
+    def _scaled(self, tokens: float) -> float:
+        return tokens * self._scale
+
+    def trim(self, chat_ctx: llm.ChatContext) -> llm.ChatContext:
+        """Bounds `chat_ctx` in place (the pipeline hands the callback a copy) and returns it."""
+        messages = chat_ctx.messages
+        head = 0
+        while head < len(messages) and messages[head].role == "system":
+            head += 1
+        prompt, history = messages[:head], messages[head:]
+        full = sum(_message_tokens(m) for m in messages)
+
+        turn_starts = [i for i, m in enumerate(history) if m.role == "user"]
+        keep = min(self._max_turns, len(turn_starts))
+        while True:
+            start = turn_starts[-keep] if keep else 0
+            folded, kept = history[:start], history[start:]
+            window = [*prompt, self._summary(folded), *kept] if folded else [*prompt, *kept]
+            tokens = sum(_message_tokens(m) for m in window)
+            if self._scaled(tokens) <= self._token_budget or keep <= 1:
+                break
+            keep -= 1
+
+        if self._scaled(tokens) > self._token_budget:
+            self.stats["over_budget"] += 1
+            logger.warning(
+                f"chat context is ~{self._scaled(tokens):.0f} tokens, over the {self._token_budget} token budget"
+            )
+
+        chat_ctx.messages[:] = window
+        self._pending = (tokens, full, len(turn_starts) - keep)
+        return chat_ctx
+
+    def record(self, agent):
+        """Counts an LLM request made with the context last bounded by `trim`."""
+        if not self._attached:
+            self._attach(agent)
+        tokens, full, folded_turns = self._pending
+        self._last_estimate = tokens
+        self.stats["llm_requests"] += 1
+        self.stats["estimated_prompt_tokens"] += round(self._scaled(tokens))
+        self.stats["estimated_tokens_saved"] += round(self._scaled(full - tokens))
+        self.stats["max_estimated_prompt_tokens"] = max(
+            self.stats["max_estimated_prompt_tokens"], round(self._scaled(tokens))
+        )
+        self.stats["folded_turns"] = max(self.stats["folded_turns"], folded_turns)
+
+    def _attach(self, agent):
+        self._attached = True
+
+        def _on_metrics_collected(metrics):
+            if type(metrics).__name__ != "PipelineLLMMetrics" or not metrics.prompt_tokens:
+                return
+            self.stats["prompt_tokens"] += metrics.prompt_tokens
+            self.stats["completion_tokens"] += metrics.completion_tokens
+            if self._last_estimate:
+                # calibrate the estimate to this provider's tokenizer and language
+                self._scale = 0.7 * self._scale + 0.3 * metrics.prompt_tokens / self._last_estimate
+
+        agent.on("metrics_collected", _on_metrics_collected)
+
+    async def before_llm_cb(self, agent, chat_ctx: llm.ChatContext):
+        if not self._attached:
+            self._attach(agent)
+        self.trim(chat_ctx)
+        if self._inner is None:
+            self.record(agent)
+            return agent.llm.chat(chat_ctx=chat_ctx, fnc_ctx=agent.fnc_ctx)
+
+        result = await self._inner(agent, chat_ctx)
+        # scripted replies (IntakeFlow) never reach the LLM, so don't count them
+        if result is None or getattr(result, "_llm", None) is agent.llm:
+            self.record(agent)
+        return result
+
+    async def aclose(self):
+        logger.info(f"chat context tokens for this call: {json.dumps(self.stats)}")
@@ -0,0 +1,363 @@
+import asyncio
+import logging
+import os
+import re
+
+from livekit.agents import APIConnectOptions, llm, utils
+from livekit.agents.pipeline.pipeline_agent import SpeechDataContextVar
+
+logger = logging.getLogger("voice-agent")
+
+# Slots in the order they are asked, with the argument names the submit tools use
+# for them (CustomerServiceFnc.submit_customer_info and
+# ComplaintIntakeFnc.summarize_customer_details)
+SLOT_ORDER = ["name", "address", "product", "issue"]
+_SLOT_ARGS = {
+    "name": ("name", "customer_name"),
+    "address": ("address", "customer_address"),
+    "product": ("product", "product_details"),
+    "issue": ("issue", "issue_faced"),
+}
+_SUBMIT_TOOLS = ("submit_customer_info", "summarize_customer_details")
+
+_DEFAULT_CONN_OPTIONS = APIConnectOptions()
+
+# The same questions the prompts tell the LLM to ask, one sentence each so they
+# are played from the TTS phrase cache
+QUESTIONS = {
+    "name": "May I have your name, please?",
+    "address": "Could you please provide your complete address?",
+    "product": "Could you please tell me if you have a gas geyser or electric water heater, and its model name?",
+    "issue": "Please describe the problem you're experiencing with your product.",
+}
+SUMMARY_INTRO = "I have collected the following information."
+CONFIRM_QUESTION = "Please confirm if everything is correct."
+CORRECTION_QUESTION = "Which detail should I correct: your name, address, product or issue?"
+DEFAULT_CLOSING = [
+    "Your complaint has been registered.",
+    "You will receive an SMS with your complaint number shortly.",
+    "Thank you for calling Benchmark Service Center. Goodbye!",
+]
+
+_FILLER = re.compile(r"^(?:(?:yes|yeah|ok|okay|sure|so|well|um+|uh+|hmm+|actually)\b[,.!]?\s*)+", re.I)
+_INTENT = re.compile(
+    r"\b(complaint|complain|register|problem|issue|not working|repair|service|broken|leak\w*|geyser|heater|fix)\b",
+    re.I,
+)
+_OFF_SCRIPT = re.compile(
+    r"\b(existing complaint|complaint number|previous complaint|old complaint|status|escalat\w*|"
+    r"already (?:registered|complained|called)|same (?:issue|problem|complaint)|"
+    r"human|real person|manager|supervisor|speak to|talk to|transfer)\b",
+    re.I,
+)
+_QUESTION = re.compile(r"^(what|why|how|when|where|who|can you|could you|do you|will you|is there)\b.*\?$", re.I)
+_NAME_LEAD = re.compile(r"\b(?:my name is|name is|this is|i am|i'm|it's|it is)\s+(.+)", re.I)
+_ADDRESS_LEAD = re.compile(r"^(?:my address is|address is|i live (?:at|in)|it's|it is)\s+", re.I)
+_PRODUCT_LEAD = re.compile(r"^(?:i have|i've got|i own|it's|it is|my product is)\s+(?:an?\s+|the\s+)?", re.I)
+_PRODUCT = re.compile(
+    r"\b(gas geyser|electric (?:water )?(?:heater|geyser)|solar (?:water )?heater|water heater|geyser|heater|boiler)\b",
+    re.I,
+)
+_YES = re.compile(r"\b(yes|yeah|yep|correct|right|confirm\w*|sure|okay|ok|fine|perfect|go ahead)\b", re.I)
+_NO = re.compile(r"\b(no|nope|wrong|incorrect|not correct|not right|change|mistake)\b", re.I)
+# a correction leads with the negation; "no changes" and the like confirm
+_NO_LEAD = re.compile(r"^\W*(no|nope|wrong|incorrect|not (?:correct|right)|that'?s (?:wrong|incorrect|not (?:correct|right)))\b", re.I)
+_ALL_GOOD = re.compile(
+    r"\b(no (?:changes?|problems?|issues?|corrections?|mistakes?)|nothing (?:to (?:change|correct)|(?:is )?wrong))\b",
+    re.I,
+)
+
+
+def _clean(text: str) -> str:
+    text = " ".join(text.split())
+    text = _FILLER.sub("", text)
+    return text.strip(" .,!")
+
+
+def extract_name(text: str) -> tuple[str, float]:
+    match = _NAME_LEAD.search(text)
+    value = _clean(match.group(1) if match else text)
+    words = value.split()
+    if match:
+        confidence = 0.9
+    else:
+        confidence = 0.7 if 1 <= len(words) <= 4 else 0.3
+    if any(ch.isdigit() for ch in value):
+        confidence = 0.2
+    return value.title(), confidence
+
+
+def extract_address(text: str) -> tuple[str, float]:
+    value = _ADDRESS_LEAD.sub("", _clean(text))
+    words = value.split()
+    if len(words) >= 4 or any(ch.isdigit() for ch in value):
+        return value, 0.9
+    return value, 0.6 if len(words) >= 2 else 0.3
+
+
+def extract_product(text: str) -> tuple[str, float]:
+    value = _PRODUCT_LEAD.sub("", _clean(text))
+    if _PRODUCT.search(value):
+        return value, 0.9
+    return value, 0.3
+
+
+def extract_issue(text: str) -> tuple[str, float]:
+    value = _clean(text)
+    words = value.split()
+    if len(words) >= 3:
+        return value, 0.9
+    return value, 0.6 if len(words) == 2 else 0.3
+
+
+def read_confirmation(text: str) -> bool | None:
+    """
+    True when the caller confirms the summary, False when they correct it and
+    None when it is unclear: a correction has to lead with the negation ("no,
+    the address...", "wrong", "not correct"), and an answer with both a yes and a
+    no in it is left to the LLM.
+    """
+    if _NO_LEAD.match(text):
+        return False
+    text = _ALL_GOOD.sub(" ", text)
+    if _YES.search(text) and not _NO.search(text):
+        return True
+    return None
+
+
+EXTRACTORS = {
+    "name": extract_name,
+    "address": extract_address,
+    "product": extract_product,
+    "issue": extract_issue,
+}
+
+
+def intake_phrases(closing: list[str] | None = None) -> list[str]:
+    """Fixed lines the flow speaks, for the TTS phrase cache."""
+    return [*QUESTIONS.values(), SUMMARY_INTRO, CONFIRM_QUESTION, CORRECTION_QUESTION, *(closing or DEFAULT_CLOSING)]
+
+
+class _ScriptedLLM(llm.LLM):
+    """Stands in for the LLM on scripted turns so they go through the normal reply path."""
+
+    def chat(self, *, chat_ctx, reply: str = "", conn_options=_DEFAULT_CONN_OPTIONS, **kwargs) -> "_ScriptedLLMStream":
+        return _ScriptedLLMStream(self, reply=reply, chat_ctx=chat_ctx, fnc_ctx=None, conn_options=conn_options)
+
+
+class _ScriptedLLMStream(llm.LLMStream):
+    def __init__(self, scripted_llm: _ScriptedLLM, *, reply: str, **kwargs):
+        self._reply = reply
+        super().__init__(scripted_llm, **kwargs)
+
+    async def _run(self):
+        self._event_ch.send_nowait(
+            llm.ChatChunk(
+                request_id=utils.shortuuid(),
+                choices=[llm.Choice(delta=llm.ChoiceDelta(role="assistant", content=self._reply))],
+            )
+        )
+
+
+class IntakeFlow:
+    """
+    Deterministic fast path for new-complaint calls.
+
+    Walks name -> address -> product -> issue -> confirm by extracting each slot
+    straight from the final transcript and answering with the fixed questions, so
+    an on-script call needs no LLM request at all. Pass `before_llm_cb` to the
+    VoicePipelineAgent. The LLM is used for a turn when an answer can't be
+    extracted with at least `min_confidence` (the flow then asks the LLM to
+    re-ask and stays on the slot), and takes over the rest of the call, with the
+    slots collected so far, when the caller goes off-script (existing complaint,
+    status, questions, asking for a person).
+
+    On confirmation the slots are passed to the tool set's submit function, whose
+    arguments define the slots, and `on_complete` (e.g. end_call) runs once the
+    closing lines have played.
+
+    A streaming TTS gets each speech as one segment, so a reply made of several
+    fixed lines would never match the phrase cache. The scripted reply carries
+    the first line and the rest are queued with `say()` as soon as it starts
+    playing, which plays them right after it, one speech per line.
+    """
+
+    def __init__(
+        self,
+        fnc_ctx: llm.FunctionContext,
+        *,
+        closing: list[str] | None = None,
+        on_complete=None,
+        min_confidence: float | None = None,
+    ):
+        self._fnc_ctx = fnc_ctx
+        submit = next((fnc_ctx.ai_functions[n] for n in _SUBMIT_TOOLS if n in fnc_ctx.ai_functions), None)
+        if submit is None:
+            raise ValueError(f"{type(fnc_ctx).__name__} has none of the submit tools {_SUBMIT_TOOLS}")
+        self._submit = submit
+        self._args = {}
+        for slot in SLOT_ORDER:
+            arg = next((a for a in _SLOT_ARGS[slot] if a in submit.arguments), None)
+            if arg is None:
+                raise ValueError(f"{submit.name} has no argument for the {slot} slot")
+            self._args[slot] = arg
+
+        self._closing = closing or DEFAULT_CLOSING
+        self._on_complete = on_complete
+        self._min_confidence = min_confidence or float(os.getenv("INTAKE_MIN_CONFIDENCE", "0.6"))
+        self._scripted_llm = _ScriptedLLM()
+        self._attached = False
+        self._follow_ups = []
+        self._reply_id = None
+
+        self.slots = {}
+        self.step = "start"
+        self._return_to_confirm = False
+        self.stats = {"scripted_turns": 0, "llm_turns": 0, "low_confidence": 0, "off_script": 0, "completed": 0}
+
+    @property
+    def active(self) -> bool:
+        return self.step not in ("llm", "done")
+
+    def _next_step(self) -> str:
+        if self._return_to_confirm:
+            return "confirm"
+        return next((slot for slot in SLOT_ORDER if slot not in self.slots), "confirm")
+
+    def _ask(self, step: str) -> list[str]:
+        self.step = step
+        if step == "confirm":
+            self._return_to_confirm = False
+            summary = " ".join(f"{slot.capitalize()}: {self.slots[slot]}." for slot in SLOT_ORDER)
+            return [SUMMARY_INTRO, summary, CONFIRM_QUESTION]
+        return [QUESTIONS[step]]
+
+    def _slot_note(self) -> str:
+        collected = ", ".join(f"{slot}={self.slots[slot]!r}" for slot in SLOT_ORDER if slot in self.slots)
+        return f"Details already collected from the caller: {collected or 'none'}."
+
+    def _with_note(self, chat_ctx: llm.ChatContext, note: str) -> llm.ChatContext:
+        # the note goes just before the caller's latest message
+        chat_ctx.messages.insert(len(chat_ctx.messages) - 1, llm.ChatMessage.create(role="system", text=note))
+        return chat_ctx
+
+    def _scripted(self, chat_ctx: llm.ChatContext, lines: list[str]) -> llm.LLMStream:
+        self.stats["scripted_turns"] += 1
+        # the reply being synthesized; its follow-up lines wait for it to start playing
+        self._reply_id = SpeechDataContextVar.get().sequence_id
+        self._follow_ups = lines[1:]
+        return self._scripted_llm.chat(chat_ctx=chat_ctx, reply=lines[0])
+
+    def _llm_turn(self, agent, chat_ctx: llm.ChatContext, note: str, tools: bool = True) -> llm.LLMStream:
+        self.stats["llm_turns"] += 1
+        return agent.llm.chat(chat_ctx=self._with_note(chat_ctx, note), fnc_ctx=agent.fnc_ctx if tools else None)
+
+    def _hand_over(self, agent, chat_ctx: llm.ChatContext, reason: str) -> llm.LLMStream:
+        logger.info(f"intake handing over to the LLM at step {self.step}: {reason}")
+        self.stats["off_script"] += 1
+        self.step = "llm"
+        return self._llm_turn(
+            agent,
+            chat_ctx,
+            f"{self._slot_note()} Continue from here following your instructions and don't ask again "
+            "for details that were already collected.",
+        )
+
+    def _attach(self, agent):
+        self._attached = True
+
+        def _on_agent_speech_committed(msg):
+            if self.step == "done" and self._on_complete is not None and self._closing[-1] in str(msg.content):
+                on_complete, self._on_complete = self._on_complete, None
+                asyncio.create_task(on_complete())
+
+        def _on_agent_started_speaking():
+            playing = agent._playing_speech
+            if not self._follow_ups or playing is None or playing.id != self._reply_id:
+                return
+            lines, self._follow_ups = self._follow_ups, []
+
+            async def _say_lines():
+                # said while the reply plays, each line is nested after it in order
+                for line in lines:
+                    await agent.say(line, allow_interruptions=playing.allow_interruptions)
+
+            asyncio.create_task(_say_lines())
+
+        agent.on("agent_speech_committed", _on_agent_speech_committed)
+        agent.on("agent_started_speaking", _on_agent_started_speaking)
+
+    async def before_llm_cb(self, agent, chat_ctx: llm.ChatContext):
+        if not self._attached:
+            self._attach(agent)
+        if not self.active:
+            return None
+
+        last = chat_ctx.messages[-1] if chat_ctx.messages else None
+        text = str(last.content or "") if last is not None and last.role == "user" else ""
+        text = " ".join(text.split())
+        if not text or text == "<continue>":
+            return None
+
+        if _OFF_SCRIPT.search(text):
+            return self._hand_over(agent, chat_ctx, "caller went off-script")
+        if self.step in SLOT_ORDER and self.step != "issue" and _QUESTION.match(text):
+            return self._hand_over(agent, chat_ctx, "caller asked a question")
+
+        if self.step == "start":
+            if not _INTENT.search(text):
+                return self._hand_over(agent, chat_ctx, "no new-complaint intent")
+            return self._scripted(chat_ctx, self._ask(self._next_step()))
+
+        if self.step == "confirm":
+            return await self._confirm(agent, chat_ctx, text)
+
+        if self.step == "correct":
+            slot = next((s for s in SLOT_ORDER if s in text.lower()), None)
+            if slot is None:
+                return self._hand_over(agent, chat_ctx, "unclear correction")
+            self._return_to_confirm = True
+            return self._scripted(chat_ctx, self._ask(slot))
+
+        value, confidence = EXTRACTORS[self.step](text)
+        if confidence < self._min_confidence or not value:
+            self.stats["low_confidence"] += 1
+            logger.info(f"intake {self.step} extraction confidence {confidence:.2f}, asking the LLM")
+            return self._llm_turn(
+                agent,
+                chat_ctx,
+                f"{self._slot_note()} You asked for the caller's {self.step} and the answer was unclear. "
+                f"Ask for their {self.step} again in one short sentence.",
+                tools=False,
+            )
+
+        self.slots[self.step] = value
+        return self._scripted(chat_ctx, self._ask(self._next_step()))
+
+    async def _confirm(self, agent, chat_ctx: llm.ChatContext, text: str):
+        confirmed = read_confirmation(text)
+        if confirmed is False:
+            # "no, the address is wrong" names the slot straight away
+            slot = next((s for s in SLOT_ORDER if s in text.lower()), None)
+            if slot is not None:
+                self._return_to_confirm = True
+                return self._scripted(chat_ctx, self._ask(slot))
+            self.step = "correct"
+            return self._scripted(chat_ctx, [CORRECTION_QUESTION])
+        if confirmed is None:
+            return self._hand_over(agent, chat_ctx, "unclear confirmation")
+
+        try:
+            result = self._submit.callable(**{self._args[s]: self.slots[s] for s in SLOT_ORDER})
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception:
+            logger.exception("intake submission failed")
+            return self._hand_over(agent, chat_ctx, "submission failed")
+        self.stats["completed"] += 1
+        self.step = "done"
+        logger.info(f"intake completed: {self.stats}")
+        return self._scripted(chat_ctx, self._closing)
+
+    async def aclose(self):
+        logger.info(f"intake stats at step {self.step}: {self.stats}")
@@ -0,0 +1,412 @@
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from blocking_io import run_blocking
+from loop_watchdog import current_watchdog
+
+logger = logging.getLogger("voice-agent")
+
+# Per-turn latencies derived from the raw timestamps, in seconds
+STAGES = {
+    "response": ("user_speech_end", "playout_start"),
+    "transcript": ("user_speech_end", "final_transcript"),
+    "end_of_turn": ("user_speech_end", "end_of_turn"),
+    "llm_ttft": ("llm_start", "llm_first_token"),
+    "tool": ("tool_start", "tool_end"),
+    "tts_ttfb": ("tts_start", "tts_first_byte"),
+    "first_audio": ("call_start", "playout_start"),
+}
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q * (len(values) - 1))))
+    return values[index]
+
+
+def turn_latencies(turn: dict) -> dict:
+    """Computes the STAGES latencies that a turn has both timestamps for."""
+    latencies = {}
+    for stage, (start, end) in STAGES.items():
+        if turn.get(start) is not None and turn.get(end) is not None:
+            latencies[stage] = turn[end] - turn[start]
+    return latencies
+
+
+class LatencyStats:
+    """
+    Rolling p50/p95/p99 of per-turn latencies over the last `window` turns.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._window = window
+        self._values = {stage: deque(maxlen=window) for stage in STAGES}
+
+    def add(self, latencies: dict):
+        for stage, value in latencies.items():
+            self._values.setdefault(stage, deque(maxlen=self._window)).append(value)
+
+    def summary(self) -> dict:
+        return {
+            stage: {
+                "count": len(values),
+                "p50": percentile(values, 0.50),
+                "p95": percentile(values, 0.95),
+                "p99": percentile(values, 0.99),
+            }
+            for stage, values in self._values.items()
+            if values
+        }
+
+
+# Aggregates for the calls handled by this process
+process_stats = LatencyStats()
+
+
+class CallTracer:
+    """
+    Records per-turn timestamps for one VoicePipelineAgent call and writes them as
+    JSONL (one line per turn, then a call summary) to TRACE_DIR.
+
+    Timestamps are wall-clock seconds: end of user speech, final transcript, end of
+    turn decision, LLM request start and first token, tool start/end, TTS request
+    start and first byte, and playout start. The greeting is recorded as turn 0,
+    measured from the start of the call.
+
+    Event-loop blocks reported by the LoopWatchdog are written as `loop_block`
+    lines, and the longest one in a turn is reported as its `loop_block` latency.
+    Tool calls reported by the ToolRunner are written as `tool_call` lines; their
+    arguments (caller details) only with TRACE_TOOL_ARGS=1, as replay.py needs.
+    With a SpeculativeReply, the call summary has its hit rate and wasted tokens.
+    """
+
+    def __init__(
+        self,
+        agent,
+        *,
+        call_id: str,
+        room_name: str,
+        tenant: str = "",
+        language: str = "",
+        speculative=None,
+        trace_dir: str | None = None,
+    ):
+        self.call_id = call_id
+        self.room_name = room_name
+        self.tenant = tenant
+        self.language = language
+        self.speculative = speculative
+        trace_dir = trace_dir or os.getenv("TRACE_DIR", "traces")
+        self.path = os.path.join(trace_dir, time.strftime("%Y-%m-%d"), f"{call_id}.jsonl")
+        self.call_start = time.time()
+        self._turns = []
+        self._turn = None
+        self._pending_lines = []
+        self._loop_blocks = []
+        self._new_turn(call_start=self.call_start)
+
+        agent.on("user_stopped_speaking", self._on_user_stopped_speaking)
+        agent.on("user_speech_committed", self._on_user_speech_committed)
+        agent.on("function_calls_collected", self._on_function_calls_collected)
+        agent.on("function_calls_finished", self._on_function_calls_finished)
+        agent.on("agent_started_speaking", self._on_agent_started_speaking)
+        agent.on("agent_speech_interrupted", self._on_agent_speech_interrupted)
+        agent.on("metrics_collected", self._on_metrics_collected)
+
+    def _new_turn(self, **fields):
+        if self._turn is not None:
+            self._finish_turn()
+        self._turn = {"turn": len(self._turns), **fields}
+
+    def _finish_turn(self):
+        turn = self._turn
+        turn["latency"] = turn_latencies(turn)
+        if turn.get("loop_block_ms"):
+            turn["latency"]["loop_block"] = turn["loop_block_ms"] / 1000
+        process_stats.add(turn["latency"])
+        self._turns.append(turn)
+        self._pending_lines.append({"type": "turn", "call_id": self.call_id, **turn})
+        self._turn = None
+
+    def _set_once(self, field, value):
+        if self._turn is not None and self._turn.get(field) is None:
+            self._turn[field] = value
+
+    def _on_user_stopped_speaking(self, *args):
+        turn = self._turn
+        if turn is not None and turn.get("user_speech_end") is not None and turn.get("playout_start") is None:
+            # the caller paused and carried on before the agent replied: same turn,
+            # measured from the last end of speech
+            turn["user_speech_end"] = time.time()
+            return
+        self._new_turn(user_speech_end=time.time())
+
+    def _on_user_speech_committed(self, msg, *args):
+        self._set_once("committed", time.time())
+        self._set_once("transcript_chars", len(msg.content) if isinstance(msg.content, str) else None)
+
+    def _on_function_calls_collected(self, fnc_calls, *args):
+        if self._turn is None:
+            return
+        self._set_once("tool_start", time.time())
+        self._turn.setdefault("tools", []).extend(call.function_info.name for call in fnc_calls)
+
+    def _on_function_calls_finished(self, called_fncs, *args):
+        if self._turn is not None:
+            self._turn["tool_end"] = time.time()
+
+    def _on_agent_started_speaking(self, *args):
+        self._set_once("playout_start", time.time())
+
+    def _on_agent_speech_interrupted(self, *args):
+        self._set_once("interrupted", time.time())
+
+    def _on_metrics_collected(self, metrics, *args):
+        if self._turn is None:
+            return
+        name = type(metrics).__name__
+        if name == "PipelineEOUMetrics":
+            speech_end = self._turn.get("user_speech_end") or metrics.timestamp - metrics.end_of_utterance_delay
+            self._set_once("final_transcript", speech_end + metrics.transcription_delay)
+            self._set_once("end_of_turn", speech_end + metrics.end_of_utterance_delay)
+        elif name == "PipelineLLMMetrics":
+            llm_start = metrics.timestamp - metrics.duration
+            self._set_once("llm_start", llm_start)
+            self._set_once("llm_first_token", llm_start + metrics.ttft)
+            self._turn["prompt_tokens"] = self._turn.get("prompt_tokens", 0) + metrics.prompt_tokens
+            self._turn["completion_tokens"] = self._turn.get("completion_tokens", 0) + metrics.completion_tokens
+        elif name == "PipelineTTSMetrics" and metrics.ttfb >= 0:
+            tts_start = metrics.timestamp - metrics.duration
+            self._set_once("tts_start", tts_start)
+            self._set_once("tts_first_byte", tts_start + metrics.ttfb)
+        if self._pending_lines:
+            # finished turns are written out in the background as the call goes on
+            asyncio.create_task(self.flush())
+
+    def record_loop_block(self, record: dict):
+        self._loop_blocks.append(record["blocked_ms"])
+        if self._turn is not None:
+            self._turn["loop_block_ms"] = max(self._turn.get("loop_block_ms", 0), record["blocked_ms"])
+        self._pending_lines.append({"type": "loop_block", "call_id": self.call_id, **record})
+
+    def record_tool_call(self, record: dict):
+        if os.getenv("TRACE_TOOL_ARGS", "0") != "1":
+            record = {k: v for k, v in record.items() if k != "arguments"}
+        self._pending_lines.append({"type": "tool_call", "call_id": self.call_id, "turn": len(self._turns), **record})
+
+    def _write(self, lines):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for line in lines:
+                f.write(json.dumps(line, default=str) + "\n")
+
+    async def flush(self):
+        lines, self._pending_lines = self._pending_lines, []
+        if lines:
+            await run_blocking(self._write, lines)
+
+    def summary(self) -> dict:
+        stats = LatencyStats()
+        for turn in self._turns:
+            stats.add(turn["latency"])
+        return {
+            "type": "call",
+            "call_id": self.call_id,
+            "room": self.room_name,
+            "tenant": self.tenant,
+            "language": self.language,
+            "call_start": self.call_start,
+            "call_end": time.time(),
+            "turns": len(self._turns),
+            "latency": stats.summary(),
+            "loop_blocks": len(self._loop_blocks),
+            "max_loop_block_ms": max(self._loop_blocks, default=0),
+            "speculative": self.speculative.summary() if self.speculative is not None and self.speculative.enabled else None,
+        }
+
+    async def aclose(self):
+        if self._turn is not None:
+            self._finish_turn()
+        summary = self.summary()
+        self._pending_lines.append(summary)
+        await self.flush()
+        logger.info(f"call latency summary: {json.dumps(summary['latency'])}")
+        logger.info(f"process latency summary: {json.dumps(process_stats.summary())}")
+
+
+def trace_call(ctx, agent, tenant: str = "", language: str = "", tool_runner=None, speculative=None) -> CallTracer:
+    """
+    Attaches a CallTracer to a VoicePipelineAgent (and its ToolRunner and
+    SpeculativeReply, if any) for the job and flushes the trace when the job
+    shuts down.
+    """
+    tracer = CallTracer(
+        agent,
+        call_id=f"{ctx.job.room.name}-{ctx.job.id}",
+        room_name=ctx.job.room.name,
+        tenant=tenant,
+        language=language,
+        speculative=speculative,
+    )
+    ctx.add_shutdown_callback(lambda: tracer.aclose())
+    if tool_runner is not None:
+        tool_runner.add_listener(tracer.record_tool_call)
+    watchdog = current_watchdog()
+    if watchdog is not None:
+        watchdog.add_listener(tracer.record_loop_block)
+
+        async def _detach():
+            watchdog.remove_listener(tracer.record_loop_block)
+
+        ctx.add_shutdown_callback(_detach)
+    return tracer
+
+
+def read_records(path: str) -> list:
+    """
+    The records of one JSONL trace. The worker may still be appending to it, so a
+    line that does not parse (yet) is skipped.
+    """
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def _load(trace_dir: str, record_type: str, window: float | None, *time_fields: str) -> list:
+    cutoff = time.time() - window if window else 0
+    records = []
+    for path in glob.glob(os.path.join(trace_dir, "*", "*.jsonl")):
+        if os.path.getmtime(path) < cutoff:
+            continue
+        for record in read_records(path):
+            if record.get("type") == record_type and next((record[f] for f in time_fields if record.get(f)), 0) >= cutoff:
+                records.append(record)
+    return records
+
+
+def load_turns(trace_dir: str, window: float | None = None) -> list:
+    """Reads turn records from the JSONL traces, optionally only the last `window` seconds."""
+    return _load(trace_dir, "turn", window, "user_speech_end", "call_start")
+
+
+def load_calls(trace_dir: str, window: float | None = None) -> list:
+    """Reads the call summaries, optionally only of calls that ended in the last `window` seconds."""
+    return _load(trace_dir, "call", window, "call_end")
+
+
+_SPECULATIVE_COUNTS = ("speculations", "hits", "misses", "superseded", "wasted_prompt_tokens", "wasted_completion_tokens")
+
+
+def speculative_totals(trace_dir: str, window: float | None = None) -> dict:
+    """Speculative LLM counts summed per (tenant, language), to tune the threshold per language."""
+    totals = {}
+    for call in load_calls(trace_dir, window):
+        stats = call.get("speculative")
+        if not stats:
+            continue
+        total = totals.setdefault((call.get("tenant", ""), call.get("language", "")), dict.fromkeys(_SPECULATIVE_COUNTS, 0))
+        for key in _SPECULATIVE_COUNTS:
+            total[key] += stats.get(key, 0)
+    return totals
+
+
+def aggregate(trace_dir: str, window: float | None = None) -> dict:
+    stats = LatencyStats(window=1_000_000)
+    for turn in load_turns(trace_dir, window):
+        stats.add(turn.get("latency") or turn_latencies(turn))
+    return stats.summary()
+
+
+def _prometheus(summary: dict) -> str:
+    lines = [
+        "# HELP voice_turn_latency_seconds Per-turn voice pipeline latency by stage",
+        "# TYPE voice_turn_latency_seconds summary",
+    ]
+    for stage, values in summary.items():
+        for q in ("p50", "p95", "p99"):
+            quantile = {"p50": "0.5", "p95": "0.95", "p99": "0.99"}[q]
+            lines.append(f'voice_turn_latency_seconds{{stage="{stage}",quantile="{quantile}"}} {values[q]}')
+        lines.append(f'voice_turn_latency_seconds_count{{stage="{stage}"}} {values["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+def _prometheus_speculative(totals: dict) -> str:
+    totals = sorted(totals.items())
+    lines = [
+        "# HELP voice_speculative_llm_requests Speculative LLM requests by outcome",
+        "# TYPE voice_speculative_llm_requests gauge",
+    ]
+    for (tenant, language), total in totals:
+        for outcome, key in (("all", "speculations"), ("hit", "hits"), ("miss", "misses"), ("superseded", "superseded")):
+            lines.append(f'voice_speculative_llm_requests{{tenant="{tenant}",language="{language}",outcome="{outcome}"}} {total[key]}')
+    lines += [
+        "# HELP voice_speculative_llm_hit_ratio Share of speculative LLM requests whose reply was used",
+        "# TYPE voice_speculative_llm_hit_ratio gauge",
+    ]
+    for (tenant, language), total in totals:
+        if total["speculations"]:
+            lines.append(f'voice_speculative_llm_hit_ratio{{tenant="{tenant}",language="{language}"}} {total["hits"] / total["speculations"]:.3f}')
+    lines += [
+        "# HELP voice_speculative_llm_wasted_tokens Tokens of speculative LLM requests that were thrown away",
+        "# TYPE voice_speculative_llm_wasted_tokens gauge",
+    ]
+    for (tenant, language), total in totals:
+        for kind in ("prompt", "completion"):
+            lines.append(f'voice_speculative_llm_wasted_tokens{{tenant="{tenant}",language="{language}",kind="{kind}"}} {total[f"wasted_{kind}_tokens"]}')
+    return "\n".join(lines) + "\n"
+
+
+def serve(trace_dir: str, port: int, window: float):
+    """
+    Serves rolling aggregates over the traces as Prometheus text on /metrics:
+    latencies by stage, and speculative LLM counts by tenant and language.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            summary = aggregate(trace_dir, window)
+            if self.path.startswith("/metrics"):
+                body = _prometheus(summary) + _prometheus_speculative(speculative_totals(trace_dir, window))
+                content_type = "text/plain; version=0.0.4"
+            else:
+                body, content_type = json.dumps(summary, indent=2), "application/json"
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    print(f"serving latency aggregates from {trace_dir} on :{port} (/metrics, /summary)")
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency aggregates over the per-call voice traces")
+    parser.add_argument("command", choices=["summary", "serve"])
+    parser.add_argument("--trace-dir", default=os.getenv("TRACE_DIR", "traces"))
+    parser.add_argument("--window", type=float, default=900, help="only use turns from the last N seconds (0 for all)")
+    parser.add_argument("--port", type=int, default=9400)
+    args = parser.parse_args()
+
+    if args.command == "summary":
+        print(json.dumps(aggregate(args.trace_dir, args.window or None), indent=2))
+    else:
+        serve(args.trace_dir, args.port, args.window or None)
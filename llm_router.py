@@ -0,0 +1,269 @@
+import asyncio
+import dataclasses
+import logging
+import os
+import time
+from collections import deque
+
+from livekit.agents import APIConnectionError, APIConnectOptions, APIError, llm, utils
+
+from latency_trace import percentile
+
+logger = logging.getLogger("voice-agent")
+
+_DEFAULT_CONN_OPTIONS = APIConnectOptions()
+
+
+class _Provider:
+    """Rolling time-to-first-token and health of one routed LLM."""
+
+    def __init__(self, name: str, client: llm.LLM, window: int):
+        self.name = name
+        self.llm = client
+        self._ttft = deque(maxlen=window)
+        self.failures = 0
+        self.down_until = 0.0
+
+    @property
+    def ttft(self) -> float | None:
+        return percentile(self._ttft, 0.5)
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def record_ttft(self, seconds: float):
+        self._ttft.append(seconds)
+        if self.failures:
+            logger.info(f"LLM provider {self.name} recovered after {self.failures} failures")
+        self.failures = 0
+
+    def record_lost(self, seconds: float, hedge_after: float):
+        # A cancelled request only tells us its first token is slower than this, so
+        # it is kept as a lower bound when that is news: above the median, or above
+        # the hedge delay before there are samples. A hedge cancelled 0.1s after it
+        # was sent says nothing and must not rank the provider fastest.
+        if seconds > (self.ttft if self.ttft is not None else hedge_after):
+            self._ttft.append(seconds)
+
+    def record_failure(self, cooldown: float):
+        self.failures += 1
+        # back off for longer while the provider keeps failing (rate limits, outages)
+        self.down_until = time.monotonic() + min(300.0, cooldown * 2 ** (self.failures - 1))
+
+
+class RoutingLLM(llm.LLM):
+    """
+    Routes each request to the fastest healthy LLM among `llms`.
+
+    Providers are ranked by their rolling median time-to-first-token (providers
+    with no samples yet are tried first, so every one gets measured). If the first
+    token hasn't arrived after `hedge_after` seconds (LLM_HEDGE_AFTER, default 1.0),
+    the same request is sent to the next provider and whichever streams first wins;
+    the other request is cancelled. A provider that fails before its first token
+    is skipped for `cooldown` seconds, doubling while it keeps failing, and the
+    request fails over to the next one. Once tokens have been relayed a failure is
+    raised as is, since the reply can't be restarted.
+    """
+
+    def __init__(
+        self,
+        llms: list[llm.LLM],
+        *,
+        names: list[str] | None = None,
+        hedge_after: float | None = None,
+        attempt_timeout: float = 10.0,
+        cooldown: float = 15.0,
+        window: int = 20,
+    ):
+        if not llms:
+            raise ValueError("RoutingLLM needs at least one LLM")
+        super().__init__(
+            capabilities=llm.LLMCapabilities(
+                supports_choices_on_int=all(c.capabilities.supports_choices_on_int for c in llms),
+                requires_persistent_functions=all(c.capabilities.requires_persistent_functions for c in llms),
+            )
+        )
+        names = names or [c.label for c in llms]
+        names = [n if names.count(n) == 1 else f"{n}#{i}" for i, n in enumerate(names)]
+        self._providers = [_Provider(name, client, window) for name, client in zip(names, llms)]
+        self._hedge_after = hedge_after if hedge_after is not None else float(os.getenv("LLM_HEDGE_AFTER", "1.0"))
+        self._attempt_timeout = attempt_timeout
+        self._cooldown = cooldown
+        self.stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0, "wins": {}}
+
+    @property
+    def llms(self) -> list[llm.LLM]:
+        return [p.llm for p in self._providers]
+
+    def ranked(self) -> list[_Provider]:
+        """Healthy providers fastest first, then the ones cooling down as a last resort."""
+        healthy = [p for p in self._providers if p.healthy]
+        down = sorted((p for p in self._providers if not p.healthy), key=lambda p: p.down_until)
+        return sorted(healthy, key=lambda p: (p.ttft is not None, p.ttft or 0.0)) + down
+
+    def summary(self) -> dict:
+        return {
+            **self.stats,
+            "providers": {
+                p.name: {"ttft_p50": p.ttft, "healthy": p.healthy, "failures": p.failures}
+                for p in self._providers
+            },
+        }
+
+    def chat(
+        self,
+        *,
+        chat_ctx: llm.ChatContext,
+        conn_options: APIConnectOptions = _DEFAULT_CONN_OPTIONS,
+        fnc_ctx: llm.FunctionContext | None = None,
+        temperature: float | None = None,
+        n: int | None = 1,
+        parallel_tool_calls: bool | None = None,
+        tool_choice=None,
+    ) -> "RoutedLLMStream":
+        return RoutedLLMStream(
+            self,
+            chat_ctx=chat_ctx,
+            fnc_ctx=fnc_ctx,
+            conn_options=dataclasses.replace(conn_options, max_retry=0),
+            options={
+                "temperature": temperature,
+                "n": n,
+                "parallel_tool_calls": parallel_tool_calls,
+                "tool_choice": tool_choice,
+            },
+        )
+
+    async def aclose(self):
+        for provider in self._providers:
+            await provider.llm.aclose()
+
+
+class RoutedLLMStream(llm.LLMStream):
+    def __init__(self, router: RoutingLLM, *, chat_ctx, fnc_ctx, conn_options, options: dict):
+        super().__init__(router, chat_ctx=chat_ctx, fnc_ctx=fnc_ctx, conn_options=conn_options)
+        self._router = router
+        self._options = options
+        self._current_stream = None
+
+    # function calls and the follow-up context come from the stream that won
+    @property
+    def function_calls(self) -> list[llm.FunctionCallInfo]:
+        if self._current_stream is None:
+            return []
+        return self._current_stream.function_calls
+
+    @property
+    def chat_ctx(self) -> llm.ChatContext:
+        if self._current_stream is None:
+            return self._chat_ctx
+        return self._current_stream.chat_ctx
+
+    @property
+    def fnc_ctx(self) -> llm.FunctionContext | None:
+        if self._current_stream is None:
+            return self._fnc_ctx
+        return self._current_stream.fnc_ctx
+
+    def execute_functions(self) -> list[llm.CalledFunction]:
+        if self._current_stream is None:
+            return []
+        return self._current_stream.execute_functions()
+
+    async def _first_chunk(self, provider: _Provider):
+        stream = provider.llm.chat(
+            chat_ctx=self._chat_ctx,
+            fnc_ctx=self._fnc_ctx,
+            conn_options=dataclasses.replace(self._conn_options, timeout=self._router._attempt_timeout),
+            **self._options,
+        )
+        start = time.perf_counter()
+        try:
+            chunk = await stream.__anext__()
+        except StopAsyncIteration:
+            chunk = None
+        except BaseException:
+            await stream.aclose()
+            raise
+        provider.record_ttft(time.perf_counter() - start)
+        return stream, chunk
+
+    async def _race(self):
+        """Returns (provider, stream, first chunk) from the first provider to answer."""
+        router = self._router
+        ranked = router.ranked()
+        primary = ranked[0]
+        candidates = iter(ranked)
+        pending = {}
+
+        def launch() -> bool:
+            provider = next(candidates, None)
+            if provider is None:
+                return False
+            pending[asyncio.create_task(self._first_chunk(provider))] = (provider, time.perf_counter())
+            return True
+
+        launch()
+        hedged = False
+        deadline = time.perf_counter() + router._hedge_after
+        try:
+            while pending:
+                timeout = None if hedged else max(0.0, deadline - time.perf_counter())
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # no token yet from the fastest provider: ask the next one too
+                    hedged = True
+                    if launch():
+                        router.stats["hedged"] += 1
+                        logger.info(f"no LLM token from {primary.name} after {router._hedge_after}s, hedging")
+                    continue
+
+                winner = None
+                for task in done:
+                    provider, _ = pending.pop(task)
+                    if task.exception() is not None:
+                        logger.warning(f"LLM provider {provider.name} failed: {task.exception()!r}")
+                        provider.record_failure(router._cooldown)
+                        continue
+                    if winner is None:
+                        winner = (provider, *task.result())
+                    else:
+                        await task.result()[0].aclose()
+                if winner is not None:
+                    if hedged and winner[0] is not primary:
+                        router.stats["hedge_wins"] += 1
+                    return winner
+                if not pending and launch():
+                    router.stats["failovers"] += 1
+        finally:
+            for task, (provider, started) in pending.items():
+                if not task.done():
+                    task.cancel()
+                    provider.record_lost(time.perf_counter() - started, router._hedge_after)
+            await utils.aio.gracefully_cancel(*pending)
+            # a loser may have answered while another one was being closed, or
+            # before its cancellation landed: its stream is open
+            for task in pending:
+                if not task.cancelled() and task.exception() is None:
+                    await task.result()[0].aclose()
+
+        raise APIConnectionError(f"all LLM providers failed: {[p.name for p in router._providers]}")
+
+    async def _run(self):
+        self._router.stats["requests"] += 1
+        provider, stream, chunk = await self._race()
+        wins = self._router.stats["wins"]
+        wins[provider.name] = wins.get(provider.name, 0) + 1
+
+        self._current_stream = stream
+        try:
+            if chunk is not None:
+                self._event_ch.send_nowait(chunk)
+            async for chunk in stream:
+                self._event_ch.send_nowait(chunk)
+        except APIError:
+            provider.record_failure(self._router._cooldown)
+            raise
+        finally:
+            await stream.aclose()
@@ -0,0 +1,367 @@
+"""
+Load generator for the voice agent worker.
+
+Runs simulated callers against a local LiveKit server: each call gets a room named
+like an individually dispatched SIP room (so `get_mobile_number` can parse it),
+joins as a SIP participant and streams recorded WAV utterances in real time,
+timing how long the agent takes to start answering each one. Meanwhile the worker
+processes are sampled for CPU and RSS.
+
+    livekit-server --dev
+    TENANTS_CONFIG=loadtest/tenants.json python worker.py start
+    python loadtest.py --calls 200 --concurrency 20 --wav loadtest/utterances/*.wav
+
+loadtest/tenants.json runs the worker on the stub STT/LLM/TTS providers from
+stub_providers.py, whose latencies are set in that file, so the numbers measure
+the worker itself rather than the providers.
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import time
+import wave
+
+import numpy as np
+import psutil
+from dotenv import load_dotenv
+from livekit import api, rtc
+
+from latency_trace import percentile
+
+load_dotenv(dotenv_path="./.env.local")
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+SAMPLES_PER_FRAME = SAMPLE_RATE * FRAME_MS // 1000
+
+
+def load_utterance(path: str) -> list[rtc.AudioFrame]:
+    """Reads a 16-bit WAV file as 16kHz mono frames."""
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        channels, rate = f.getnchannels(), f.getframerate()
+        samples = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels)[:, 0].copy()
+
+    frames = []
+    if rate == SAMPLE_RATE:
+        for i in range(0, len(samples), SAMPLES_PER_FRAME):
+            chunk = samples[i : i + SAMPLES_PER_FRAME]
+            frames.append(rtc.AudioFrame(chunk.tobytes(), SAMPLE_RATE, 1, len(chunk)))
+        return frames
+
+    resampler = rtc.AudioResampler(rate, SAMPLE_RATE)
+    step = rate * FRAME_MS // 1000
+    for i in range(0, len(samples), step):
+        chunk = samples[i : i + step]
+        frames.extend(resampler.push(rtc.AudioFrame(chunk.tobytes(), rate, 1, len(chunk))))
+    frames.extend(resampler.flush())
+    return frames
+
+
+class Microphone:
+    """
+    Publishes a continuous 16kHz stream, like a phone line: queued utterances,
+    silence otherwise.
+    """
+
+    def __init__(self):
+        self.source = rtc.AudioSource(SAMPLE_RATE, 1)
+        self._silence = rtc.AudioFrame(bytes(SAMPLES_PER_FRAME * 2), SAMPLE_RATE, 1, SAMPLES_PER_FRAME)
+        self._pending = []
+        self._done = None
+        self._task = None
+
+    async def publish(self, room: rtc.Room):
+        track = rtc.LocalAudioTrack.create_audio_track("microphone", self.source)
+        options = rtc.TrackPublishOptions(source=rtc.TrackSource.SOURCE_MICROPHONE)
+        await room.local_participant.publish_track(track, options)
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            if self._pending:
+                await self.source.capture_frame(self._pending.pop(0))
+                if not self._pending:
+                    # the last frame still has to drain from the source queue
+                    self._done.set_result(time.perf_counter() + self.source.queued_duration)
+            else:
+                await self.source.capture_frame(self._silence)
+
+    async def say(self, frames: list[rtc.AudioFrame]) -> float:
+        """Plays an utterance and returns the time its last sample goes out."""
+        self._done = asyncio.get_running_loop().create_future()
+        self._pending = list(frames)
+        return await self._done
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+        await self.source.aclose()
+
+
+class AgentListener:
+    """Watches the agent's audio track and timestamps when it starts and stops talking."""
+
+    def __init__(self, threshold: float):
+        self._threshold = threshold
+        self.last_voiced = 0.0
+        self._waiter = None
+        self._task = None
+
+    def attach(self, track: rtc.Track):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(rtc.AudioStream(track, sample_rate=SAMPLE_RATE)))
+
+    async def _run(self, stream: rtc.AudioStream):
+        async for event in stream:
+            samples = np.frombuffer(event.frame.data, dtype=np.int16).astype(np.float32)
+            if samples.size and np.sqrt(np.mean(samples**2)) >= self._threshold:
+                now = time.perf_counter()
+                self.last_voiced = now
+                waiter = self._waiter
+                if waiter is not None and now > waiter[0] and not waiter[1].done():
+                    waiter[1].set_result(now)
+
+    async def speech_after(self, after: float, timeout: float) -> float:
+        """Returns the time of the first agent audio after `after`."""
+        self._waiter = (after, asyncio.get_running_loop().create_future())
+        return await asyncio.wait_for(self._waiter[1], timeout)
+
+    async def silence(self, duration: float, timeout: float):
+        """Waits until the agent has been quiet for `duration` seconds."""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() - self.last_voiced < duration:
+            if time.perf_counter() > deadline:
+                raise asyncio.TimeoutError("agent kept talking")
+            await asyncio.sleep(0.05)
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+
+
+class WorkerMonitor:
+    """
+    Samples CPU and RSS of the worker processes (and the job processes they spawn)
+    once a second.
+    """
+
+    def __init__(self, pids: list[int]):
+        self._roots = [psutil.Process(pid) for pid in pids]
+        self._procs = {}
+        self.samples = {root.pid: [] for root in self._roots}
+        self._task = None
+
+    def _tree(self, root: psutil.Process) -> list[psutil.Process]:
+        try:
+            return [root, *root.children(recursive=True)]
+        except psutil.NoSuchProcess:
+            return []
+
+    def _sample(self):
+        for root in self._roots:
+            cpu, rss, processes = 0.0, 0, 0
+            for proc in self._tree(root):
+                proc = self._procs.setdefault(proc.pid, proc)
+                try:
+                    cpu += proc.cpu_percent(None)
+                    rss += proc.memory_info().rss
+                    processes += 1
+                except psutil.NoSuchProcess:
+                    self._procs.pop(proc.pid, None)
+            self.samples[root.pid].append((cpu, rss, processes))
+
+    async def _run(self):
+        while True:
+            self._sample()
+            await asyncio.sleep(1.0)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def report(self) -> dict:
+        report = {}
+        for pid, samples in self.samples.items():
+            samples = samples[1:]  # the first cpu_percent() call always reads 0
+            if not samples:
+                continue
+            cpu = [s[0] for s in samples]
+            rss = [s[1] for s in samples]
+            report[pid] = {
+                "cpu_avg_percent": sum(cpu) / len(cpu),
+                "cpu_peak_percent": max(cpu),
+                "rss_avg_mb": sum(rss) / len(rss) / 2**20,
+                "rss_peak_mb": max(rss) / 2**20,
+                "processes_peak": max(s[2] for s in samples),
+            }
+        return report
+
+
+def find_workers(pattern: str) -> list[int]:
+    """PIDs of the worker main processes whose command line contains `pattern`."""
+    me = os.getpid()
+    pids = []
+    for proc in psutil.process_iter(["pid", "cmdline"]):
+        cmdline = " ".join(proc.info["cmdline"] or [])
+        if proc.info["pid"] != me and pattern in cmdline and "loadtest.py" not in cmdline:
+            pids.append(proc.info["pid"])
+    # keep only the roots; job processes are picked up as children
+    return [pid for pid in pids if psutil.Process(pid).ppid() not in pids]
+
+
+async def run_call(index: int, args, lkapi: api.LiveKitAPI, utterances: list) -> dict:
+    phone = "+91" + str(random.randint(6000000000, 9999999999))
+    room_name = f"{args.room_prefix}_{phone}_{index:05d}{random.randint(0, 9999):04d}"
+    result = {"room": room_name, "ok": False, "turns": []}
+    started = time.perf_counter()
+
+    await lkapi.room.create_room(api.CreateRoomRequest(name=room_name, empty_timeout=30))
+    if args.agent_name:
+        await lkapi.agent_dispatch.create_dispatch(
+            api.CreateAgentDispatchRequest(agent_name=args.agent_name, room=room_name)
+        )
+
+    token = (
+        api.AccessToken(args.api_key, args.api_secret)
+        .with_identity(f"sip_{phone}")
+        .with_kind("sip")
+        .with_attributes({"sip.phoneNumber": phone})
+        .with_grants(api.VideoGrants(room_join=True, room=room_name))
+        .to_jwt()
+    )
+
+    room = rtc.Room()
+    mic = Microphone()
+    listener = AgentListener(args.threshold)
+
+    @room.on("track_subscribed")
+    def _on_track_subscribed(track, publication, participant):
+        if track.kind == rtc.TrackKind.KIND_AUDIO:
+            listener.attach(track)
+
+    try:
+        await room.connect(args.url, token)
+        await mic.publish(room)
+        joined = time.perf_counter()
+        result["connect"] = joined - started
+
+        greeting = await listener.speech_after(joined, args.timeout)
+        result["greeting"] = greeting - joined
+        await listener.silence(args.silence, args.timeout)
+
+        for turn in range(args.turns):
+            speech_end = await mic.say(utterances[(index + turn) % len(utterances)])
+            answer = await listener.speech_after(speech_end, args.timeout)
+            result["turns"].append(answer - speech_end)
+            await listener.silence(args.silence, args.timeout)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = repr(e)
+    finally:
+        result["duration"] = time.perf_counter() - started
+        await mic.aclose()
+        await listener.aclose()
+        await room.disconnect()
+        try:
+            await lkapi.room.delete_room(api.DeleteRoomRequest(room=room_name))
+        except Exception:
+            pass
+    return result
+
+
+def summarize(values: list) -> dict:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "max": max(values) if values else None,
+    }
+
+
+async def main(args):
+    paths = [p for pattern in args.wav for p in sorted(glob.glob(pattern))]
+    if not paths:
+        raise SystemExit("no utterances: pass --wav with one or more 16-bit WAV files")
+    utterances = [load_utterance(p) for p in paths]
+
+    pids = args.worker_pid or find_workers(args.worker_match)
+    if not pids:
+        print(f"warning: no worker process matching {args.worker_match!r}, CPU/RSS will not be reported")
+    monitor = WorkerMonitor(pids)
+    monitor.start()
+
+    lkapi = api.LiveKitAPI(url=args.url, api_key=args.api_key, api_secret=args.api_secret)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results = []
+
+    async def _call(index):
+        async with semaphore:
+            result = await run_call(index, args, lkapi, utterances)
+            results.append(result)
+            status = "ok" if result["ok"] else result.get("error")
+            print(f"call {index + 1}/{args.calls} {result['room']}: {status}")
+
+    started = time.perf_counter()
+    tasks = []
+    for index in range(args.calls):
+        tasks.append(asyncio.create_task(_call(index)))
+        if args.ramp:
+            await asyncio.sleep(args.ramp)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    await monitor.aclose()
+    await lkapi.aclose()
+
+    completed = [r for r in results if r["ok"]]
+    report = {
+        "calls": args.calls,
+        "concurrency": args.concurrency,
+        "completed": len(completed),
+        "failed": len(results) - len(completed),
+        "elapsed_s": elapsed,
+        "calls_per_second": len(completed) / elapsed if elapsed else 0.0,
+        "turn_latency_s": summarize([t for r in results for t in r["turns"]]),
+        "greeting_latency_s": summarize([r["greeting"] for r in results if "greeting" in r]),
+        "connect_s": summarize([r["connect"] for r in results if "connect" in r]),
+        "workers": monitor.report(),
+        "cpu_count": psutil.cpu_count(),
+        "errors": sorted({r["error"] for r in results if "error" in r}),
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"report": report, "calls": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulated SIP callers against a local LiveKit server")
+    parser.add_argument("--url", default=os.getenv("LIVEKIT_URL", "ws://localhost:7880"))
+    parser.add_argument("--api-key", default=os.getenv("LIVEKIT_API_KEY", "devkey"))
+    parser.add_argument("--api-secret", default=os.getenv("LIVEKIT_API_SECRET", "secret"))
+    parser.add_argument("--wav", nargs="+", default=["loadtest/utterances/*.wav"], help="utterance WAV files (globs allowed)")
+    parser.add_argument("--calls", type=int, default=20, help="total calls to place")
+    parser.add_argument("--concurrency", type=int, default=5, help="calls in progress at once")
+    parser.add_argument("--ramp", type=float, default=0.2, help="seconds between call starts")
+    parser.add_argument("--turns", type=int, default=3, help="caller utterances per call")
+    parser.add_argument("--room-prefix", default="call-", help="room prefix of the SIP dispatch rule")
+    parser.add_argument("--agent-name", default="", help="dispatch explicitly to this agent name (automatic dispatch if empty)")
+    parser.add_argument("--timeout", type=float, default=20.0, help="seconds to wait for the agent to answer")
+    parser.add_argument("--silence", type=float, default=1.0, help="agent silence that ends its reply, in seconds")
+    parser.add_argument("--threshold", type=float, default=300.0, help="RMS level that counts as agent speech")
+    parser.add_argument("--worker-pid", type=int, nargs="*", help="worker PIDs to sample (default: find by command line)")
+    parser.add_argument("--worker-match", default="worker.py", help="command line substring identifying worker processes")
+    parser.add_argument("--out", help="write the report and per-call results as JSON")
+    asyncio.run(main(parser.parse_args()))
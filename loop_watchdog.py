@@ -0,0 +1,141 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+
+from livekit.agents import llm
+
+logger = logging.getLogger("voice-agent")
+
+_LIBRARY_PATHS = tuple({sysconfig.get_paths()["stdlib"], sysconfig.get_paths()["purelib"], "site-packages"})
+
+
+def _is_library(filename: str) -> bool:
+    return any(path in filename for path in _LIBRARY_PATHS)
+
+
+def _tool_name(frame) -> str | None:
+    """Name of the `@llm.ai_callable` the frame stack is inside, if any."""
+    while frame is not None:
+        code = frame.f_code
+        if code.co_argcount and code.co_varnames[0] == "self":
+            owner = frame.f_locals.get("self")
+            if isinstance(owner, llm.FunctionContext) and code.co_name in owner.ai_functions:
+                return code.co_name
+        frame = frame.f_back
+    return None
+
+
+class LoopWatchdog:
+    """
+    Catches callbacks that block this process's event loop.
+
+    A heartbeat is scheduled on the loop every `interval` seconds and a thread
+    checks that it keeps running. When the loop misses it by more than
+    `threshold_ms` (LOOP_BLOCK_THRESHOLD_MS, default 100), the thread captures the
+    stack of the loop thread while it is still blocked: the running task, the
+    `@llm.ai_callable` it is in (if any) and the innermost frame of our own code.
+    Once the loop runs again, the block is logged with its duration and handed to
+    the listeners (e.g. the CallTracer, which writes it to the call trace).
+    """
+
+    def __init__(self, threshold_ms: float | None = None, interval: float = 0.02):
+        self.threshold = (threshold_ms or float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))) / 1000
+        self._interval = interval
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._loop = None
+        self._loop_thread = None
+        self._thread = None
+        self._beat = 0.0
+        self.stats = {"blocks": 0, "blocked_ms": 0.0, "max_blocked_ms": 0.0, "by_location": {}}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._loop.call_soon(self._heartbeat)
+        self._thread = threading.Thread(target=self._watch, daemon=True, name="loop_watchdog")
+        self._thread.start()
+
+    def add_listener(self, callback):
+        """`callback(record)` is called on the event loop for every block."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _heartbeat(self):
+        self._beat = time.monotonic()
+        self._loop.call_later(self._interval, self._heartbeat)
+
+    def _watch(self):
+        captured = None
+        while not self._loop.is_closed() and self._loop.is_running():
+            time.sleep(self.threshold / 4)
+            beat = self._beat
+            if captured is not None and beat != captured[0]:
+                self._report(captured[1], beat - captured[0] - self._interval)
+                captured = None
+            if captured is None and time.monotonic() - beat > self._interval + self.threshold:
+                captured = (beat, self._capture())
+
+    def _capture(self) -> dict:
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = traceback.extract_stack(frame) if frame is not None else []
+        own = [f for f in stack if not _is_library(f.filename)]
+        innermost = (own or stack)[-1] if stack else None
+        task = asyncio.current_task(self._loop)
+        return {
+            "pid": os.getpid(),
+            "task": task.get_name() if task else None,
+            "coroutine": getattr(task.get_coro(), "__qualname__", None) if task else None,
+            "tool": _tool_name(frame),
+            "location": f"{os.path.basename(innermost.filename)}:{innermost.lineno} {innermost.name}" if innermost else None,
+            "stack": [f"{f.filename}:{f.lineno} {f.name}" for f in stack[-20:]],
+        }
+
+    def _report(self, record: dict, duration: float):
+        record["blocked_ms"] = round(duration * 1000, 1)
+        record["threshold_ms"] = self.threshold * 1000
+        record["timestamp"] = time.time()
+        where = f"tool {record['tool']}" if record["tool"] else record["location"] or "unknown code"
+        with self._lock:
+            self.stats["blocks"] += 1
+            self.stats["blocked_ms"] += record["blocked_ms"]
+            self.stats["max_blocked_ms"] = max(self.stats["max_blocked_ms"], record["blocked_ms"])
+            self.stats["by_location"][where] = self.stats["by_location"].get(where, 0) + 1
+        logger.warning(f"event loop blocked for {record['blocked_ms']:.0f} ms by {where}: {json.dumps(record)}")
+        for callback in list(self._listeners):
+            try:
+                self._loop.call_soon_threadsafe(callback, record)
+            except RuntimeError:
+                # the loop has closed
+                return
+
+
+_watchdog = None
+
+
+def start_watchdog() -> LoopWatchdog:
+    """
+    Starts the event-loop watchdog of this process, once. Call it from the job
+    entrypoint, next to `monitor_loop_lag()`.
+    """
+    global _watchdog
+    if _watchdog is None:
+        _watchdog = LoopWatchdog()
+    _watchdog.start()
+    return _watchdog
+
+
+def current_watchdog() -> LoopWatchdog | None:
+    return _watchdog
@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import time
+
+from bson import json_util
+
+from blocking_io import run_blocking
+
+logger = logging.getLogger("voice-agent")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_until REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (kind, next_attempt_at);
+"""
+
+
+class Outbox:
+    """
+    Local durable write-behind queue for work that must not happen on the caller's
+    critical path (complaint inserts, SMS notifications).
+
+    Tools `enqueue` into an SQLite file and return straight away. A background
+    drainer claims due rows, hands them to the handler registered for their kind and
+    deletes them on success, or reschedules them with exponential backoff on failure.
+    Rows survive process restarts and Mongo/Twilio outages; several worker processes
+    can share one file since rows are claimed with a lease before being processed.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        batch_size: int = 50,
+        poll_interval: float = 1.0,
+        base_backoff: float = 2.0,
+        max_backoff: float = 300.0,
+        lease: float = 60.0,
+    ):
+        self.path = path or os.getenv("OUTBOX_PATH", "outbox.sqlite3")
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self._handlers = {}
+        self._task = None
+        self._wakeup = None
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def register(self, kind: str, handler, batch: bool = False):
+        """
+        Registers the coroutine that delivers rows of the given kind.
+
+        Args:
+            kind (str): Row kind, e.g. "complaint" or "sms".
+            handler (callable): `async handler(payloads: list)` when `batch` is True,
+                otherwise `async handler(payload)`. Raising schedules a retry.
+            batch (bool): Deliver up to `batch_size` due rows in one call.
+        """
+        self._handlers[kind] = (handler, batch)
+
+    def _insert(self, items):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            ids = []
+            for kind, payload in items:
+                cur = conn.execute(
+                    "INSERT INTO outbox (kind, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+                    (kind, json_util.dumps(payload), now, now),
+                )
+                ids.append(cur.lastrowid)
+            conn.execute("COMMIT")
+            return ids
+        finally:
+            conn.close()
+
+    async def enqueue(self, kind: str, payload: dict) -> int:
+        """
+        Durably queues one item and returns its outbox row id.
+        """
+        ids = await self.enqueue_many([(kind, payload)])
+        return ids[0]
+
+    async def enqueue_many(self, items) -> list:
+        """
+        Durably queues several (kind, payload) items in a single transaction.
+        """
+        ids = await run_blocking(self._insert, list(items))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return ids
+
+    def _claim(self, kind):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, payload, attempts FROM outbox "
+                "WHERE kind = ? AND next_attempt_at <= ? AND claimed_until <= ? "
+                "ORDER BY id LIMIT ?",
+                (kind, now, now, self.batch_size),
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE outbox SET claimed_until = ? WHERE id = ?",
+                    [(now + self.lease, row[0]) for row in rows],
+                )
+            conn.execute("COMMIT")
+            return [(row[0], json_util.loads(row[1]), row[2]) for row in rows]
+        finally:
+            conn.close()
+
+    def _complete(self, ids):
+        conn = self._connect()
+        try:
+            conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+        finally:
+            conn.close()
+
+    def _reschedule(self, rows, error):
+        now = time.time()
+        updates = []
+        for row_id, _, attempts in rows:
+            delay = min(self.base_backoff * (2 ** attempts), self.max_backoff)
+            delay *= random.uniform(0.8, 1.2)
+            updates.append((attempts + 1, now + delay, str(error)[:500], row_id))
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ?, claimed_until = 0, last_error = ? "
+                "WHERE id = ?",
+                updates,
+            )
+        finally:
+            conn.close()
+
+    async def _deliver(self, kind, rows):
+        handler, batch = self._handlers[kind]
+        if batch:
+            try:
+                await handler([payload for _, payload, _ in rows])
+            except Exception as e:
+                logger.error(f"Outbox delivery of {len(rows)} {kind} item(s) failed: {e}")
+                await run_blocking(self._reschedule, rows, e)
+                return
+            await run_blocking(self._complete, [row[0] for row in rows])
+            return
+
+        done, failed = [], []
+        for row in rows:
+            try:
+                await handler(row[1])
+                done.append(row[0])
+            except Exception as e:
+                logger.error(f"Outbox delivery of {kind} item {row[0]} failed: {e}")
+                failed.append((row, e))
+        if done:
+            await run_blocking(self._complete, done)
+        for row, e in failed:
+            await run_blocking(self._reschedule, [row], e)
+
+    async def drain_once(self) -> int:
+        """
+        Delivers every row that is currently due. Returns the number of rows handled.
+        """
+        handled = 0
+        for kind in list(self._handlers):
+            while True:
+                rows = await run_blocking(self._claim, kind)
+                if not rows:
+                    break
+                await self._deliver(kind, rows)
+                handled += len(rows)
+                if len(rows) < self.batch_size:
+                    break
+        return handled
+
+    async def _run(self):
+        while True:
+            try:
+                await self.drain_once()
+            except Exception as e:
+                logger.error(f"Outbox drainer error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self):
+        """
+        Starts the background drainer on the running loop. Safe to call from every job.
+        """
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def aclose(self, flush: bool = True):
+        """
+        Stops the drainer, optionally making one last delivery attempt first.
+        Anything still undelivered stays on disk for the next process.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if flush:
+            try:
+                await self.drain_once()
+            except Exception as e:
+                logger.error(f"Outbox flush failed: {e}")
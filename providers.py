@@ -0,0 +1,186 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+from urllib.parse import urlsplit
+
+from livekit.agents import tts
+from livekit.plugins import deepgram, google, openai
+
+from llm_router import RoutingLLM
+from rate_limit import RateLimitedLLM, RateLimitedSTT, RateLimitedTTS, rate_limited
+from stub_providers import ReplayLLM, ReplaySTT, StubLLM, StubSTT, StubTTS
+from tenants import ProviderSpec
+from tts_cache import CachedTTS
+
+logger = logging.getLogger("voice-agent")
+
+
+def _override(spec: ProviderSpec) -> ProviderSpec:
+    """
+    PROVIDER_OVERRIDE=replay (or stub) builds every STT/LLM/TTS as that local fake
+    instead, whatever the tenant or script asks for; see replay.py.
+    """
+    override = os.getenv("PROVIDER_OVERRIDE")
+    if not override or spec.provider == override:
+        return spec
+    return ProviderSpec(provider=override)
+
+
+def _google_options(options: dict) -> dict:
+    options = dict(options)
+    options.setdefault("credentials_file", os.getenv("GOOGLE_APPLICATION_CREDENTIALS"))
+    return options
+
+
+def build_stt(spec: ProviderSpec):
+    if spec.provider == "deepgram":
+        return deepgram.STT(**spec.options)
+    if spec.provider == "google":
+        return google.STT(**_google_options(spec.options))
+    if spec.provider == "stub":
+        return StubSTT(**spec.options)
+    if spec.provider == "replay":
+        return ReplaySTT(**spec.options)
+    raise ValueError(f"Unknown STT provider: {spec.provider}")
+
+
+def build_llm(spec: ProviderSpec):
+    if spec.provider == "openai":
+        return openai.LLM(**spec.options)
+    if spec.provider == "groq":
+        return openai.LLM.with_groq(**spec.options)
+    if spec.provider == "stub":
+        return StubLLM(**spec.options)
+    if spec.provider == "replay":
+        return ReplayLLM(**spec.options)
+    if spec.provider == "route":
+        # {"providers": [{"provider": "groq"}, {"provider": "openai"}], "hedge_after": 1.0}
+        options = dict(spec.options)
+        specs = [ProviderSpec(**p) for p in options.pop("providers")]
+        return RoutingLLM(
+            [rate_limited(build_llm(s), f"{s.provider}-llm") for s in specs],
+            names=[f"{s.provider}:{s.options.get('model', 'default')}" for s in specs],
+            **options,
+        )
+    raise ValueError(f"Unknown LLM provider: {spec.provider}")
+
+
+def build_tts(spec: ProviderSpec):
+    if spec.provider == "deepgram":
+        return deepgram.TTS(**spec.options)
+    if spec.provider == "google":
+        return google.TTS(**_google_options(spec.options))
+    if spec.provider in ("stub", "replay"):
+        return StubTTS(**spec.options)
+    raise ValueError(f"Unknown TTS provider: {spec.provider}")
+
+
+def tts_cache_key(spec: ProviderSpec) -> tuple[str, str]:
+    """
+    Voice and language used to key a provider's entries in the TTS phrase cache.
+    """
+    spec = _override(spec)
+    voice = spec.cache_voice or spec.options.get("voice") or spec.options.get("model")
+    language = spec.cache_language or spec.options.get("language") or ""
+    return f"{spec.provider}-{voice or 'default'}", language
+
+
+class ProviderPool:
+    """
+    Provider clients for one worker process.
+
+    Clients are built in `prewarm`, so credential files are read and HTTP/gRPC
+    clients constructed before any job arrives, and the same instance is handed to
+    every VoicePipelineAgent the process runs. `warm()` is started at the top of a
+    job to open connections (and send a cheap request where that helps) while the
+    job joins the room and waits for the caller, so the first utterance doesn't pay
+    connection setup.
+    """
+
+    _builders = {"stt": build_stt, "llm": build_llm, "tts": build_tts}
+
+    def __init__(self):
+        self._clients = {}
+
+    def get(self, kind: str, spec: ProviderSpec):
+        """Returns the shared client for a spec, building it on first use."""
+        spec = _override(spec)
+        key = (kind, spec.provider, json.dumps(spec.options, sort_keys=True))
+        client = self._clients.get(key)
+        if client is None:
+            # requests share the account quota with every worker process on the host
+            client = rate_limited(self._builders[kind](spec), f"{spec.provider}-{kind}")
+            self._clients[key] = client
+        return client
+
+    def stt(self, spec: ProviderSpec):
+        return self.get("stt", spec)
+
+    def llm(self, spec: ProviderSpec):
+        return self.get("llm", spec)
+
+    def tts(self, spec: ProviderSpec):
+        return self.get("tts", spec)
+
+    async def warm(self, *clients, timeout: float = 5.0):
+        """
+        Opens connections for the given clients (all pooled clients by default).
+        Best effort: failures are logged and the call carries on with lazy setup.
+        """
+        clients = clients or tuple(self._clients.values())
+        results = await asyncio.gather(
+            *[asyncio.wait_for(warm_client(c), timeout) for c in clients],
+            return_exceptions=True,
+        )
+        for client, result in zip(clients, results):
+            if isinstance(result, Exception):
+                logger.warning(f"warming {type(client).__name__} failed: {result!r}")
+
+
+@contextlib.contextmanager
+def _plugin_internals(client):
+    # The plugins have no public way to open their connection early, so warming
+    # reaches into their internals, which a livekit-plugins release may rename.
+    # Warming is best effort: a renamed one only costs the head start.
+    try:
+        yield
+    except AttributeError as e:
+        logger.warning(f"can't warm {type(client).__name__}, the plugin changed: {e!r}")
+
+
+async def warm_client(client):
+    """Opens the connection a provider client will use for its first request."""
+    while isinstance(client, (CachedTTS, RateLimitedLLM, RateLimitedSTT, RateLimitedTTS)):
+        client = client.inner
+    if isinstance(client, RoutingLLM):
+        await asyncio.gather(*[warm_client(c) for c in client.llms])
+        return
+
+    if isinstance(client, tts.TTS):
+        # the public hook, for the plugins that implement it
+        client.prewarm()
+    if isinstance(client, deepgram.TTS):
+        # the first synthesis stream takes this websocket from the pool
+        with _plugin_internals(client):
+            client._pool.prewarm()
+    elif isinstance(client, deepgram.STT):
+        # establish the keep-alive TLS connection the streaming websocket reuses
+        with _plugin_internals(client):
+            url = urlsplit(client._base_url)
+            async with client._ensure_session().get(
+                f"{url.scheme}://{url.netloc}/v1/projects",
+                headers={"Authorization": f"Token {client._api_key}"},
+            ) as resp:
+                await resp.read()
+    elif isinstance(client, google.TTS):
+        # builds the gRPC client (reads the credentials file) and opens the channel
+        with _plugin_internals(client):
+            await client._ensure_client().list_voices(
+                language_code=client._opts.voice.language_code
+            )
+    elif isinstance(client, openai.LLM):
+        # cheap authenticated request that leaves a pooled HTTP/2 connection open
+        with _plugin_internals(client):
+            await client._client.models.list()
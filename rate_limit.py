@@ -0,0 +1,320 @@
+import asyncio
+import dataclasses
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+from livekit.agents import APIConnectOptions, llm, stt, tts, utils
+
+logger = logging.getLogger("voice-agent")
+
+_DEFAULT_CONN_OPTIONS = APIConnectOptions()
+
+# Bucket state shared by every process on the host
+RATE_LIMIT_DIR = os.getenv("RATE_LIMIT_DIR", os.path.join(tempfile.gettempdir(), "voice-agent-ratelimit"))
+
+# Requests per second and burst per "<provider>-<kind>" bucket. Quotas depend on
+# the account plan, so only Twilio's per-number SMS limit is set by default; add
+# the others with RATE_LIMITS, e.g.
+# '{"groq-llm": {"rate": 0.5, "burst": 10}, "google-tts": {"rate": 15, "burst": 30}}'
+DEFAULT_LIMITS = {
+    "twilio-sms": {"rate": 1.0, "burst": 1},
+}
+
+# tokens, last refill, last time an in-call request had to wait
+_STATE = struct.Struct("ddd")
+
+# background work backs off for this long after an in-call request had to wait
+_IN_CALL_GRACE = 1.0
+
+
+class SharedTokenBucket:
+    """
+    Token bucket shared by all worker processes on this host through a small
+    memory-mapped file in RATE_LIMIT_DIR, locked with flock for each update. No
+    daemon or outside service is involved; the first process to open a bucket
+    creates it full.
+
+    `rate` tokens per second refill the bucket up to `burst`. Background callers
+    (e.g. the SMS outbox) may not take the last `reserve` fraction of the burst,
+    and hold off entirely while an in-call request is waiting, so callers on a
+    live call get the quota first. The reserve never exceeds `burst - cost`, so a
+    background caller can always take a full bucket (with Twilio's default burst
+    of 1 a reserve would otherwise lock it out for good).
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, reserve: float = 0.25, state_dir: str | None = None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.reserve = reserve
+        self.waits = 0
+        self.waited = 0.0
+        state_dir = state_dir or RATE_LIMIT_DIR
+        os.makedirs(state_dir, exist_ok=True)
+        self._fd = os.open(os.path.join(state_dir, f"{name}.bucket"), os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < _STATE.size:
+                os.write(self._fd, _STATE.pack(burst, time.time(), 0.0))
+            self._map = mmap.mmap(self._fd, _STATE.size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _take(self, cost: float, background: bool) -> float:
+        """Takes `cost` tokens if allowed and returns 0, otherwise how long to wait."""
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            tokens, updated, in_call_waiting = _STATE.unpack_from(self._map)
+            now = time.time()
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            floor = min(self.reserve * self.burst, max(0.0, self.burst - cost)) if background else 0.0
+            if background and now - in_call_waiting < _IN_CALL_GRACE:
+                wait = _IN_CALL_GRACE - (now - in_call_waiting)
+            elif tokens - cost >= floor:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (floor + cost - tokens) / self.rate
+                if not background:
+                    in_call_waiting = now
+            _STATE.pack_into(self._map, 0, tokens, now, in_call_waiting)
+            return wait
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    async def acquire(self, cost: float = 1.0, *, background: bool = False):
+        start = time.perf_counter()
+        while (wait := self._take(cost, background)) > 0:
+            await asyncio.sleep(min(wait, 0.5))
+        waited = time.perf_counter() - start
+        if waited > 0.05:
+            self.waits += 1
+            self.waited += waited
+            logger.info(f"{'background' if background else 'in-call'} {self.name} request waited {waited:.2f}s for quota")
+
+
+def _no_retry(conn_options: APIConnectOptions) -> APIConnectOptions:
+    # the wrapper retries, taking a new token for each attempt
+    return dataclasses.replace(conn_options, max_retry=0)
+
+
+_buckets = {}
+
+
+def _limits() -> dict:
+    limits = dict(DEFAULT_LIMITS)
+    limits.update(json.loads(os.getenv("RATE_LIMITS", "{}")))
+    return limits
+
+
+def bucket(name: str) -> SharedTokenBucket | None:
+    """The process's handle on the named bucket, or None if `name` has no limit."""
+    if name not in _buckets:
+        limit = _limits().get(name)
+        _buckets[name] = SharedTokenBucket(name, **limit) if limit else None
+    return _buckets[name]
+
+
+async def throttle(name: str, *, background: bool = False):
+    """Waits for quota on the named bucket; returns at once if it has no limit."""
+    limiter = bucket(name)
+    if limiter is not None:
+        await limiter.acquire(background=background)
+
+
+def rate_limited(client, name: str):
+    """Wraps an STT/LLM/TTS client so every request takes a token from `name` first."""
+    limiter = bucket(name)
+    if limiter is None:
+        return client
+    if isinstance(client, llm.LLM):
+        return RateLimitedLLM(client, limiter)
+    if isinstance(client, stt.STT):
+        return RateLimitedSTT(client, limiter)
+    if isinstance(client, tts.TTS):
+        return RateLimitedTTS(client, limiter)
+    return client
+
+
+class RateLimitedLLM(llm.LLM):
+    def __init__(self, inner: llm.LLM, limiter: SharedTokenBucket):
+        super().__init__(capabilities=inner.capabilities)
+        self._inner = inner
+        self._limiter = limiter
+
+    @property
+    def inner(self) -> llm.LLM:
+        return self._inner
+
+    def chat(self, *, chat_ctx, conn_options=_DEFAULT_CONN_OPTIONS, fnc_ctx=None, **kwargs) -> "_RateLimitedLLMStream":
+        return _RateLimitedLLMStream(self, chat_ctx=chat_ctx, fnc_ctx=fnc_ctx, conn_options=conn_options, options=kwargs)
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+class _RateLimitedLLMStream(llm.LLMStream):
+    def __init__(self, limited: RateLimitedLLM, *, chat_ctx, fnc_ctx, conn_options, options: dict):
+        super().__init__(limited, chat_ctx=chat_ctx, fnc_ctx=fnc_ctx, conn_options=conn_options)
+        self._limited = limited
+        self._options = options
+        self._inner_stream = None
+
+    # function calls and the follow-up context come from the wrapped stream
+    @property
+    def function_calls(self) -> list[llm.FunctionCallInfo]:
+        return self._inner_stream.function_calls if self._inner_stream else []
+
+    @property
+    def chat_ctx(self) -> llm.ChatContext:
+        return self._inner_stream.chat_ctx if self._inner_stream else self._chat_ctx
+
+    @property
+    def fnc_ctx(self) -> llm.FunctionContext | None:
+        return self._inner_stream.fnc_ctx if self._inner_stream else self._fnc_ctx
+
+    def execute_functions(self) -> list[llm.CalledFunction]:
+        return self._inner_stream.execute_functions() if self._inner_stream else []
+
+    async def _run(self):
+        await self._limited._limiter.acquire()
+        self._inner_stream = self._limited.inner.chat(
+            chat_ctx=self._chat_ctx, fnc_ctx=self._fnc_ctx, conn_options=_no_retry(self._conn_options), **self._options
+        )
+        async with self._inner_stream as stream:
+            async for chunk in stream:
+                self._event_ch.send_nowait(chunk)
+
+
+class RateLimitedSTT(stt.STT):
+    def __init__(self, inner: stt.STT, limiter: SharedTokenBucket):
+        super().__init__(capabilities=inner.capabilities)
+        self._inner = inner
+        self._limiter = limiter
+        inner.on("metrics_collected", lambda metrics: self.emit("metrics_collected", metrics))
+
+    @property
+    def inner(self) -> stt.STT:
+        return self._inner
+
+    async def _recognize_impl(self, buffer, *, language=None, conn_options=_DEFAULT_CONN_OPTIONS):
+        await self._limiter.acquire()
+        return await self._inner._recognize_impl(buffer, language=language, conn_options=conn_options)
+
+    def stream(self, *, language=None, conn_options=_DEFAULT_CONN_OPTIONS) -> "_RateLimitedRecognizeStream":
+        return _RateLimitedRecognizeStream(self, language=language, conn_options=conn_options)
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+class _RateLimitedRecognizeStream(stt.RecognizeStream):
+    """Opens the wrapped streaming session once quota allows; audio is buffered meanwhile."""
+
+    def __init__(self, limited: RateLimitedSTT, *, language, conn_options):
+        super().__init__(stt=limited, conn_options=conn_options)
+        self._limited = limited
+        self._language = language
+
+    async def _metrics_monitor_task(self, event_aiter):
+        pass  # the wrapped stream reports its own metrics
+
+    async def _run(self):
+        await self._limited._limiter.acquire()
+        inner = self._limited.inner.stream(language=self._language, conn_options=_no_retry(self._conn_options))
+
+        async def _forward():
+            async for ev in inner:
+                self._event_ch.send_nowait(ev)
+
+        forward_task = asyncio.create_task(_forward())
+        try:
+            async for data in self._input_ch:
+                if isinstance(data, self._FlushSentinel):
+                    inner.flush()
+                else:
+                    inner.push_frame(data)
+            inner.end_input()
+            await forward_task
+        finally:
+            await utils.aio.gracefully_cancel(forward_task)
+            await inner.aclose()
+
+
+class RateLimitedTTS(tts.TTS):
+    def __init__(self, inner: tts.TTS, limiter: SharedTokenBucket):
+        super().__init__(
+            capabilities=inner.capabilities,
+            sample_rate=inner.sample_rate,
+            num_channels=inner.num_channels,
+        )
+        self._inner = inner
+        self._limiter = limiter
+        inner.on("metrics_collected", lambda metrics: self.emit("metrics_collected", metrics))
+
+    @property
+    def inner(self) -> tts.TTS:
+        return self._inner
+
+    def synthesize(self, text: str, *, conn_options=None) -> "_RateLimitedChunkedStream":
+        return _RateLimitedChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+    def stream(self, *, conn_options=None) -> tts.SynthesizeStream:
+        if not self._inner.capabilities.streaming:
+            # VoicePipelineAgent's StreamAdapter calls synthesize() per sentence
+            return self._inner.stream(conn_options=conn_options)
+        return _RateLimitedSynthesizeStream(tts=self, conn_options=conn_options)
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+class _RateLimitedChunkedStream(tts.ChunkedStream):
+    def __init__(self, *, tts: RateLimitedTTS, input_text: str, conn_options=None):
+        super().__init__(tts=tts, input_text=input_text, conn_options=conn_options)
+        self._limited = tts
+
+    async def _metrics_monitor_task(self, event_aiter):
+        pass  # the wrapped stream reports its own metrics
+
+    async def _run(self):
+        await self._limited._limiter.acquire()
+        async with self._limited.inner.synthesize(self._input_text, conn_options=_no_retry(self._conn_options)) as stream:
+            async for ev in stream:
+                self._event_ch.send_nowait(ev)
+
+
+class _RateLimitedSynthesizeStream(tts.SynthesizeStream):
+    def __init__(self, *, tts: RateLimitedTTS, conn_options=None):
+        super().__init__(tts=tts, conn_options=conn_options)
+        self._limited = tts
+
+    async def _metrics_monitor_task(self, event_aiter):
+        pass  # the wrapped stream reports its own metrics
+
+    async def _run(self):
+        await self._limited._limiter.acquire()
+        inner = self._limited.inner.stream(conn_options=_no_retry(self._conn_options))
+
+        async def _forward():
+            async for ev in inner:
+                self._event_ch.send_nowait(ev)
+
+        forward_task = asyncio.create_task(_forward())
+        try:
+            async for data in self._input_ch:
+                if isinstance(data, str):
+                    inner.push_text(data)
+                else:
+                    inner.flush()
+            inner.end_input()
+            await forward_task
+        finally:
+            await utils.aio.gracefully_cancel(forward_task)
+            await inner.aclose()
@@ -0,0 +1,288 @@
+"""
+Call replay benchmark: end-to-end latency and tool-call regression checks.
+
+Replays recorded caller audio against a worker whose STT/LLM/TTS are the local
+Replay* fakes from stub_providers.py, with fixed latencies, so the numbers only
+move when our own code does. Each scenario names a tenant and lists the caller's
+turns: the recorded utterance, the transcript the fake STT returns for it and,
+where the LLM answers, its scripted reply and tool calls. The job gets the script
+in its dispatch metadata. Prompts, IntakeFlow, ToolRunner, the TTS phrase cache
+and the tools themselves are the real ones.
+
+    livekit-server --dev
+    WORKER_AGENT_NAME=replay PROVIDER_OVERRIDE=replay TRACE_TOOL_ARGS=1 TRACE_DIR=replay/traces \
+        TTS_CACHE_DIR=replay/tts_cache python worker.py start
+    python replay.py --out replay/baseline.json
+    # later, on a change:
+    python replay.py --baseline replay/baseline.json
+
+Reported per turn: the caller-side response time (end of the utterance to the
+agent's first audio) and the stages from the call trace. Per call: the greeting
+time, the tool calls with their durations, and whether they match the scenario's
+`expected_tool_calls` (arguments listed there must match, others are ignored).
+With --baseline, any greeting, turn or tool more than --tolerance seconds slower
+than in the baseline fails the run, as does a wrong tool call.
+
+A scenario (replay/scenarios/*.json) has the "tenant", its "turns" and the
+"expected_tool_calls" as {"name", "arguments"}. Each turn has the "audio" WAV
+file, the "transcript" and, for turns the LLM answers, its "reply", "tool_calls"
+and the "after_tools" reply; see replay/scenarios/dental-booking.json. The
+recordings are not in the repo: record each turn as a 16-bit WAV under
+replay/audio/ (the "audio" paths are relative to the repo root). Scenarios
+with a missing recording are skipped.
+
+The realtime agent (agent.py) has no STT/LLM/TTS to replace and can't be replayed.
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import statistics
+import time
+
+from dotenv import load_dotenv
+from livekit import api, rtc
+
+from latency_trace import STAGES, read_records
+from loadtest import AgentListener, Microphone, load_utterance, summarize
+
+load_dotenv(dotenv_path="./.env.local")
+
+
+def load_scenario(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        scenario = json.load(f)
+    scenario["name"] = os.path.splitext(os.path.basename(path))[0]
+    for turn in scenario["turns"]:
+        turn["frames"] = load_utterance(turn["audio"])
+    return scenario
+
+
+def call_script(scenario: dict) -> dict:
+    """What the Replay* providers need from the scenario, sent as job metadata."""
+    keys = ("transcript", "reply", "tool_calls", "after_tools")
+    return {"turns": [{k: turn[k] for k in keys if k in turn} for turn in scenario["turns"]]}
+
+
+def _normalize(value) -> str:
+    return " ".join(str(value).lower().split()).strip(" .,!")
+
+
+def check_tool_calls(expected: list[dict], actual: list[dict]) -> dict:
+    """Matches the executed tool calls against the expected ones, in any order."""
+    remaining = list(actual)
+    missing = []
+    for call in expected:
+        match = next(
+            (
+                a
+                for a in remaining
+                if a["tool"] == call["name"]
+                and all(_normalize(a.get("arguments", {}).get(k)) == _normalize(v) for k, v in call.get("arguments", {}).items())
+            ),
+            None,
+        )
+        if match is None:
+            missing.append(call)
+        else:
+            remaining.remove(match)
+    return {
+        "correct": not missing and not remaining,
+        "missing": missing,
+        "unexpected": [{"name": a["tool"], "arguments": a.get("arguments")} for a in remaining],
+    }
+
+
+async def read_trace(trace_dir: str, room_name: str, timeout: float) -> list[dict]:
+    """The call's trace lines, once the job has shut down and written its summary."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        for path in glob.glob(os.path.join(trace_dir, "*", f"{room_name}-*.jsonl")):
+            lines = read_records(path)
+            if any(line.get("type") == "call" for line in lines):
+                return lines
+        await asyncio.sleep(0.25)
+    return []
+
+
+async def replay_call(scenario: dict, args, lkapi: api.LiveKitAPI) -> dict:
+    phone = "+91" + str(random.randint(6000000000, 9999999999))
+    room_name = f"replay-{scenario['name']}-{random.randint(0, 99999):05d}"
+    result = {"scenario": scenario["name"], "room": room_name, "ok": False, "turns": []}
+
+    await lkapi.room.create_room(api.CreateRoomRequest(name=room_name, empty_timeout=30))
+    await lkapi.agent_dispatch.create_dispatch(
+        api.CreateAgentDispatchRequest(
+            agent_name=args.agent_name,
+            room=room_name,
+            metadata=json.dumps({"tenant": scenario["tenant"], "replay": call_script(scenario)}),
+        )
+    )
+    token = (
+        api.AccessToken(args.api_key, args.api_secret)
+        .with_identity(f"sip_{phone}")
+        .with_kind("sip")
+        .with_attributes({"sip.phoneNumber": phone})
+        .with_grants(api.VideoGrants(room_join=True, room=room_name))
+        .to_jwt()
+    )
+
+    room = rtc.Room()
+    mic = Microphone()
+    listener = AgentListener(args.threshold)
+
+    @room.on("track_subscribed")
+    def _on_track_subscribed(track, publication, participant):
+        if track.kind == rtc.TrackKind.KIND_AUDIO:
+            listener.attach(track)
+
+    try:
+        await room.connect(args.url, token)
+        await mic.publish(room)
+        joined = time.perf_counter()
+        greeting = await listener.speech_after(joined, args.timeout)
+        result["greeting"] = greeting - joined
+        await listener.silence(args.silence, args.timeout)
+
+        for turn in scenario["turns"]:
+            speech_end = await mic.say(turn["frames"])
+            answer = await listener.speech_after(speech_end, args.timeout)
+            result["turns"].append({"transcript": turn["transcript"], "response": answer - speech_end})
+            await listener.silence(args.silence, args.timeout)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = repr(e)
+    finally:
+        await mic.aclose()
+        await listener.aclose()
+        await room.disconnect()
+        try:
+            await lkapi.room.delete_room(api.DeleteRoomRequest(room=room_name))
+        except Exception:
+            pass
+
+    trace = await read_trace(args.trace_dir, room_name, args.trace_timeout)
+    if not trace:
+        result["ok"] = False
+        result.setdefault("error", f"no trace for {room_name} in {args.trace_dir}")
+    # trace turn 0 is the greeting, then one per caller turn
+    stages = [line.get("latency", {}) for line in trace if line.get("type") == "turn"]
+    for i, turn in enumerate(result["turns"]):
+        turn["stages"] = stages[i + 1] if i + 1 < len(stages) else {}
+    result["tool_calls"] = []
+    for line in trace:
+        if line.get("type") != "tool_call":
+            continue
+        call = {k: line.get(k) for k in ("tool", "arguments", "duration", "outcome", "turn") if k in line}
+        if line.get("background"):
+            # the result of a tool that went on in the background completes its first record
+            first = next((c for c in result["tool_calls"] if c["tool"] == call["tool"] and c.get("outcome") == "background"), None)
+            if first is not None:
+                first.update(duration=call.get("duration"), outcome=call.get("outcome"))
+                continue
+        result["tool_calls"].append(call)
+    result["tool_check"] = check_tool_calls(scenario.get("expected_tool_calls", []), result["tool_calls"])
+    return result
+
+
+def metrics(results: list[dict]) -> dict:
+    """Median seconds per scenario greeting, turn and tool, the values compared with a baseline."""
+    samples = {}
+    for result in results:
+        name = result["scenario"]
+        if "greeting" in result:
+            samples.setdefault(f"{name}/greeting", []).append(result["greeting"])
+        for i, turn in enumerate(result["turns"]):
+            samples.setdefault(f"{name}/turn{i + 1}", []).append(turn["response"])
+        for call in result["tool_calls"]:
+            samples.setdefault(f"{name}/tool/{call['tool']}", []).append(call["duration"])
+    return {key: round(statistics.median(values), 3) for key, values in sorted(samples.items())}
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for key, value in current.items():
+        before = baseline.get(key)
+        if before is not None and value - before > tolerance:
+            regressions.append(f"{key}: {before:.3f}s -> {value:.3f}s (+{(value - before) * 1000:.0f} ms)")
+    return regressions
+
+
+async def main(args):
+    paths = [p for pattern in args.scenarios for p in sorted(glob.glob(pattern))]
+    if not paths:
+        raise SystemExit("no scenarios: pass one or more replay scenario JSON files")
+    scenarios = []
+    for path in paths:
+        try:
+            scenarios.append(load_scenario(path))
+        except FileNotFoundError as e:
+            print(f"skipping {path}: no recording at {e.filename}, record the caller's turns as 16-bit WAV files")
+    if not scenarios:
+        raise SystemExit("no scenario has its recordings, see the replay.py docstring")
+
+    lkapi = api.LiveKitAPI(url=args.url, api_key=args.api_key, api_secret=args.api_secret)
+    results = []
+    for _ in range(args.repeat):
+        for scenario in scenarios:
+            result = await replay_call(scenario, args, lkapi)
+            results.append(result)
+            check = result["tool_check"]
+            status = "ok" if result["ok"] else result.get("error")
+            print(
+                f"{scenario['name']}: {status}, greeting {result.get('greeting', float('nan')):.2f}s, "
+                f"turns {[round(t['response'], 2) for t in result['turns']]}, "
+                f"tool calls {'correct' if check['correct'] else 'WRONG'}"
+            )
+    await lkapi.aclose()
+
+    if any("arguments" not in call for r in results for call in r["tool_calls"]):
+        print("warning: the trace has no tool arguments, run the worker with TRACE_TOOL_ARGS=1 to check them")
+    stage_names = [stage for stage in STAGES if stage != "first_audio"]
+    turns = [t for r in results for t in r["turns"]]
+    report = {
+        "calls": len(results),
+        "completed": sum(r["ok"] for r in results),
+        "tool_calls_correct": sum(r["tool_check"]["correct"] for r in results),
+        "greeting_s": summarize([r["greeting"] for r in results if "greeting" in r]),
+        "response_s": summarize([t["response"] for t in turns]),
+        "stages_s": {stage: summarize([t["stages"][stage] for t in turns if stage in t["stages"]]) for stage in stage_names},
+        "metrics": metrics(results),
+        "errors": sorted({r["error"] for r in results if "error" in r}),
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"report": report, "calls": results}, f, indent=2, ensure_ascii=False)
+
+    failed = report["completed"] < report["calls"] or report["tool_calls_correct"] < report["calls"]
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["report"]["metrics"]
+        regressions = compare(report["metrics"], baseline, args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        failed = failed or bool(regressions)
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded calls against a worker on the replay providers")
+    parser.add_argument("scenarios", nargs="*", default=["replay/scenarios/*.json"], help="scenario JSON files (globs allowed)")
+    parser.add_argument("--url", default=os.getenv("LIVEKIT_URL", "ws://localhost:7880"))
+    parser.add_argument("--api-key", default=os.getenv("LIVEKIT_API_KEY", "devkey"))
+    parser.add_argument("--api-secret", default=os.getenv("LIVEKIT_API_SECRET", "secret"))
+    parser.add_argument("--agent-name", default="replay", help="WORKER_AGENT_NAME of the replay worker")
+    parser.add_argument("--trace-dir", default=os.getenv("TRACE_DIR", "replay/traces"), help="TRACE_DIR of the replay worker")
+    parser.add_argument("--repeat", type=int, default=3, help="times to replay each scenario; medians are compared")
+    parser.add_argument("--timeout", type=float, default=20.0, help="seconds to wait for the agent to answer")
+    parser.add_argument("--trace-timeout", type=float, default=10.0, help="seconds to wait for the call trace after hanging up")
+    parser.add_argument("--silence", type=float, default=1.0, help="agent silence that ends its reply, in seconds")
+    parser.add_argument("--threshold", type=float, default=300.0, help="RMS level that counts as agent speech")
+    parser.add_argument("--baseline", help="report JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="seconds a metric may grow over the baseline")
+    parser.add_argument("--out", help="write the report and per-call results as JSON")
+    asyncio.run(main(parser.parse_args()))
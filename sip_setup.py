@@ -0,0 +1,154 @@
+import argparse
+import asyncio
+import json
+
+from dotenv import load_dotenv
+from google.protobuf.json_format import MessageToDict, ParseDict
+from livekit import api
+from livekit.protocol.agent_dispatch import RoomAgentDispatch
+from livekit.protocol.sip import (
+    CreateSIPDispatchRuleRequest,
+    DeleteSIPDispatchRuleRequest,
+    ListSIPDispatchRuleRequest,
+    SIPDispatchRuleInfo,
+)
+
+from tenants import load_tenants, resolve_path
+
+load_dotenv(dotenv_path="./.env.local")
+
+# Manages the inbound SIP dispatch rule from dispatch-rule.json.
+#
+# The rule uses individual dispatch: every inbound call gets a fresh room named
+# `<roomPrefix>_<caller number>_<random>`, which is what `get_mobile_number`
+# parses, and LiveKit hands each room to one available agent worker. Concurrent
+# callers therefore never share a room, and adding worker processes (on any
+# number of machines) adds capacity.
+#
+# The multi-tenant worker picks the line from the room prefix, so each line's
+# trunk needs its own rule whose roomPrefix is one of that tenant's
+# `room_prefixes` in tenants.json. --tenant makes that rule from the rule file:
+# it is named `<tenant>-inbound` (rules are updated by name, so every line keeps
+# its own), gets the tenant's first prefix and, with --agent-name, carries the
+# tenant in the dispatch metadata. Give the line's trunk with --trunk, or a rule
+# file of its own in the same format as dispatch-rule.json (its "trunk_ids" are
+# the line's trunks; "name" and "roomPrefix" are set from the tenant). A room
+# that matches no prefix is served by the default tenant. dispatch-rule.json's
+# "call-" rooms are the workflow line.
+#
+#     python sip_setup.py apply                  # create or update the rule
+#     python sip_setup.py apply --replace        # also delete other rules on the trunks,
+#                                                # e.g. the old direct "open-room" rule
+#     python sip_setup.py apply --tenant benchmark-hindi --trunk ST_<hindi trunk id>
+#     python sip_setup.py apply --agent-name benchmark-workflow
+#     python sip_setup.py list
+
+
+def load_rule(
+    path: str,
+    agent_name: str | None = None,
+    metadata: str = "",
+    tenant: str | None = None,
+    trunk_ids: list[str] | None = None,
+) -> CreateSIPDispatchRuleRequest:
+    """
+    Reads a dispatch rule in the `lk sip dispatch create` JSON format. With
+    `agent_name` the rule dispatches that agent explicitly into every call room
+    (for workers registered with an agent name). With `tenant` the rule becomes
+    that line's own `<tenant>-inbound` rule: the call rooms get the profile's
+    room prefix, and an explicit dispatch carries the tenant in its metadata.
+    `trunk_ids` replace the file's trunks.
+    """
+    with open(resolve_path(path), encoding="utf-8") as f:
+        request = ParseDict(json.load(f), CreateSIPDispatchRuleRequest())
+    if trunk_ids:
+        request.trunk_ids[:] = trunk_ids
+    if tenant:
+        profile = load_tenants().tenants[tenant]
+        if not profile.room_prefixes:
+            raise ValueError(f"tenant {tenant} has no room_prefixes in tenants.json")
+        request.name = f"{tenant}-inbound"
+        request.rule.dispatch_rule_individual.room_prefix = profile.room_prefixes[0]
+        if agent_name:
+            metadata = json.dumps({**(json.loads(metadata) if metadata else {}), "tenant": tenant})
+    if agent_name:
+        del request.room_config.agents[:]
+        request.room_config.agents.append(RoomAgentDispatch(agent_name=agent_name, metadata=metadata))
+    return request
+
+
+def _rule_info(request: CreateSIPDispatchRuleRequest) -> SIPDispatchRuleInfo:
+    return SIPDispatchRuleInfo(
+        name=request.name,
+        rule=request.rule,
+        trunk_ids=request.trunk_ids,
+        hide_phone_number=request.hide_phone_number,
+        inbound_numbers=request.inbound_numbers,
+        metadata=request.metadata,
+        attributes=request.attributes,
+        room_config=request.room_config,
+    )
+
+
+async def apply_rule(lkapi: api.LiveKitAPI, request: CreateSIPDispatchRuleRequest, replace: bool = False):
+    """
+    Creates the rule, or updates the existing rule with the same name. Other
+    rules on the same trunks would conflict with it; they are deleted when
+    `replace` is set, otherwise reported.
+    """
+    existing = await lkapi.sip.list_dispatch_rule(ListSIPDispatchRuleRequest(trunk_ids=request.trunk_ids))
+    current = next((r for r in existing.items if r.name == request.name), None)
+
+    for rule in existing.items:
+        if rule is current:
+            continue
+        if replace:
+            print(f"deleting conflicting dispatch rule {rule.sip_dispatch_rule_id} ({rule.name or 'unnamed'})")
+            await lkapi.sip.delete_dispatch_rule(
+                DeleteSIPDispatchRuleRequest(sip_dispatch_rule_id=rule.sip_dispatch_rule_id)
+            )
+        else:
+            print(
+                f"warning: dispatch rule {rule.sip_dispatch_rule_id} ({rule.name or 'unnamed'}) is also on "
+                "these trunks, rerun with --replace to remove it"
+            )
+
+    if current is not None:
+        info = await lkapi.sip.update_dispatch_rule(current.sip_dispatch_rule_id, _rule_info(request))
+        print(f"updated dispatch rule {info.sip_dispatch_rule_id}")
+    else:
+        info = await lkapi.sip.create_dispatch_rule(request)
+        print(f"created dispatch rule {info.sip_dispatch_rule_id}")
+    return info
+
+
+async def main(args):
+    async with api.LiveKitAPI() as lkapi:
+        if args.command == "apply":
+            request = load_rule(args.file, args.agent_name, args.metadata, args.tenant, args.trunk)
+            await apply_rule(lkapi, request, replace=args.replace)
+        elif args.command == "list":
+            rules = await lkapi.sip.list_dispatch_rule(ListSIPDispatchRuleRequest())
+            for rule in rules.items:
+                print(json.dumps(MessageToDict(rule), indent=2))
+        elif args.command == "delete":
+            await lkapi.sip.delete_dispatch_rule(DeleteSIPDispatchRuleRequest(sip_dispatch_rule_id=args.rule_id))
+            print(f"deleted dispatch rule {args.rule_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the inbound SIP dispatch rule")
+    parser.add_argument("command", choices=["apply", "list", "delete"])
+    parser.add_argument("rule_id", nargs="?", help="rule to delete")
+    parser.add_argument("--file", default="dispatch-rule.json")
+    parser.add_argument("--agent-name", help="dispatch this agent explicitly into every call room")
+    parser.add_argument("--metadata", default="", help="job metadata for the explicit dispatch, e.g. '{\"tenant\": \"benchmark-workflow\"}'")
+    parser.add_argument("--tenant", help="tenants.json profile this rule's calls go to: names the rule and sets the room prefix (and dispatch metadata)")
+    parser.add_argument("--trunk", action="append", help="inbound trunk id of the rule, instead of the file's (repeatable)")
+    parser.add_argument("--replace", action="store_true", help="delete other dispatch rules on the same trunks")
+    args = parser.parse_args()
+    if args.command == "delete" and not args.rule_id:
+        parser.error("delete needs a rule id")
+    if args.tenant and not args.trunk and args.file == parser.get_default("file"):
+        parser.error("a --tenant rule is for that line's trunk: pass --trunk or a --file of its own")
+    asyncio.run(main(args))
@@ -0,0 +1,288 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import re
+import time
+
+from livekit.agents import APIConnectOptions, llm
+from livekit.agents.metrics import LLMMetrics
+from livekit.agents.pipeline.pipeline_agent import SpeechDataContextVar
+
+from context_window import _message_tokens, estimate_tokens
+
+logger = logging.getLogger("voice-agent")
+
+_DEFAULT_CONN_OPTIONS = APIConnectOptions()
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+
+def edit_distance(a: str, b: str) -> float:
+    """Character edit distance between two transcripts, normalized to 0..1."""
+    a, b = _normalize(a), _normalize(b)
+    if not a or not b:
+        return 0.0 if a == b else 1.0
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1] / max(len(a), len(b))
+
+
+# Totals for the calls handled by this process
+process_stats = {"speculations": 0, "hits": 0, "wasted_prompt_tokens": 0, "wasted_completion_tokens": 0}
+
+
+class _SpeculativeStream(llm.LLMStream):
+    """
+    Runs the LLM request for a guessed user message and buffers the reply until
+    the pipeline asks for it, counting what it received in case it is thrown away.
+
+    The pipeline attributes LLM metrics to the speech whose id is set where they
+    are emitted. The wrapped request runs with none, so its own metrics are
+    dropped, and this stream reports them once `keep()` gives it the id of the
+    reply that uses it; a discarded speculation reports nothing.
+    """
+
+    def __init__(self, agent, *, chat_ctx: llm.ChatContext, user_text: str):
+        super().__init__(agent.llm, chat_ctx=chat_ctx, fnc_ctx=agent.fnc_ctx, conn_options=_DEFAULT_CONN_OPTIONS)
+        self.user_text = user_text
+        self.prompt_tokens = sum(_message_tokens(m) for m in chat_ctx.messages)
+        self.completion_tokens = 0.0
+        self._inner_stream = None
+        self._kept = asyncio.Future()  # the reply's speech data, or None once discarded
+
+    def keep(self, speech_data):
+        if not self._kept.done():
+            self._kept.set_result(speech_data)
+
+    def discard(self):
+        self.keep(None)
+
+    async def _metrics_monitor_task(self, event_aiter):
+        start = time.perf_counter()
+        ttft, request_id, usage = -1.0, "", None
+        async for chunk in event_aiter:
+            request_id = chunk.request_id
+            if ttft == -1.0:
+                ttft = time.perf_counter() - start
+            usage = chunk.usage or usage
+        duration = time.perf_counter() - start
+
+        speech_data = await self._kept
+        if speech_data is None:
+            return
+        SpeechDataContextVar.set(speech_data)
+        self._llm.emit(
+            "metrics_collected",
+            LLMMetrics(
+                timestamp=time.time(),
+                request_id=request_id,
+                ttft=ttft,
+                duration=duration,
+                cancelled=self._task.cancelled(),
+                label=self._llm._label,
+                completion_tokens=usage.completion_tokens if usage else 0,
+                prompt_tokens=usage.prompt_tokens if usage else 0,
+                total_tokens=usage.total_tokens if usage else 0,
+                tokens_per_second=usage.completion_tokens / duration if usage else 0.0,
+                error=None,
+            ),
+        )
+
+    @property
+    def function_calls(self) -> list[llm.FunctionCallInfo]:
+        return self._inner_stream.function_calls if self._inner_stream else []
+
+    @property
+    def chat_ctx(self) -> llm.ChatContext:
+        return self._inner_stream.chat_ctx if self._inner_stream else self._chat_ctx
+
+    @property
+    def fnc_ctx(self) -> llm.FunctionContext | None:
+        return self._inner_stream.fnc_ctx if self._inner_stream else self._fnc_ctx
+
+    def execute_functions(self) -> list[llm.CalledFunction]:
+        return self._inner_stream.execute_functions() if self._inner_stream else []
+
+    async def _run(self):
+        context = contextvars.copy_context()
+        context.run(SpeechDataContextVar.set, None)
+        self._inner_stream = context.run(self._llm.chat, chat_ctx=self._chat_ctx, fnc_ctx=self._fnc_ctx)
+        async with self._inner_stream as stream:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    self.prompt_tokens = chunk.usage.prompt_tokens
+                    self.completion_tokens = chunk.usage.completion_tokens
+                for choice in chunk.choices:
+                    self.completion_tokens += estimate_tokens(choice.delta.content or "")
+                self._event_ch.send_nowait(chunk)
+
+
+class SpeculativeReply:
+    """
+    Opt-in speculative LLM requests (SPECULATIVE_LLM=1).
+
+    The pipeline normally waits for the final transcript and the end-of-turn
+    decision before calling the LLM. Here the request starts as soon as the
+    interim transcript is stable: unchanged over `stable_interims` interim results,
+    or when VAD reports the end of speech. When the pipeline then asks for the
+    reply, the guess is kept if the final transcript is within `max_distance`
+    (normalized character edit distance, SPECULATIVE_MAX_DISTANCE, default 0.15)
+    of it, and cancelled otherwise.
+
+    Use `before_llm_cb` as the VoicePipelineAgent's callback with the existing one
+    as `inner`; `prepare` bounds the speculative context the same way the inner
+    callback would (e.g. ContextWindow.trim) and `record(agent)` stands in for the
+    inner callback's bookkeeping on the turns a kept guess answers (e.g.
+    ContextWindow.record), and `can_speculate` can rule it out,
+    e.g. while IntakeFlow answers from its script. Call `attach(agent)` after
+    `agent.start()`. Hit rate and wasted tokens are in `summary()`, which
+    trace_call writes to the call trace (and latency_trace's /metrics reports
+    per tenant and language), and are logged by `aclose()`.
+    """
+
+    def __init__(
+        self,
+        *,
+        inner=None,
+        prepare=None,
+        record=None,
+        can_speculate=None,
+        enabled: bool | None = None,
+        max_distance: float | None = None,
+        stable_interims: int = 2,
+        min_chars: int = 6,
+    ):
+        self.enabled = enabled if enabled is not None else os.getenv("SPECULATIVE_LLM", "0") == "1"
+        self._inner = inner
+        self._prepare = prepare
+        self._record = record
+        self._can_speculate = can_speculate
+        self._max_distance = max_distance if max_distance is not None else float(os.getenv("SPECULATIVE_MAX_DISTANCE", "0.15"))
+        self._stable_interims = stable_interims
+        self._min_chars = min_chars
+        self._agent = None
+        self._interim = ""
+        self._repeats = 0
+        self._speculation = None
+        self._closing = set()
+        self.stats = {
+            "speculations": 0,
+            "hits": 0,
+            "misses": 0,
+            "superseded": 0,
+            "wasted_prompt_tokens": 0,
+            "wasted_completion_tokens": 0,
+        }
+
+    def attach(self, agent):
+        if not self.enabled:
+            return
+        self._agent = agent
+        human_input = agent._human_input
+        human_input.on("interim_transcript", self._on_interim_transcript)
+        human_input.on("final_transcript", self._on_final_transcript)
+        human_input.on("end_of_speech", self._on_end_of_speech)
+
+    def _guess(self) -> str:
+        return " ".join(t for t in (self._agent._transcribed_text, self._interim) if t).strip()
+
+    def _on_interim_transcript(self, ev):
+        text = ev.alternatives[0].text
+        if _normalize(text) == _normalize(self._interim):
+            self._repeats += 1
+        else:
+            self._interim, self._repeats = text, 1
+        if self._repeats >= self._stable_interims:
+            self._speculate(self._guess())
+
+    def _on_final_transcript(self, ev):
+        self._interim, self._repeats = "", 0
+
+    def _on_end_of_speech(self, ev):
+        self._speculate(self._guess())
+
+    def _speculate(self, user_text: str):
+        if len(_normalize(user_text)) < self._min_chars:
+            return
+        if self._can_speculate is not None and not self._can_speculate():
+            return
+        current = self._speculation
+        if current is not None:
+            if _normalize(current.user_text) == _normalize(user_text):
+                return
+            self.stats["superseded"] += 1
+            self._discard()
+
+        chat_ctx = self._agent.chat_ctx.copy()
+        chat_ctx.messages.append(llm.ChatMessage.create(role="user", text=user_text))
+        if self._prepare is not None:
+            chat_ctx = self._prepare(chat_ctx)
+        self.stats["speculations"] += 1
+        self._speculation = _SpeculativeStream(self._agent, chat_ctx=chat_ctx, user_text=user_text)
+
+    def _discard(self) -> asyncio.Task | None:
+        speculation, self._speculation = self._speculation, None
+        if speculation is None:
+            return None
+
+        speculation.discard()
+        self._closing.add(speculation)
+
+        async def _close():
+            await speculation.aclose()
+            self._closing.discard(speculation)
+            self.stats["wasted_prompt_tokens"] += round(speculation.prompt_tokens)
+            self.stats["wasted_completion_tokens"] += round(speculation.completion_tokens)
+
+        return asyncio.create_task(_close())
+
+    def summary(self) -> dict:
+        """This call's stats so far; speculations not closed yet count as wasted."""
+        stats = dict(self.stats)
+        for speculation in [*self._closing, *filter(None, [self._speculation])]:
+            stats["wasted_prompt_tokens"] += round(speculation.prompt_tokens)
+            stats["wasted_completion_tokens"] += round(speculation.completion_tokens)
+        stats["hit_rate"] = round(stats["hits"] / stats["speculations"], 3) if stats["speculations"] else None
+        return stats
+
+    async def before_llm_cb(self, agent, chat_ctx: llm.ChatContext):
+        speculation, self._speculation = self._speculation, None
+        last = chat_ctx.messages[-1] if chat_ctx.messages else None
+        if speculation is not None and last is not None and last.role == "user":
+            distance = edit_distance(speculation.user_text, str(last.content or ""))
+            if distance <= self._max_distance:
+                self.stats["hits"] += 1
+                logger.debug(f"speculative reply kept (distance {distance:.2f})")
+                speculation.keep(SpeechDataContextVar.get(None))
+                if self._record is not None:
+                    self._record(agent)
+                return speculation
+            self.stats["misses"] += 1
+            logger.debug(f"speculative reply dropped (distance {distance:.2f}): {speculation.user_text!r}")
+        self._speculation = speculation
+        self._discard()
+
+        if self._inner is None:
+            return None
+        return await self._inner(agent, chat_ctx)
+
+    async def aclose(self):
+        closing = self._discard()
+        if closing is not None:
+            await closing
+        if not self.enabled:
+            return
+        for key in process_stats:
+            process_stats[key] += self.stats[key]
+        logger.info(f"speculative LLM for this call: {json.dumps(self.summary())}")
+        logger.info(f"speculative LLM for this process: {json.dumps(process_stats)}")
@@ -0,0 +1,283 @@
+import array
+import asyncio
+import itertools
+import json
+import math
+import random
+import re
+
+from livekit import rtc
+from livekit.agents import APIConnectOptions, llm, stt, tts, utils
+from livekit.agents.job import get_current_job_context
+
+# Stand-in STT/LLM/TTS clients for load testing. They answer locally after a
+# configurable (optionally jittered) delay, so a worker can be benchmarked without
+# provider accounts, network or billing. Selected with {"provider": "stub"} in a
+# tenant profile, see loadtest/tenants.json.
+#
+# The Replay* clients answer from the call script of replay.py instead, which
+# comes with the job (see replay_script()); PROVIDER_OVERRIDE=replay puts them in
+# place of every provider.
+
+_DEFAULT_CONN_OPTIONS = APIConnectOptions()
+
+
+async def _delay(seconds: float, jitter: float):
+    if jitter:
+        seconds = max(0.0, random.gauss(seconds, jitter))
+    if seconds:
+        await asyncio.sleep(seconds)
+
+
+class StubSTT(stt.STT):
+    """
+    Non-streaming STT (VoicePipelineAgent adds VAD segmentation) that returns the
+    next transcript from `transcripts` after `latency` seconds.
+    """
+
+    def __init__(
+        self,
+        *,
+        transcripts=("I want to register a complaint about my washing machine.",),
+        latency: float = 0.2,
+        jitter: float = 0.0,
+        language: str = "en",
+    ):
+        super().__init__(capabilities=stt.STTCapabilities(streaming=False, interim_results=False))
+        self._transcripts = itertools.cycle([transcripts] if isinstance(transcripts, str) else transcripts)
+        self._latency = latency
+        self._jitter = jitter
+        self._language = language
+
+    async def _recognize_impl(self, buffer, *, language=None, conn_options=_DEFAULT_CONN_OPTIONS):
+        await _delay(self._latency, self._jitter)
+        return stt.SpeechEvent(
+            type=stt.SpeechEventType.FINAL_TRANSCRIPT,
+            request_id=utils.shortuuid(),
+            alternatives=[stt.SpeechData(language=language or self._language, text=next(self._transcripts), confidence=1.0)],
+        )
+
+
+class StubLLM(llm.LLM):
+    """
+    LLM that streams a fixed reply: the first token after `ttft` seconds, then
+    `tokens_per_second` words per second.
+    """
+
+    def __init__(
+        self,
+        *,
+        reply: str = "Sure, I can help you with that. May I have your full name please?",
+        ttft: float = 0.35,
+        tokens_per_second: float = 80.0,
+        jitter: float = 0.0,
+    ):
+        super().__init__()
+        self.reply = reply
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.jitter = jitter
+
+    def chat(self, *, chat_ctx, conn_options=_DEFAULT_CONN_OPTIONS, fnc_ctx=None, **kwargs) -> "StubLLMStream":
+        return StubLLMStream(self, chat_ctx=chat_ctx, fnc_ctx=fnc_ctx, conn_options=conn_options)
+
+
+class StubLLMStream(llm.LLMStream):
+    async def _run(self):
+        stub = self._llm
+        request_id = utils.shortuuid()
+        words = stub.reply.split(" ")
+        prompt_tokens = sum(len(str(m.content or "")) for m in self._chat_ctx.messages) // 4
+
+        await _delay(stub.ttft, stub.jitter)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(1 / stub.tokens_per_second)
+                word = " " + word
+            self._event_ch.send_nowait(
+                llm.ChatChunk(
+                    request_id=request_id,
+                    choices=[llm.Choice(delta=llm.ChoiceDelta(role="assistant", content=word))],
+                )
+            )
+        self._event_ch.send_nowait(
+            llm.ChatChunk(
+                request_id=request_id,
+                usage=llm.CompletionUsage(
+                    completion_tokens=len(words),
+                    prompt_tokens=prompt_tokens,
+                    total_tokens=prompt_tokens + len(words),
+                ),
+            )
+        )
+
+
+class StubTTS(tts.TTS):
+    """
+    Non-streaming TTS that returns a tone lasting `seconds_per_char` per character
+    after `ttfb` seconds, so callers can detect agent speech by its energy.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttfb: float = 0.15,
+        jitter: float = 0.0,
+        seconds_per_char: float = 0.06,
+        sample_rate: int = 24000,
+        frequency: float = 440.0,
+    ):
+        super().__init__(
+            capabilities=tts.TTSCapabilities(streaming=False),
+            sample_rate=sample_rate,
+            num_channels=1,
+        )
+        self.ttfb = ttfb
+        self.jitter = jitter
+        self.seconds_per_char = seconds_per_char
+        self.frequency = frequency
+        # One 100ms frame of the tone, built once and copied into every frame, so
+        # the stub spends no CPU on the worker's loop that a real TTS client wouldn't
+        step = 2 * math.pi * frequency / sample_rate
+        self._tone = array.array("h", (int(8000 * math.sin(step * i)) for i in range(sample_rate // 10))).tobytes()
+
+    def synthesize(self, text: str, *, conn_options=None) -> "StubChunkedStream":
+        return StubChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+
+class StubChunkedStream(tts.ChunkedStream):
+    async def _run(self):
+        stub = self._tts
+        request_id = utils.shortuuid()
+        await _delay(stub.ttfb, stub.jitter)
+
+        samples_per_frame = stub.sample_rate // 10
+        total = int(len(self._input_text) * stub.seconds_per_char * stub.sample_rate)
+        for start in range(0, total, samples_per_frame):
+            count = min(samples_per_frame, total - start)
+            frame = rtc.AudioFrame(data=stub._tone[: 2 * count], sample_rate=stub.sample_rate, num_channels=1, samples_per_channel=count)
+            self._event_ch.send_nowait(tts.SynthesizedAudio(request_id=request_id, frame=frame))
+
+
+def replay_script() -> dict:
+    """The replay.py call script of the current job: the "replay" key of its dispatch metadata."""
+    job = get_current_job_context().job
+    try:
+        return json.loads(job.metadata or "{}").get("replay") or {}
+    except ValueError:
+        return {}
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+class ReplaySTT(stt.STT):
+    """
+    Non-streaming STT that returns the scripted transcripts of the current call in
+    order, one per VAD segment, after `latency` seconds.
+    """
+
+    def __init__(self, *, latency: float = 0.2, language: str = "en"):
+        super().__init__(capabilities=stt.STTCapabilities(streaming=False, interim_results=False))
+        self._latency = latency
+        self._language = language
+        self._next_turn = {}
+
+    async def _recognize_impl(self, buffer, *, language=None, conn_options=_DEFAULT_CONN_OPTIONS):
+        job_id = get_current_job_context().job.id
+        turns = replay_script().get("turns", [])
+        index = self._next_turn.get(job_id, 0)
+        self._next_turn[job_id] = index + 1
+        text = turns[index]["transcript"] if index < len(turns) else ""
+        await asyncio.sleep(self._latency)
+        return stt.SpeechEvent(
+            type=stt.SpeechEventType.FINAL_TRANSCRIPT,
+            request_id=utils.shortuuid(),
+            alternatives=[stt.SpeechData(language=language or self._language, text=text, confidence=1.0)],
+        )
+
+
+class ReplayLLM(llm.LLM):
+    """
+    LLM that answers from the call script: the turn whose transcript is the
+    caller's latest message gives the `reply` (and `tool_calls`), and once the
+    tools have run, the `after_tools` reply. Timing is fixed: the first token after
+    `ttft` seconds, then `tokens_per_second` words per second.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttft: float = 0.35,
+        tokens_per_second: float = 80.0,
+        fallback: str = "Sorry, could you say that again?",
+    ):
+        super().__init__()
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.fallback = fallback
+
+    def chat(self, *, chat_ctx, conn_options=_DEFAULT_CONN_OPTIONS, fnc_ctx=None, **kwargs) -> "ReplayLLMStream":
+        return ReplayLLMStream(self, chat_ctx=chat_ctx, fnc_ctx=fnc_ctx, conn_options=conn_options)
+
+
+class ReplayLLMStream(llm.LLMStream):
+    def _scripted_turn(self) -> tuple[dict, bool]:
+        """The script turn being answered, and whether its tools have already run."""
+        after_tools = False
+        for message in reversed(self._chat_ctx.messages):
+            if message.role == "tool":
+                after_tools = True
+            elif message.role == "user":
+                text = _normalize(str(message.content or ""))
+                turn = next((t for t in replay_script().get("turns", []) if _normalize(t["transcript"]) == text), {})
+                return turn, after_tools
+        return {}, after_tools
+
+    async def _run(self):
+        replay = self._llm
+        request_id = utils.shortuuid()
+        turn, after_tools = self._scripted_turn()
+        if not turn:
+            reply = replay.fallback
+        else:
+            reply = turn.get("after_tools" if after_tools else "reply", "")
+        words = reply.split(" ") if reply else []
+
+        await asyncio.sleep(replay.ttft)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(1 / replay.tokens_per_second)
+                word = " " + word
+            self._event_ch.send_nowait(
+                llm.ChatChunk(
+                    request_id=request_id,
+                    choices=[llm.Choice(delta=llm.ChoiceDelta(role="assistant", content=word))],
+                )
+            )
+
+        if after_tools or self._fnc_ctx is None:
+            return
+        calls = []
+        for call in turn.get("tool_calls", []):
+            info = self._fnc_ctx.ai_functions.get(call["name"])
+            if info is None:
+                continue
+            arguments = call.get("arguments", {})
+            calls.append(
+                llm.FunctionCallInfo(
+                    tool_call_id=utils.shortuuid(),
+                    function_info=info,
+                    raw_arguments=json.dumps(arguments),
+                    arguments=arguments,
+                )
+            )
+        if calls:
+            self._function_calls_info.extend(calls)
+            self._event_ch.send_nowait(
+                llm.ChatChunk(
+                    request_id=request_id,
+                    choices=[llm.Choice(delta=llm.ChoiceDelta(role="assistant", tool_calls=calls))],
+                )
+            )
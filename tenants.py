@@ -0,0 +1,135 @@
+import json
+import logging
+import os
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger("voice-agent")
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class ProviderSpec(BaseModel):
+    provider: str = Field(..., description="Plugin name, e.g. deepgram, google, openai, groq, route (LLM routing over several providers) or stub/replay for load tests and the call replay benchmark")
+    options: dict = Field(default_factory=dict, description="Keyword arguments for the plugin constructor")
+    cache_voice: Optional[str] = Field(default=None, description="Voice name used in the TTS phrase cache key")
+    cache_language: Optional[str] = Field(default=None, description="Language used in the TTS phrase cache key")
+
+
+class TenantProfile(BaseModel):
+    name: str = Field(default="", description="Profile name, filled in from the tenants.json key")
+    description: str = ""
+    agent_names: list[str] = Field(default_factory=list, description="Dispatch agent names served by this profile")
+    room_prefixes: list[str] = Field(default_factory=list, description="Room name prefixes served by this profile: the roomPrefix of the line's SIP dispatch rule, see sip_setup.py")
+    script: Optional[str] = Field(default=None, description="Agent script whose own prewarm/entrypoint handle the job")
+    language: Optional[str] = Field(default=None, description="Caller language, selects the tuned turn-taking profile in turn_profiles/")
+    prompt_file: Optional[str] = None
+    greeting: Optional[str] = None
+    stock_phrases: list[str] = Field(default_factory=list, description="Extra fixed lines for the TTS phrase cache")
+    stt: Optional[ProviderSpec] = None
+    llm: Optional[ProviderSpec] = None
+    tts: Optional[ProviderSpec] = None
+    tools: Optional[str] = Field(default=None, description="Tool set name from tools.TOOLSETS")
+    tool_options: dict = Field(default_factory=dict)
+    allow_interruptions: bool = True
+    greeting_allow_interruptions: bool = False
+    turn_detector: Optional[str] = Field(
+        default=None,
+        description="'eou' or 'eou-multilingual' to use the end-of-utterance model, over the turn-taking profile's choice",
+    )
+    intake: Optional[dict] = Field(default=None, description="IntakeFlow options; enables the scripted complaint intake")
+    context: dict = Field(default_factory=dict, description="ContextWindow options, e.g. max_turns and token_budget")
+    tool_runner: dict = Field(
+        default_factory=dict,
+        description="ToolRunner options: per-tool fillers and timeouts, and tools that may finish in the background",
+    )
+    speculative: dict = Field(
+        default_factory=dict,
+        description="SpeculativeReply options, e.g. enabled and max_distance for this language's STT",
+    )
+
+    def prompt(self) -> str:
+        with open(resolve_path(self.prompt_file), encoding="utf-8") as f:
+            return f.read().rstrip("\n")
+
+
+class TenantConfig(BaseModel):
+    default_tenant: str
+    tenants: dict[str, TenantProfile]
+
+    def active(self) -> list[TenantProfile]:
+        """
+        Profiles this worker serves: only the pinned one when WORKER_TENANT is set,
+        otherwise all of them.
+        """
+        pinned = os.getenv("WORKER_TENANT")
+        if pinned:
+            return [self.tenants[pinned]]
+        return list(self.tenants.values())
+
+    def select(self, job) -> TenantProfile:
+        """
+        Picks the profile for a job, in order: WORKER_TENANT pin, a "tenant" key in
+        the dispatch metadata, the dispatch agent name, the room name prefix, and
+        finally the default tenant.
+
+        An unpinned worker registered without an agent name only sees the room name
+        of an automatically dispatched call, so every line needs its own dispatch
+        rule whose roomPrefix is one of its profile's `room_prefixes`
+        (`python sip_setup.py apply --tenant <name>`). Explicit dispatches carry the
+        tenant in their metadata instead.
+
+        Args:
+            job: The `livekit.protocol.agent.Job` being handled.
+        """
+        pinned = os.getenv("WORKER_TENANT")
+        if pinned:
+            return self.tenants[pinned]
+
+        if job.metadata:
+            try:
+                tenant = json.loads(job.metadata).get("tenant")
+            except (ValueError, AttributeError):
+                tenant = None
+            if tenant in self.tenants:
+                return self.tenants[tenant]
+            if tenant:
+                logger.warning(f"Unknown tenant {tenant!r} in job metadata")
+
+        for profile in self.tenants.values():
+            if job.agent_name and job.agent_name in profile.agent_names:
+                return profile
+
+        room_name = job.room.name
+        for profile in self.tenants.values():
+            if any(room_name.startswith(prefix) for prefix in profile.room_prefixes):
+                return profile
+
+        logger.info(f"no tenant matches room {room_name}, using the default tenant {self.default_tenant}")
+        return self.tenants[self.default_tenant]
+
+
+def resolve_path(path: str) -> str:
+    """Resolves paths in tenants.json relative to the repository root."""
+    return path if os.path.isabs(path) else os.path.join(_BASE_DIR, path)
+
+
+def load_tenants(path: str | None = None) -> TenantConfig:
+    """
+    Loads the tenant profiles from TENANTS_CONFIG (default tenants.json).
+    """
+    path = resolve_path(path or os.getenv("TENANTS_CONFIG", "tenants.json"))
+    with open(path, encoding="utf-8") as f:
+        config = TenantConfig(**json.load(f))
+    for name, profile in config.tenants.items():
+        profile.name = name
+    if config.default_tenant not in config.tenants:
+        raise ValueError(f"default_tenant {config.default_tenant!r} is not defined in {path}")
+    owners = {}
+    for name, profile in config.tenants.items():
+        for prefix in profile.room_prefixes:
+            if prefix in owners:
+                raise ValueError(f"room prefix {prefix!r} is used by both {owners[prefix]} and {name} in {path}")
+            owners[prefix] = name
+    return config
@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from intake import extract_address, extract_issue, extract_name, extract_product, read_confirmation
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Yes.",
+        "Yes, that's correct.",
+        "Yes, no changes.",
+        "Yes that is correct, no problem.",
+        "Correct, nothing to change.",
+        "Okay, go ahead.",
+    ],
+)
+def test_confirmation(text):
+    assert read_confirmation(text) is True
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "No, the address is wrong.",
+        "No.",
+        "Nope, change my name.",
+        "Wrong product.",
+        "Not correct, the issue is different.",
+        "That's wrong.",
+    ],
+)
+def test_correction(text):
+    assert read_confirmation(text) is False
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Yes, but the address is wrong.",
+        "The address is wrong.",
+        "Hmm, let me think.",
+        "Can you repeat that?",
+    ],
+)
+def test_unclear_confirmation(text):
+    assert read_confirmation(text) is None
+
+
+def test_extract_name():
+    assert extract_name("My name is ravi patel.") == ("Ravi Patel", 0.9)
+    assert extract_name("Ravi Patel")[1] >= 0.6
+    assert extract_name("I live at 22 Shanti Nagar")[1] < 0.6
+
+
+def test_extract_address():
+    assert extract_address("My address is 22 Shanti Nagar, Ahmedabad.") == ("22 Shanti Nagar, Ahmedabad", 0.9)
+    assert extract_address("Ahmedabad")[1] < 0.6
+
+
+def test_extract_product():
+    value, confidence = extract_product("I have a Benchmark electric geyser, 25 litre.")
+    assert value.startswith("Benchmark electric geyser") and confidence == 0.9
+    assert extract_product("I don't know")[1] < 0.6
+
+
+def test_extract_issue():
+    assert extract_issue("Um, it is leaking water from the bottom.") == ("it is leaking water from the bottom", 0.9)
+    assert extract_issue("broken")[1] < 0.6
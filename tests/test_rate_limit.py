@@ -0,0 +1,23 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from rate_limit import DEFAULT_LIMITS, SharedTokenBucket
+
+
+def test_background_acquire_on_default_limits(tmp_path):
+    for name, limit in DEFAULT_LIMITS.items():
+        limiter = SharedTokenBucket(name, **limit, state_dir=str(tmp_path))
+        # a full bucket is handed out at once, the next token after a refill
+        asyncio.run(asyncio.wait_for(limiter.acquire(background=True), 0.1))
+        asyncio.run(asyncio.wait_for(limiter.acquire(background=True), 2 / limit["rate"]))
+
+
+def test_background_leaves_the_reserve_to_in_call_requests(tmp_path):
+    limiter = SharedTokenBucket("test-llm", rate=0.001, burst=4, state_dir=str(tmp_path))
+    for _ in range(3):
+        assert limiter._take(1.0, background=True) == 0.0
+    assert limiter._take(1.0, background=True) > 0.0
+    assert limiter._take(1.0, background=False) == 0.0
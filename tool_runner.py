@@ -0,0 +1,146 @@
+import asyncio
+import dataclasses
+import functools
+import json
+import logging
+import os
+import time
+
+from livekit.agents import llm
+
+logger = logging.getLogger("voice-agent")
+
+
+class ToolRunner:
+    """
+    Covers the silence while a tool runs and bounds how long the caller waits.
+
+    - `fillers` maps tool names to a short acknowledgement ("One moment while I
+      register that.") that is spoken as soon as the LLM calls the tool. Add
+      `phrases()` to the TTS phrase cache so it plays with no TTS round trip.
+    - Every tool gets a timeout: `timeouts[name]`, else `default_timeout`
+      (TOOL_TIMEOUT, default 8 seconds). A tool that runs over is cancelled and
+      the LLM is told it timed out, unless it is listed in `background`: those
+      keep running, the LLM is told the result will follow, and when the tool
+      finishes its result is added to the chat context for the next reply and
+      the call is recorded again, with `background` set, its real duration and
+      outcome.
+    - When the caller interrupts the reply, the pipeline cancels the running
+      tools; background tools are shielded and finish anyway.
+
+    Call `attach(agent)` once the VoicePipelineAgent exists. Listeners added with
+    `add_listener` get a record of every tool call (e.g. the CallTracer).
+    """
+
+    def __init__(
+        self,
+        fnc_ctx: llm.FunctionContext,
+        *,
+        fillers: dict | None = None,
+        timeouts: dict | None = None,
+        default_timeout: float | None = None,
+        background=(),
+    ):
+        self._fnc_ctx = fnc_ctx
+        self._fillers = fillers or {}
+        self._timeouts = timeouts or {}
+        self._default_timeout = default_timeout or float(os.getenv("TOOL_TIMEOUT", "8"))
+        self._background = set(background)
+        self._agent = None
+        self._tasks = set()
+        self._listeners = []
+        self.stats = {"fillers": 0, "timeouts": 0, "cancelled": 0, "background_results": 0}
+
+        for name, info in list(fnc_ctx.ai_functions.items()):
+            fnc_ctx.ai_functions[name] = dataclasses.replace(info, callable=self._guard(name, info.callable))
+
+    def phrases(self) -> list[str]:
+        return list(self._fillers.values())
+
+    def add_listener(self, callback):
+        """`callback(record)` is called with the name, arguments, duration and outcome of every tool call."""
+        self._listeners.append(callback)
+
+    def attach(self, agent):
+        self._agent = agent
+        agent.on("function_calls_collected", self._on_function_calls_collected)
+
+    def _on_function_calls_collected(self, fnc_calls):
+        filler = next((self._fillers[c.function_info.name] for c in fnc_calls if c.function_info.name in self._fillers), None)
+        if filler is None:
+            return
+        self.stats["fillers"] += 1
+        # queued behind the speech that called the tool, so it plays right away;
+        # kept out of the chat context so the LLM doesn't repeat it
+        asyncio.create_task(
+            self._agent.say(filler, allow_interruptions=self._agent._opts.allow_interruptions, add_to_chat_ctx=False)
+        )
+
+    def _record(self, name: str, kwargs: dict, started: float, outcome: str, **extra):
+        record = {"tool": name, "arguments": kwargs, "start": started, "duration": time.time() - started, "outcome": outcome, **extra}
+        for callback in self._listeners:
+            callback(record)
+
+    def _guard(self, name: str, fnc):
+        @functools.wraps(fnc)
+        async def guarded(**kwargs):
+            if asyncio.iscoroutinefunction(fnc):
+                task = asyncio.create_task(fnc(**kwargs))
+            else:
+                task = asyncio.create_task(asyncio.to_thread(fnc, **kwargs))
+            timeout = self._timeouts.get(name, self._default_timeout)
+            background = name in self._background
+            started, outcome = time.time(), "ok"
+            try:
+                return await asyncio.wait_for(asyncio.shield(task) if background else task, timeout)
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                if not background:
+                    outcome = "timeout"
+                    logger.warning(f"tool {name} timed out after {timeout}s and was cancelled")
+                    return f"{name} timed out. Apologise to the caller and offer to try again."
+                outcome = "background"
+                logger.warning(f"tool {name} is still running after {timeout}s, finishing in the background")
+                self._finish_in_background(name, task, kwargs, started)
+                return f"{name} is still being processed. Tell the caller it will be done shortly."
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                if background and not task.done():
+                    self._finish_in_background(name, task, kwargs, started)
+                else:
+                    self.stats["cancelled"] += 1
+                raise
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                self._record(name, kwargs, started, outcome)
+
+        return guarded
+
+    def _finish_in_background(self, name: str, task: asyncio.Task, kwargs: dict, started: float):
+        self._tasks.add(task)
+
+        def _done(task: asyncio.Task):
+            self._tasks.discard(task)
+            if task.cancelled():
+                self._record(name, kwargs, started, "cancelled", background=True)
+                return
+            if task.exception() is not None:
+                self._record(name, kwargs, started, "error", background=True)
+                logger.error(f"background tool {name} failed: {task.exception()!r}")
+                text = f"The earlier {name} request failed: {task.exception()}"
+            else:
+                self._record(name, kwargs, started, "ok", background=True)
+                text = f"The earlier {name} request has finished. Result: {task.result()}"
+            self.stats["background_results"] += 1
+            if self._agent is not None:
+                self._agent.chat_ctx.messages.append(llm.ChatMessage.create(role="system", text=text))
+
+        task.add_done_callback(_done)
+
+    async def aclose(self):
+        if self._tasks:
+            # let background tools (e.g. a complaint being submitted) finish
+            await asyncio.wait(self._tasks, timeout=self._default_timeout)
+        logger.info(f"tool runner stats for this call: {json.dumps(self.stats)}")
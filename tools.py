@@ -0,0 +1,123 @@
+import logging
+import os
+from typing import Annotated
+
+from livekit import api
+from livekit.agents import llm
+from livekit.protocol import sip as proto_sip
+
+logger = logging.getLogger("voice-agent")
+
+
+class ComplaintIntakeFnc(llm.FunctionContext):
+    """Tools for the Benchmark complaint lines (English, Hindi, Gujarati)."""
+
+    def __init__(self, options: dict | None = None):
+        super().__init__()
+        self.options = options or {}
+        self.phone_number = None
+
+    def set_call(self, room_name: str, participant_identity: str, phone_number: str | None):
+        self.phone_number = phone_number
+
+    @llm.ai_callable()
+    async def summarize_customer_details(
+        self,
+        customer_name: Annotated[str, llm.TypeInfo(description="The name of the customer")],
+        customer_address: Annotated[str, llm.TypeInfo(description="The address of the customer")],
+        product_details: Annotated[str, llm.TypeInfo(description="Details of the product")],
+        issue_faced: Annotated[str, llm.TypeInfo(description="The issue faced by the customer")],
+    ):
+        """Called once all customer details are fetched. This function will summarize the details of the customer in English."""
+        print(f"Name: {customer_name} "
+              f"Address: {customer_address} "
+              f"Product: {product_details} "
+              f"Issue: {issue_faced} "
+              f"Phone Number: {self.phone_number}")
+
+        return self.options.get("confirmation", True)
+
+
+class DentalFnc(llm.FunctionContext):
+    """Tools for the B Square Dental appointment line."""
+
+    def __init__(self, options: dict | None = None):
+        super().__init__()
+        self.options = options or {}
+        self.phone_number = None
+        self.participant_identity = None
+        self.room_name = None
+        self.livekit_api = None
+
+    def set_call(self, room_name: str, participant_identity: str, phone_number: str | None):
+        self.phone_number = phone_number
+        self.participant_identity = participant_identity
+        self.room_name = room_name
+
+    @llm.ai_callable()
+    def book_appointment(self,customer_name: str, reason: str, date_time: str):
+      """
+    Books a new dental appointment.
+    Args:
+        name: Customer's full name.
+        reason: Reason for the dental visit.
+        date_time: Preferred date and time for the appointment.
+    Returns:
+        Confirmation message.
+      """
+      print(f"Name: {customer_name} "
+              f"Reason: {reason} "
+              f"date_time: {date_time} "
+              f"Phone Number: {self.phone_number}")
+
+      return f"Your Appoinment has been booked on date {date_time}"
+
+    @llm.ai_callable()
+    async def transfer_call(self) -> None:
+        """
+        Transfer the SIP call to another number. This will essentially end the current call and start a new one,
+        the PhoneAssistant will no longer be active on the call.
+
+        Args:
+            participant_identity (str): The identity of the participant.
+            transfer_to (str): The phone number to transfer the call to.
+        """
+        transfer_to = self.options.get("transfer_to")
+        logger.info(f"Transferring call for participant {self.participant_identity} to {transfer_to}")
+
+        try:
+            # Initialize LiveKit API client if not already done
+            if not self.livekit_api:
+                livekit_url = os.getenv('LIVEKIT_URL')
+                api_key = os.getenv('LIVEKIT_API_KEY')
+                api_secret = os.getenv('LIVEKIT_API_SECRET')
+                logger.debug(f"Initializing LiveKit API client with URL: {livekit_url}")
+                self.livekit_api = api.LiveKitAPI(
+                    url=livekit_url,
+                    api_key=api_key,
+                    api_secret=api_secret
+                )
+
+            # Create transfer request
+            transfer_request = proto_sip.TransferSIPParticipantRequest(
+                participant_identity=self.participant_identity,
+                room_name=self.room_name,
+                transfer_to=transfer_to,
+                play_dialtone=True
+            )
+            logger.debug(f"Transfer request: {transfer_request}")
+
+            # Perform transfer
+            await self.livekit_api.sip.transfer_sip_participant(transfer_request)
+            logger.info(f"Successfully transferred participant {self.participant_identity} to {transfer_to}")
+
+        except Exception as e:
+            logger.error(f"Failed to transfer call: {e}", exc_info=True)
+            return "I'm sorry, I couldn't transfer your call. Is there something else I can help with?"
+
+
+# Tool sets that tenant profiles can refer to by name
+TOOLSETS = {
+    "complaint_intake": ComplaintIntakeFnc,
+    "dental": DentalFnc,
+}
@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import logging
+import os
+
+from livekit import rtc
+from livekit.agents import tokenize, tts, utils
+
+from blocking_io import run_blocking
+
+logger = logging.getLogger("voice-agent")
+
+# Cached phrases are replayed in 100ms frames
+_FRAME_MS = 100
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+class CachedTTS(tts.TTS):
+    """
+    TTS wrapper that plays fixed phrases (greetings, stock lines) from a local cache.
+
+    Phrases are keyed by (text, voice, language, sample rate) and stored on disk as
+    raw 16-bit PCM, so after the first synthesis they play back with no TTS round
+    trip or billing. Text that is not a registered phrase goes straight to the
+    wrapped TTS. `load()` reads the cache from disk (call it in `prewarm`) and
+    `fill()` synthesizes any phrase that is still missing.
+
+    A non-streaming TTS is played through VoicePipelineAgent's StreamAdapter,
+    which synthesizes one sentence at a time, so a multi-sentence phrase is also
+    cached sentence by sentence, split the way the adapter splits it.
+    """
+
+    def __init__(
+        self,
+        inner: tts.TTS,
+        *,
+        voice: str = "",
+        language: str = "",
+        phrases=(),
+        cache_dir: str | None = None,
+    ):
+        super().__init__(
+            capabilities=inner.capabilities,
+            sample_rate=inner.sample_rate,
+            num_channels=inner.num_channels,
+        )
+        self._inner = inner
+        self._voice = voice
+        self._language = language
+        self._cache_dir = cache_dir or os.getenv("TTS_CACHE_DIR", "tts_cache")
+        self._sentences = None if inner.capabilities.streaming else tokenize.basic.SentenceTokenizer()
+        self._phrases = set()
+        self.add_phrases(*phrases)
+        self._audio = {}
+        self.hits = 0
+        self.misses = 0
+        inner.on("metrics_collected", lambda metrics: self.emit("metrics_collected", metrics))
+
+    @property
+    def inner(self) -> tts.TTS:
+        return self._inner
+
+    def add_phrases(self, *phrases: str):
+        for phrase in phrases:
+            self._phrases.add(_normalize(phrase))
+            if self._sentences is not None:
+                self._phrases.update(_normalize(s) for s in self._sentences.tokenize(phrase))
+
+    def is_cacheable(self, text: str) -> bool:
+        return _normalize(text) in self._phrases
+
+    def could_be_phrase(self, text: str) -> bool:
+        """True while streamed text is still the beginning of some registered phrase."""
+        text = _normalize(text)
+        return any(phrase.startswith(text) for phrase in self._phrases)
+
+    def _key(self, text: str) -> str:
+        raw = "\x1f".join(
+            [_normalize(text), self._voice, self._language, str(self.sample_rate), str(self.num_channels)]
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._cache_dir, f"{key}.pcm")
+
+    def load(self) -> int:
+        """
+        Loads every registered phrase that is already on disk. Returns how many were found.
+        """
+        found = 0
+        for phrase in self._phrases:
+            key = self._key(phrase)
+            try:
+                with open(self._path(key), "rb") as f:
+                    self._audio[key] = f.read()
+                found += 1
+            except FileNotFoundError:
+                pass
+        logger.info(f"TTS cache loaded {found}/{len(self._phrases)} phrases from {self._cache_dir}")
+        return found
+
+    def _store(self, key: str, pcm: bytes):
+        self._audio[key] = pcm
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            tmp = self._path(key) + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(pcm)
+            os.replace(tmp, self._path(key))
+        except OSError as e:
+            logger.error(f"Failed to write TTS cache entry: {e}")
+
+    def cached_audio(self, text: str) -> bytes | None:
+        return self._audio.get(self._key(text))
+
+    def frames(self, pcm: bytes):
+        """Splits cached PCM back into audio frames for playout."""
+        bytes_per_frame = self.sample_rate * _FRAME_MS // 1000 * 2 * self.num_channels
+        for i in range(0, len(pcm), bytes_per_frame):
+            chunk = pcm[i : i + bytes_per_frame]
+            yield rtc.AudioFrame(
+                data=chunk,
+                sample_rate=self.sample_rate,
+                num_channels=self.num_channels,
+                samples_per_channel=len(chunk) // (2 * self.num_channels),
+            )
+
+    async def fill(self):
+        """
+        Synthesizes every registered phrase that is not cached yet.
+        """
+        for phrase in list(self._phrases):
+            key = self._key(phrase)
+            if key in self._audio:
+                continue
+            try:
+                frames = []
+                stream = self._inner.synthesize(phrase)
+                try:
+                    async for ev in stream:
+                        frames.append(bytes(ev.frame.data))
+                finally:
+                    await stream.aclose()
+                await run_blocking(self._store, key, b"".join(frames))
+            except Exception as e:
+                logger.error(f"Failed to pre-render TTS phrase {phrase!r}: {e}")
+
+    def synthesize(self, text: str, *, conn_options=None) -> tts.ChunkedStream:
+        if not self.is_cacheable(text):
+            return self._inner.synthesize(text, conn_options=conn_options)
+        return _CachedChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+    def stream(self, *, conn_options=None) -> tts.SynthesizeStream:
+        if not self._inner.capabilities.streaming:
+            # VoicePipelineAgent wraps non-streaming TTS in a StreamAdapter, which
+            # calls synthesize() per sentence and so already goes through the cache
+            return self._inner.stream(conn_options=conn_options)
+        return _CachedSynthesizeStream(tts=self, conn_options=conn_options)
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+class _CachedChunkedStream(tts.ChunkedStream):
+    def __init__(self, *, tts: CachedTTS, input_text: str, conn_options=None):
+        super().__init__(tts=tts, input_text=input_text, conn_options=conn_options)
+        self._cached_tts = tts
+
+    async def _run(self):
+        cache = self._cached_tts
+        key = cache._key(self._input_text)
+        request_id = utils.shortuuid()
+
+        pcm = cache._audio.get(key)
+        if pcm is not None:
+            cache.hits += 1
+            for frame in cache.frames(pcm):
+                self._event_ch.send_nowait(tts.SynthesizedAudio(request_id=request_id, frame=frame))
+            return
+
+        # First use: stream the real synthesis through and keep a copy
+        cache.misses += 1
+        chunks = []
+        stream = cache.inner.synthesize(self._input_text, conn_options=self._conn_options)
+        try:
+            async for ev in stream:
+                chunks.append(bytes(ev.frame.data))
+                self._event_ch.send_nowait(ev)
+        finally:
+            await stream.aclose()
+        await run_blocking(cache._store, key, b"".join(chunks))
+
+
+class _CachedSynthesizeStream(tts.SynthesizeStream):
+    """
+    Streaming counterpart of the cache: text is held back only while it can still
+    turn out to be a registered phrase. A complete cached phrase is played from
+    memory; anything else is streamed through the wrapped TTS unchanged.
+    """
+
+    def __init__(self, *, tts: CachedTTS, conn_options=None):
+        super().__init__(tts=tts, conn_options=conn_options)
+        self._cached_tts = tts
+
+    async def _metrics_monitor_task(self, event_aiter):
+        pass  # the wrapped stream reports its own metrics
+
+    async def _run(self):
+        cache = self._cached_tts
+        inner = None
+        forward_task = None
+        pending = ""
+
+        async def _forward(stream):
+            async for ev in stream:
+                self._event_ch.send_nowait(ev)
+
+        def _open_inner():
+            nonlocal inner, forward_task
+            inner = cache.inner.stream(conn_options=self._conn_options)
+            forward_task = asyncio.create_task(_forward(inner))
+
+        try:
+            async for data in self._input_ch:
+                if inner is not None:
+                    if isinstance(data, str):
+                        inner.push_text(data)
+                    else:
+                        inner.flush()
+                    continue
+
+                if isinstance(data, str):
+                    pending += data
+                    if not cache.could_be_phrase(pending):
+                        _open_inner()
+                        inner.push_text(pending)
+                        pending = ""
+                    continue
+
+                # end of segment with everything so far held back
+                if not pending:
+                    continue
+                pcm = cache.cached_audio(pending) if cache.is_cacheable(pending) else None
+                if pcm is not None:
+                    cache.hits += 1
+                    request_id = utils.shortuuid()
+                    frames = list(cache.frames(pcm))
+                    for i, frame in enumerate(frames):
+                        self._event_ch.send_nowait(
+                            tts.SynthesizedAudio(
+                                request_id=request_id,
+                                frame=frame,
+                                is_final=i == len(frames) - 1,
+                            )
+                        )
+                else:
+                    cache.misses += 1
+                    _open_inner()
+                    inner.push_text(pending)
+                    inner.flush()
+                pending = ""
+
+            if inner is not None:
+                inner.end_input()
+                await forward_task
+        finally:
+            if forward_task is not None:
+                await utils.aio.gracefully_cancel(forward_task)
+            if inner is not None:
+                await inner.aclose()
@@ -0,0 +1,314 @@
+"""
+Offline tuning of turn-taking (VAD and endpointing) per caller language.
+
+Replays recorded calls through Silero VAD and the VoicePipelineAgent endpointing
+rules over a grid of parameters, and scores every combination on the two ways
+turn-taking goes wrong: cutting the caller off mid-turn (e.g. pausing in the
+middle of an address) and leaving them waiting after they finished. The best
+combination per language is written to turn_profiles/<language>.json, which
+worker.py, the workflow script and agent.py load at startup.
+
+    python tune_turns.py --corpus recordings/ --language gu
+    python tune_turns.py --corpus recordings/ --eou multilingual
+
+The corpus is one WAV file of the caller's side per call, with a JSON file of
+the same name annotating the caller's turns in seconds from the start:
+
+    {
+      "language": "gu",
+      "turns": [
+        {"start": 1.2, "end": 7.9, "agent": "તમારું સરનામું જણાવશો?",
+         "text": "બાવીસ શાંતિ નગર, મણિનગર, અમદાવાદ",
+         "parts": [{"end": 3.4, "text": "બાવીસ શાંતિ નગર"}, {"end": 7.9, "text": "મણિનગર, અમદાવાદ"}]}
+      ]
+    }
+
+"agent" (what the agent said before the turn) and "parts" (the transcript up to
+each pause) are only needed with --eou, which scores the end-of-utterance model
+on them; pauses without a transcript fall back to the minimum delay.
+
+Silero runs once per recording; the grid only replays its probabilities through
+the VAD state machine, so large grids are cheap.
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+from livekit.agents import utils
+from livekit.plugins.silero import onnx_model
+
+from latency_trace import percentile
+from loadtest import load_utterance
+from turn_profiles import TURN_PROFILES_DIR, profile_path
+
+# Options of the VoicePipelineAgent and silero.VAD.load defaults, the baseline to beat
+DEFAULTS = {"activation_threshold": 0.5, "min_silence_duration": 0.55, "min_endpointing_delay": 0.5, "max_endpointing_delay": 6.0}
+
+DEFAULT_GRID = {
+    "activation_threshold": [0.35, 0.5, 0.65],
+    "min_silence_duration": [0.25, 0.4, 0.55, 0.7, 0.9],
+    "min_endpointing_delay": [0.2, 0.4, 0.6, 0.8, 1.0, 1.3],
+    # only searched with --eou
+    "max_endpointing_delay": [2.0, 3.5, 6.0],
+}
+
+# decisions this close to the annotated end count as on time, not as a cut-off
+END_TOLERANCE = 0.15
+
+# the realtime agent's server-side VAD keeps its own prefix padding
+REALTIME_PREFIX_PADDING_MS = 300
+
+
+def speech_probabilities(path: str) -> tuple[np.ndarray, float]:
+    """Silero speech probability of every inference window, smoothed as VADStream does."""
+    frames = load_utterance(path)
+    samples = np.concatenate([np.frombuffer(f.data, dtype=np.int16) for f in frames]).astype(np.float32)
+    samples /= np.iinfo(np.int16).max
+    model = onnx_model.OnnxModel(onnx_session=onnx_model.new_inference_session(True), sample_rate=16000)
+    window = model.window_size_samples
+    smoothing = utils.ExpFilter(alpha=0.35)
+    probs = np.array(
+        [smoothing.apply(exp=1.0, sample=model(samples[i : i + window])) for i in range(0, len(samples) - window + 1, window)]
+    )
+    return probs, window / model.sample_rate
+
+
+def speech_segments(probs: np.ndarray, window: float, activation_threshold: float, min_silence_duration: float, min_speech_duration: float = 0.05) -> list[tuple[float, float]]:
+    """(START_OF_SPEECH, END_OF_SPEECH) times as silero's VADStream would report them."""
+    segments = []
+    speaking = False
+    speech = silence = 0.0
+    start = 0.0
+    for i, p in enumerate(probs):
+        t = (i + 1) * window
+        if p >= activation_threshold:
+            speech += window
+            silence = 0.0
+            if not speaking and speech >= min_speech_duration:
+                speaking, start = True, t
+        else:
+            silence += window
+            speech = 0.0
+            if speaking and silence >= min_silence_duration:
+                speaking = False
+                segments.append((start, t))
+    return segments
+
+
+class EOUScorer:
+    """End-of-utterance probabilities for the annotated transcripts, cached per text."""
+
+    def __init__(self, model_type: str):
+        # the plugin's inference runner, run in this process rather than the job's executor
+        from livekit.plugins.turn_detector.base import _download_from_hf_hub
+        from livekit.plugins.turn_detector.models import HG_MODEL, MODEL_REVISIONS
+
+        if model_type == "multilingual":
+            from livekit.plugins.turn_detector.multilingual import _EUORunnerMultilingual as Runner
+        else:
+            from livekit.plugins.turn_detector.english import _EUORunnerEn as Runner
+        self._runner = Runner()
+        self._runner.initialize()
+        languages = _download_from_hf_hub(HG_MODEL, "languages.json", revision=MODEL_REVISIONS[model_type], local_files_only=True)
+        with open(languages, encoding="utf-8") as f:
+            self._languages = json.load(f)
+        self._cache = {}
+
+    def unlikely_threshold(self, language: str) -> float | None:
+        language = language.lower()
+        for code in (language, language.split("-")[0]):
+            if code in self._languages:
+                return self._languages[code]["threshold"]
+        return None
+
+    def probability(self, messages: list[dict]) -> float:
+        key = json.dumps(messages, ensure_ascii=False)
+        if key not in self._cache:
+            result = json.loads(self._runner.run(json.dumps({"chat_ctx": messages}).encode()))
+            self._cache[key] = result["eou_probability"]
+        return self._cache[key]
+
+
+class RecordedCall:
+    def __init__(self, wav_path: str):
+        self.name = os.path.splitext(os.path.basename(wav_path))[0]
+        with open(os.path.splitext(wav_path)[0] + ".json", encoding="utf-8") as f:
+            annotation = json.load(f)
+        self.language = annotation["language"]
+        self.turns = sorted(annotation["turns"], key=lambda t: t["start"])
+        self.probs, self.window = speech_probabilities(wav_path)
+        self.duration = len(self.probs) * self.window
+
+    def context_at(self, t: float) -> list[dict] | None:
+        """
+        Chat context the turn detector would see for a pause at `t`: earlier turns
+        plus the transcript so far, or None if the annotation has no transcript there.
+        """
+        messages = []
+        for turn in self.turns:
+            if turn.get("agent"):
+                messages.append({"role": "assistant", "content": turn["agent"]})
+            if t > turn["end"] + END_TOLERANCE:
+                if turn.get("text"):
+                    messages.append({"role": "user", "content": turn["text"]})
+                continue
+            if t < turn["start"]:
+                return None
+            if t >= turn["end"] - END_TOLERANCE and turn.get("text"):
+                text = turn["text"]
+            else:
+                text = " ".join(p["text"] for p in turn.get("parts", []) if p["end"] <= t + END_TOLERANCE)
+            if not text:
+                return None
+            return [*messages, {"role": "user", "content": text}][-6:]
+        return None
+
+    def decisions(self, params: dict, eou: EOUScorer | None = None) -> list[float]:
+        """Times at which the agent would decide the caller's turn is over."""
+        segments = speech_segments(self.probs, self.window, params["activation_threshold"], params["min_silence_duration"])
+        threshold = eou.unlikely_threshold(self.language) if eou else None
+        decisions = []
+        for i, (_, end_of_speech) in enumerate(segments):
+            next_start = segments[i + 1][0] if i + 1 < len(segments) else self.duration
+            delay = params["min_endpointing_delay"]
+            if threshold is not None:
+                context = self.context_at(end_of_speech - params["min_silence_duration"])
+                if context is not None and eou.probability(context) < threshold:
+                    delay = params["max_endpointing_delay"]
+            # the caller speaking again cancels the pending reply
+            if end_of_speech + delay < next_start:
+                decisions.append(end_of_speech + delay)
+        return decisions
+
+    def score(self, decisions: list[float]) -> list[dict]:
+        """Per annotated turn: whether the caller was cut off and how long they waited."""
+        results = []
+        for i, turn in enumerate(self.turns):
+            next_start = self.turns[i + 1]["start"] if i + 1 < len(self.turns) else self.duration
+            cut_off = any(turn["start"] < d < turn["end"] - END_TOLERANCE for d in decisions)
+            reply = next((d for d in decisions if turn["end"] - END_TOLERANCE <= d < next_start), None)
+            results.append({
+                "cut_off": cut_off,
+                # no reply before the caller spoke again: they waited for nothing
+                "delay": max(0.0, (reply if reply is not None else next_start) - turn["end"]),
+                "missed": reply is None,
+            })
+        return results
+
+
+def evaluate(calls: list[RecordedCall], params: dict, cutoff_cost: float, eou: EOUScorer | None = None) -> dict:
+    turns = [t for call in calls for t in call.score(call.decisions(params, eou))]
+    delays = [t["delay"] for t in turns]
+    cutoff_rate = sum(t["cut_off"] for t in turns) / len(turns)
+    mean_delay = sum(delays) / len(delays)
+    return {
+        "params": params,
+        "turns": len(turns),
+        "cutoff_rate": round(cutoff_rate, 4),
+        "missed": sum(t["missed"] for t in turns),
+        "delay_mean": round(mean_delay, 3),
+        "delay_p50": round(percentile(delays, 0.5), 3),
+        "delay_p90": round(percentile(delays, 0.9), 3),
+        # a cut-off costs the caller about as much as waiting `cutoff_cost` seconds
+        "score": round(mean_delay + cutoff_cost * cutoff_rate, 4),
+    }
+
+
+def grid_points(grid: dict, eou: bool):
+    keys = [k for k in grid if eou or k != "max_endpointing_delay"]
+    for values in itertools.product(*(grid[k] for k in keys)):
+        params = {**DEFAULTS, **dict(zip(keys, values))}
+        if params["max_endpointing_delay"] < params["min_endpointing_delay"]:
+            continue
+        yield params
+
+
+def build_profile(language: str, best: dict, baseline: dict, calls: list[RecordedCall], args) -> dict:
+    params = best["params"]
+    return {
+        "language": language,
+        "vad": {
+            "activation_threshold": params["activation_threshold"],
+            "min_silence_duration": params["min_silence_duration"],
+        },
+        "endpointing": {
+            "min_endpointing_delay": params["min_endpointing_delay"],
+            **({"max_endpointing_delay": params["max_endpointing_delay"]} if args.eou else {}),
+        },
+        "turn_detector": {"en": "eou", "multilingual": "eou-multilingual"}.get(args.eou),
+        # OpenAI's server VAD only has a silence timeout: VAD silence plus endpointing delay
+        "realtime": {
+            "threshold": params["activation_threshold"],
+            "silence_duration_ms": round((params["min_silence_duration"] + params["min_endpointing_delay"]) * 1000),
+            "prefix_padding_ms": REALTIME_PREFIX_PADDING_MS,
+        },
+        "tuned": {
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "calls": [c.name for c in calls],
+            "cutoff_cost": args.cutoff_cost,
+            "result": {k: v for k, v in best.items() if k != "params"},
+            "baseline": {k: v for k, v in baseline.items() if k != "params"},
+        },
+    }
+
+
+def main(args):
+    paths = [p for pattern in args.corpus for p in sorted(glob.glob(os.path.join(pattern, "*.wav")) if os.path.isdir(pattern) else glob.glob(pattern))]
+    paths = [p for p in paths if os.path.exists(os.path.splitext(p)[0] + ".json")]
+    if not paths:
+        raise SystemExit("no recordings: pass --corpus with WAV files that have a .json annotation next to them")
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid, encoding="utf-8") as f:
+            grid = {**DEFAULT_GRID, **json.load(f)}
+    eou = EOUScorer(args.eou) if args.eou else None
+
+    by_language = {}
+    for path in paths:
+        call = RecordedCall(path)
+        if args.language and call.language not in args.language:
+            continue
+        by_language.setdefault(call.language, []).append(call)
+        print(f"{call.name}: {call.language}, {len(call.turns)} turns, {call.duration:.0f}s")
+
+    report = {}
+    for language, calls in sorted(by_language.items()):
+        if eou is not None and eou.unlikely_threshold(language) is None:
+            print(f"warning: the {args.eou} turn detector does not support {language}, it will not be used")
+        results = [evaluate(calls, params, args.cutoff_cost, eou) for params in grid_points(grid, eou is not None)]
+        results.sort(key=lambda r: (r["score"], r["delay_mean"]))
+        baseline = evaluate(calls, dict(DEFAULTS), args.cutoff_cost, eou)
+        best = results[0]
+        report[language] = {"baseline": baseline, "best": results[: args.top]}
+
+        profile = build_profile(language, best, baseline, calls, args)
+        if not args.dry_run:
+            path = profile_path(language, args.out)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(profile, f, indent=2, ensure_ascii=False)
+                f.write("\n")
+            print(f"{language}: wrote {path}")
+        print(
+            f"{language}: cut-offs {baseline['cutoff_rate']:.1%} -> {best['cutoff_rate']:.1%}, "
+            f"mean wait {baseline['delay_mean']:.2f}s -> {best['delay_mean']:.2f}s over {best['turns']} turns"
+        )
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune VAD and endpointing per language from recorded calls")
+    parser.add_argument("--corpus", nargs="+", required=True, help="directories or WAV globs; each WAV needs a .json annotation")
+    parser.add_argument("--language", nargs="*", help="only tune these languages")
+    parser.add_argument("--grid", help="JSON file overriding DEFAULT_GRID values, e.g. {\"min_endpointing_delay\": [0.5, 1.0]}")
+    parser.add_argument("--eou", choices=["en", "multilingual"], help="also score this end-of-utterance model (run download-files first)")
+    parser.add_argument("--cutoff-cost", type=float, default=3.0, help="seconds of waiting a premature cut-off is worth")
+    parser.add_argument("--top", type=int, default=5, help="combinations per language in the report")
+    parser.add_argument("--out", default=TURN_PROFILES_DIR, help="profile directory")
+    parser.add_argument("--dry-run", action="store_true", help="report without writing profiles")
+    main(parser.parse_args())
@@ -0,0 +1,69 @@
+import functools
+import json
+import logging
+import os
+from typing import Optional
+
+from livekit.plugins.turn_detector import EOUModel
+from livekit.plugins.turn_detector.multilingual import MultilingualModel
+from pydantic import BaseModel, Field
+
+from tenants import resolve_path
+
+logger = logging.getLogger("voice-agent")
+
+# Written by tune_turns.py, one <language>.json per language
+TURN_PROFILES_DIR = os.getenv("TURN_PROFILES_DIR", "turn_profiles")
+
+
+class TurnProfile(BaseModel):
+    """
+    Turn-taking parameters for one caller language. Anything left out keeps the
+    library default, so a language without a profile behaves as before.
+    """
+
+    language: Optional[str] = None
+    vad: dict = Field(default_factory=dict, description="silero.VAD.load options, e.g. activation_threshold and min_silence_duration")
+    endpointing: dict = Field(default_factory=dict, description="VoicePipelineAgent min_endpointing_delay and max_endpointing_delay")
+    turn_detector: Optional[str] = Field(default=None, description="'eou' or 'eou-multilingual' to use the end-of-utterance model")
+    realtime: dict = Field(default_factory=dict, description="openai.realtime.ServerVadOptions for the realtime agent")
+    tuned: dict = Field(default_factory=dict, description="Corpus and scores of the tuning run that produced the profile")
+
+    def agent_options(self, detector: str | None = None) -> dict:
+        """
+        VoicePipelineAgent keyword arguments: the endpointing delays and the turn
+        detector. A `detector` set on the tenant wins over the profile's.
+        """
+        options = dict(self.endpointing)
+        detector = detector or self.turn_detector
+        if detector == "eou":
+            options["turn_detector"] = EOUModel()
+        elif detector == "eou-multilingual":
+            options["turn_detector"] = MultilingualModel()
+        return options
+
+    def server_vad(self, **defaults) -> dict:
+        """ServerVadOptions keyword arguments: the tuned values over the script's own."""
+        return {**defaults, **self.realtime}
+
+
+def profile_path(language: str, profiles_dir: str | None = None) -> str:
+    return os.path.join(resolve_path(profiles_dir or TURN_PROFILES_DIR), f"{language}.json")
+
+
+@functools.lru_cache(maxsize=None)
+def load_turn_profile(language: str | None) -> TurnProfile:
+    """
+    Loads the tuned profile for `language` ("gu", "hi", "en", ...), or the library
+    defaults when there is none. Cached, so call it from prewarm and entrypoints alike.
+    """
+    if not language:
+        return TurnProfile()
+    path = profile_path(language)
+    if not os.path.exists(path):
+        logger.info(f"no turn-taking profile for {language} at {path}, using the defaults")
+        return TurnProfile(language=language)
+    with open(path, encoding="utf-8") as f:
+        profile = TurnProfile(**json.load(f))
+    logger.info(f"loaded turn-taking profile for {language}: {json.dumps(profile.model_dump(exclude={'tuned'}))}")
+    return profile
@@ -0,0 +1,259 @@
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import re
+
+from dotenv import load_dotenv
+from livekit.agents import (
+    AutoSubscribe,
+    JobContext,
+    JobProcess,
+    WorkerOptions,
+    cli,
+    llm,
+)
+from livekit.agents.pipeline import VoicePipelineAgent
+from livekit.plugins import silero
+from livekit.rtc import ParticipantKind
+
+from context_window import ContextWindow
+from intake import IntakeFlow, intake_phrases
+from latency_trace import trace_call
+from loop_watchdog import start_watchdog
+from providers import ProviderPool, tts_cache_key
+from speculative import SpeculativeReply
+from tenants import load_tenants, resolve_path
+from tool_runner import ToolRunner
+from tools import TOOLSETS
+from tts_cache import CachedTTS
+from turn_profiles import load_turn_profile
+from worker_load import WorkerLoad, monitor_loop_lag
+
+load_dotenv(dotenv_path="./.env.local")
+logger = logging.getLogger("voice-agent")
+
+
+def load_script(path: str):
+    """
+    Imports an agent script (the file names contain dashes, so not via `import`).
+    """
+    module_name = "tenant_" + re.sub(r"\W", "_", os.path.splitext(os.path.basename(path))[0])
+    spec = importlib.util.spec_from_file_location(module_name, resolve_path(path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class _TenantProcess:
+    """JobProcess view with its own userdata, so script tenants don't share keys."""
+
+    def __init__(self, proc: JobProcess, userdata: dict):
+        self._proc = proc
+        self.userdata = userdata
+
+    def __getattr__(self, name):
+        return getattr(self._proc, name)
+
+
+class _TenantJobContext:
+    """JobContext view that hands a script tenant its own process userdata."""
+
+    def __init__(self, ctx: JobContext, proc: _TenantProcess):
+        self._ctx = ctx
+        self.proc = proc
+
+    def __getattr__(self, name):
+        return getattr(self._ctx, name)
+
+
+def load_vad(proc: JobProcess, language: str | None) -> silero.VAD:
+    """
+    The VAD for callers speaking `language`, with its tuned turn-taking profile;
+    languages whose settings are the same share one model.
+    """
+    options = load_turn_profile(language).vad
+    key = json.dumps(options, sort_keys=True)
+    vads = proc.userdata["vads"]
+    if key not in vads:
+        vads[key] = silero.VAD.load(**options)
+    return vads[key]
+
+
+def prewarm(proc: JobProcess):
+    config = load_tenants()
+    proc.userdata["tenants"] = config
+    proc.userdata["vads"] = {}
+    proc.userdata["scripts"] = {}
+    proc.userdata["tenant_userdata"] = {}
+    proc.userdata["tts"] = {}
+    # Provider clients are built once here and shared by the jobs this process runs
+    providers = ProviderPool()
+    proc.userdata["providers"] = providers
+
+    ready = []
+    for profile in config.active():
+        # A misconfigured tenant (e.g. missing credentials) must not take the other
+        # lines down with it
+        try:
+            _prewarm_tenant(proc, profile, providers)
+            ready.append(profile.name)
+        except Exception:
+            logger.exception(f"failed to prepare tenant {profile.name}, it will not be served")
+
+    proc.userdata["ready_tenants"] = set(ready)
+    logger.info(f"worker process ready for tenants: {ready}")
+
+
+def _prewarm_tenant(proc: JobProcess, profile, providers: ProviderPool):
+    if profile.script:
+        module = load_script(profile.script)
+        userdata = {"vad": load_vad(proc, profile.language), "providers": providers}
+        if hasattr(module, "prewarm"):
+            module.prewarm(_TenantProcess(proc, userdata))
+        proc.userdata["scripts"][profile.name] = module
+        proc.userdata["tenant_userdata"][profile.name] = userdata
+        return
+
+    load_vad(proc, profile.language)
+    providers.stt(profile.stt)
+    providers.llm(profile.llm)
+    voice, language = tts_cache_key(profile.tts)
+    phrases = [profile.greeting, *profile.stock_phrases] if profile.greeting else list(profile.stock_phrases)
+    if profile.intake is not None:
+        phrases += intake_phrases(profile.intake.get("closing"))
+    phrases += profile.tool_runner.get("fillers", {}).values()
+    tts = CachedTTS(
+        providers.tts(profile.tts),
+        voice=voice,
+        language=language,
+        phrases=phrases,
+    )
+    tts.load()
+    proc.userdata["tts"][profile.name] = tts
+
+async def run_pipeline(ctx: JobContext, profile):
+    """
+    Runs a VoicePipelineAgent call for a declarative tenant profile.
+    """
+    providers = ctx.proc.userdata["providers"]
+    stt = providers.stt(profile.stt)
+    llm_client = providers.llm(profile.llm)
+    tts = ctx.proc.userdata["tts"][profile.name]
+    # Open provider connections and render any stock phrase that is not cached
+    # yet while we join the room and wait for the caller
+    asyncio.create_task(providers.warm(stt, llm_client, tts))
+    asyncio.create_task(tts.fill())
+
+    fnc_ctx = TOOLSETS[profile.tools](profile.tool_options) if profile.tools else None
+    initial_ctx = llm.ChatContext().append(role="system", text=profile.prompt())
+
+    logger.info(f"connecting to room {ctx.room.name}")
+    await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
+
+    # Wait for the first participant to connect
+    participant = await ctx.wait_for_participant()
+
+    # Check if the participant is a SIP participant and get phone number
+    phone_number = None
+    if participant.kind == ParticipantKind.PARTICIPANT_KIND_SIP:
+        phone_number = participant.attributes.get('sip.phoneNumber')
+        logger.info(f"Caller phone number is {phone_number}")
+    if fnc_ctx is not None:
+        fnc_ctx.set_call(ctx.room.name, participant.identity, phone_number)
+
+    logger.info(f"starting voice assistant for participant {participant.identity}")
+
+    # endpointing delays and turn detector tuned for the caller's language
+    agent_options = load_turn_profile(profile.language).agent_options(profile.turn_detector)
+    tool_runner = None
+    if fnc_ctx is not None:
+        # wraps the tools, so before anything looks them up
+        tool_runner = ToolRunner(fnc_ctx, **profile.tool_runner)
+        ctx.add_shutdown_callback(lambda: tool_runner.aclose())
+    intake = None
+    if profile.intake is not None and fnc_ctx is not None:
+        intake = IntakeFlow(fnc_ctx, **profile.intake)
+        ctx.add_shutdown_callback(lambda: intake.aclose())
+    context_window = ContextWindow(
+        inner=intake.before_llm_cb if intake else None,
+        slots=(lambda: intake.slots) if intake else None,
+        **profile.context,
+    )
+    ctx.add_shutdown_callback(lambda: context_window.aclose())
+    speculative = SpeculativeReply(
+        inner=context_window.before_llm_cb,
+        prepare=context_window.trim,
+        record=context_window.record,
+        can_speculate=(lambda: not intake.active) if intake else None,
+        **profile.speculative,
+    )
+    ctx.add_shutdown_callback(lambda: speculative.aclose())
+
+    agent = VoicePipelineAgent(
+        vad=load_vad(ctx.proc, profile.language),
+        stt=stt,
+        llm=llm_client,
+        tts=tts,
+        chat_ctx=initial_ctx,
+        fnc_ctx=fnc_ctx,
+        allow_interruptions=profile.allow_interruptions,
+        before_llm_cb=speculative.before_llm_cb,
+        **agent_options,
+    )
+
+    if tool_runner is not None:
+        tool_runner.attach(agent)
+    trace_call(
+        ctx, agent, tenant=profile.name, language=profile.language or "", tool_runner=tool_runner, speculative=speculative
+    )
+    agent.start(ctx.room, participant)
+    speculative.attach(agent)
+
+    if profile.greeting:
+        await agent.say(profile.greeting, allow_interruptions=profile.greeting_allow_interruptions)
+
+
+async def entrypoint(ctx: JobContext):
+    monitor_loop_lag()
+    start_watchdog()
+    profile = ctx.proc.userdata["tenants"].select(ctx.job)
+    logger.info(f"job {ctx.job.id} in room {ctx.job.room.name} uses tenant {profile.name}")
+    if profile.name not in ctx.proc.userdata["ready_tenants"]:
+        raise RuntimeError(f"tenant {profile.name} failed to initialize in this worker")
+
+    if profile.script:
+        module = ctx.proc.userdata["scripts"][profile.name]
+        userdata = ctx.proc.userdata["tenant_userdata"][profile.name]
+        await module.entrypoint(_TenantJobContext(ctx, _TenantProcess(ctx.proc, userdata)))
+        return
+
+    await run_pipeline(ctx, profile)
+
+
+def run(tenant: str | None = None, agent_name: str | None = None):
+    """
+    Starts the worker. With `tenant` the worker only serves that profile, which is
+    how the per-line agent scripts launch it; without it every profile in
+    tenants.json is served by the same pool of processes.
+    """
+    if tenant:
+        # Job processes are spawned, so pass the pin through the environment
+        os.environ["WORKER_TENANT"] = tenant
+    load = WorkerLoad()
+    cli.run_app(
+        WorkerOptions(
+            entrypoint_fnc=entrypoint,
+            prewarm_fnc=prewarm,
+            agent_name=agent_name if agent_name is not None else os.getenv("WORKER_AGENT_NAME", ""),
+            # Stop taking calls before CPU, event-loop lag or WORKER_MAX_CALLS
+            # make the audio of the current calls stutter
+            load_fnc=load.load_fnc,
+            load_threshold=load.threshold,
+        ),
+    )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+
+import psutil
+
+logger = logging.getLogger("voice-agent")
+
+# Job processes publish their event-loop lag here, one `<pid>.json` per process,
+# for the load function running in the worker's main process
+LOAD_STATE_DIR = os.getenv("LOAD_STATE_DIR", os.path.join(tempfile.gettempdir(), "voice-agent-load"))
+
+
+class LoopLagMonitor:
+    """
+    Samples the event-loop scheduling delay of this process: a task asks to wake
+    up every `interval` seconds and records how late it actually ran. Anything
+    that blocks the loop (VAD inference, audio resampling, blocking I/O in a tool)
+    delays the audio of the call by the same amount.
+
+    The worst lag over the last `window` seconds is written to LOAD_STATE_DIR once
+    a second so WorkerLoad, in the worker's main process, can see it.
+    """
+
+    def __init__(self, interval: float = 0.05, window: float = 5.0, state_dir: str | None = None):
+        self._interval = interval
+        self._window = window
+        self._path = os.path.join(state_dir or LOAD_STATE_DIR, f"{os.getpid()}.json")
+        self._samples = deque()
+        self._task = None
+
+    @property
+    def lag(self) -> float:
+        """Worst scheduling delay in seconds over the window."""
+        return max((lag for _, lag in self._samples), default=0.0)
+
+    def start(self):
+        if self._task is None:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        published = 0.0
+        while True:
+            expected = loop.time() + self._interval
+            await asyncio.sleep(self._interval)
+            now = loop.time()
+            self._samples.append((now, max(0.0, now - expected)))
+            while self._samples and self._samples[0][0] < now - self._window:
+                self._samples.popleft()
+            if now - published >= 1.0:
+                published = now
+                self._publish()
+
+    def _publish(self):
+        tmp = f"{self._path}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"lag": self.lag, "updated": time.time()}, f)
+            os.replace(tmp, self._path)
+        except OSError as e:
+            logger.warning(f"failed to publish event loop lag: {e}")
+
+
+_monitor = None
+
+
+def monitor_loop_lag() -> LoopLagMonitor:
+    """
+    Starts the event-loop lag monitor of this process, once. Call it from the job
+    entrypoint; job processes are spawned, so each one runs its own monitor.
+    """
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopLagMonitor()
+    _monitor.start()
+    return _monitor
+
+
+class WorkerLoad:
+    """
+    Load function for `WorkerOptions(load_fnc=...)`, replacing the default one
+    that only looks at host CPU.
+
+    The load is the highest of:
+      - CPU of this worker (main process and job processes) over all cores,
+      - the worst event-loop lag of its job processes relative to `max_loop_lag_ms`,
+      - active calls relative to `max_calls`, scaled so the worker reaches the
+        threshold exactly at `max_calls`.
+
+    Once the load reaches `threshold` LiveKit marks the worker full and sends new
+    calls to other workers. Use loadtest.py to find the call count a machine can
+    carry before the lag or the turn latency climbs.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_calls: int | None = None,
+        max_loop_lag_ms: float | None = None,
+        threshold: float | None = None,
+        state_dir: str | None = None,
+    ):
+        self._cpu_count = psutil.cpu_count() or 1
+        self.max_calls = max_calls or int(os.getenv("WORKER_MAX_CALLS", str(2 * self._cpu_count)))
+        self.max_loop_lag = (max_loop_lag_ms or float(os.getenv("WORKER_MAX_LOOP_LAG_MS", "150"))) / 1000
+        self.threshold = threshold or float(os.getenv("WORKER_LOAD_THRESHOLD", "0.75"))
+        self._state_dir = state_dir or LOAD_STATE_DIR
+        self._root = psutil.Process()
+        self._procs = {}
+        self._full = False
+
+    def _processes(self) -> list[psutil.Process]:
+        try:
+            current = [self._root, *self._root.children(recursive=True)]
+        except psutil.NoSuchProcess:
+            current = [self._root]
+        # keep the Process objects so cpu_percent() measures since the last call
+        self._procs = {p.pid: self._procs.get(p.pid, p) for p in current}
+        return list(self._procs.values())
+
+    def _cpu(self, procs: list[psutil.Process]) -> dict:
+        usage = {}
+        for proc in procs:
+            try:
+                usage[proc.pid] = proc.cpu_percent(None)
+            except psutil.NoSuchProcess:
+                pass
+        return usage
+
+    def _loop_lag(self, pids) -> float:
+        lag = 0.0
+        now = time.time()
+        try:
+            names = os.listdir(self._state_dir)
+        except FileNotFoundError:
+            return lag
+        for name in names:
+            pid = name.removesuffix(".json")
+            if not name.endswith(".json") or not pid.isdigit():
+                continue
+            path = os.path.join(self._state_dir, name)
+            try:
+                with open(path) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if int(pid) in pids and now - state["updated"] < 10:
+                lag = max(lag, state["lag"])
+            elif int(pid) not in pids and now - state["updated"] > 60:
+                # the job process has exited
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return lag
+
+    def sample(self, active_calls: int) -> dict:
+        procs = self._processes()
+        cpu = self._cpu(procs)
+        lag = self._loop_lag(set(cpu))
+        return {
+            "cpu": sum(cpu.values()) / (100 * self._cpu_count),
+            "hottest_process_cpu": max(cpu.values(), default=0.0) / 100,
+            "loop_lag_ms": round(lag * 1000, 1),
+            "active_calls": active_calls,
+            "processes": len(cpu),
+        }
+
+    def load_fnc(self, worker) -> float:
+        sample = self.sample(len(worker.active_jobs))
+        load = max(
+            sample["cpu"],
+            sample["loop_lag_ms"] / 1000 / self.max_loop_lag,
+            self.threshold * sample["active_calls"] / self.max_calls,
+        )
+        load = min(1.0, load)
+
+        full = load >= self.threshold
+        if full != self._full:
+            self._full = full
+            state = "full" if full else "available again"
+            logger.info(f"worker {state} at load {load:.2f}: {json.dumps(sample)}")
+        else:
+            logger.debug(f"worker load {load:.2f}: {json.dumps(sample)}")
+        return load